@@ -6,4 +6,4 @@ class ApiConfig(AppConfig):
     name = 'api'
 
     def ready(self):
-        from . import signals
\ No newline at end of file
+        from . import checks, metrics, profiling, signals
\ No newline at end of file
@@ -0,0 +1,95 @@
+# api/async_views.py
+"""
+Async read endpoints for ASGI deployments (uvicorn racehorse_drf.asgi:application).
+
+/api/async/racehorses/, races/ and participations/ serve the same list and
+detail JSON as the DRF viewsets, but the database and Redis round-trips are
+awaited instead of holding a worker thread. Each request still goes
+through its viewset for the queryset, filters, search, ordering, ?fields=
+and pagination settings; only the I/O is different: rows come from the
+fast values() path (api.fastpath) through the async ORM and are cached,
+rendered, in Redis through redis.asyncio under the viewset's cache
+namespace, so writes invalidate them like the sync responses.
+
+These endpoints are public and read-only: no authentication, throttling,
+stampede locking or conditional GET runs here.
+"""
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from api.cache import anamespace_version, async_redis
+from api.metrics import record_cache_read
+from api.pagination import apaginate_queryset
+from api.renderers import ORJSONRenderer
+from api.views import RacehorseViewSet, RaceViewSet, ParticipationViewSet
+
+
+class AsyncReadView(View):
+    viewset_class = None
+    http_method_names = ['get']
+    renderer = ORJSONRenderer()
+
+    async def get(self, request, pk=None):
+        action = 'list' if pk is None else 'retrieve'
+        drf_request = Request(request, authenticators=[])
+        view = self.viewset_class(
+            action=action, request=drf_request, format_kwarg=None, args=(), kwargs={'pk': pk} if pk else {},
+        )
+        key = await self.get_cache_key(view, drf_request)
+        client = async_redis()
+        content = await client.get(key)
+        record_cache_read(content is not None)
+        if content is not None:
+            return self.make_response(content, 'HIT')
+        try:
+            data = await (self.list(view, drf_request) if pk is None else self.retrieve(view, pk))
+        except Http404 as exc:
+            return self.make_response(self.renderer.render({'detail': str(exc)}), status=404)
+        except APIException as exc:
+            # Same body as DRF's exception handler
+            body = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return self.make_response(self.renderer.render(body), status=exc.status_code)
+        content = self.renderer.render(data)
+        await client.set(key, content, ex=view.cache_soft_ttl)
+        return self.make_response(content, 'MISS')
+
+    async def get_cache_key(self, view, request):
+        namespace = view.cache_namespace
+        version = await anamespace_version(namespace)
+        return cache.make_key(f'async_{namespace}_{view.action}_v{version}_{view.get_cache_digest(request)}')
+
+    async def list(self, view, request):
+        fast = view.fast_serializer_class(view.get_serializer_context())
+        queryset = view.get_fast_queryset(fast)
+        page = await apaginate_queryset(view.paginator, queryset, request, view)
+        if page is None:
+            return await fast.aserialize([row async for row in queryset])
+        return view.paginator.get_paginated_response(await fast.aserialize(page)).data
+
+    async def retrieve(self, view, pk):
+        fast = view.fast_serializer_class(view.get_serializer_context())
+        row = await view.get_fast_queryset(fast).filter(pk=pk).afirst()
+        if row is None:
+            raise Http404(f"No {view.queryset.model._meta.object_name} matches the given query.")
+        return (await fast.aserialize([row]))[0]
+
+    def make_response(self, content, cache_status=None, status=200):
+        response = HttpResponse(content, status=status, content_type=self.renderer.media_type)
+        if cache_status:
+            response['X-Cache-Status'] = cache_status
+        return response
+
+
+class AsyncRacehorseView(AsyncReadView):
+    viewset_class = RacehorseViewSet
+
+
+class AsyncRaceView(AsyncReadView):
+    viewset_class = RaceViewSet
+
+
+class AsyncParticipationView(AsyncReadView):
+    viewset_class = ParticipationViewSet
@@ -0,0 +1,182 @@
+# api/autocomplete.py
+"""
+In-memory prefix indexes behind /api/autocomplete/.
+
+Each process keeps one sorted list of (normalized key, name) pairs per
+type, with every name indexed under each of its word starts so "week" finds
+"Special Week". A lookup is a bisect plus a short scan, so it never touches
+the database. Indexes are built on first use. Writes made in this process
+are applied incrementally by the signals in api.signals; writes from other
+processes bump the type's cache namespace, which each process checks at
+most once per CHECK_INTERVAL seconds before rebuilding. Bulk loaders skip
+those signals and call invalidate_autocomplete() instead.
+"""
+import bisect
+import threading
+import time
+import unicodedata
+
+from django.db import transaction
+
+from api.cache import bump_namespace, namespace_version
+from api.models import Racehorse, Jockey, Race
+
+# Seconds between checks of the shared namespace version
+CHECK_INTERVAL = 1.0
+
+
+def normalize(text):
+    """Casefold, strip accents and collapse whitespace."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+class PrefixIndex:
+    """
+        Sorted (key, name) entries. Names are reference counted so types
+        whose names repeat (races) can be added and removed one row at a time.
+    """
+    def __init__(self, rows=()):
+        self.names = {}  # name -> [id, count]
+        self.ids = {}    # id -> name, for types with unique names
+        for pk, name in rows:
+            self._count(pk, name)
+        self.entries = sorted(entry for name in self.names for entry in self.keys(name))
+
+    @staticmethod
+    def keys(name):
+        words = normalize(name).split(' ')
+        return [(' '.join(words[i:]), name) for i in range(len(words))]
+
+    def _count(self, pk, name):
+        if pk is not None:
+            self.ids[pk] = name
+        counted = self.names.get(name)
+        if counted is not None:
+            counted[1] += 1
+            return False
+        self.names[name] = [pk, 1]
+        return True
+
+    def add(self, pk, name):
+        if self._count(pk, name):
+            for entry in self.keys(name):
+                bisect.insort(self.entries, entry)
+
+    def remove(self, pk, name):
+        self.ids.pop(pk, None)
+        counted = self.names.get(name)
+        if counted is None:
+            return
+        counted[1] -= 1
+        if counted[1] > 0:
+            return
+        del self.names[name]
+        for entry in self.keys(name):
+            i = bisect.bisect_left(self.entries, entry)
+            if i < len(self.entries) and self.entries[i] == entry:
+                del self.entries[i]
+
+    def search(self, text, limit):
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        matches = []
+        i = bisect.bisect_left(self.entries, (prefix,))
+        while i < len(self.entries) and len(matches) < limit:
+            key, name = self.entries[i]
+            if not key.startswith(prefix):
+                break
+            if name not in matches:
+                matches.append(name)
+            i += 1
+        return matches
+
+
+class AutocompleteSource:
+    """The lazily built, periodically revalidated index of one model's names."""
+
+    def __init__(self, model, unique_names=True):
+        self.model = model
+        self.unique_names = unique_names
+        self.namespace = f'autocomplete_{model._meta.model_name}'
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.index = None
+        self.version = None
+        self.checked_at = 0.0
+
+    def load(self):
+        if self.unique_names:
+            return self.model._default_manager.values_list('id', 'name').iterator()
+        # Repeated names (a race run every year) share one entry without an id
+        return ((None, name) for name in self.model._default_manager.values_list('name', flat=True).iterator())
+
+    def get_index(self):
+        now = time.monotonic()
+        if self.index is not None and now < self.checked_at + CHECK_INTERVAL:
+            return self.index
+        version = namespace_version(self.namespace)
+        with self.lock:
+            if self.index is None or version != self.version:
+                self.index = PrefixIndex(self.load())
+                self.version = version
+            self.checked_at = now
+        return self.index
+
+    def search(self, text, limit):
+        index = self.get_index()
+        results = []
+        for name in index.search(text, limit):
+            pk = index.names[name][0] if name in index.names else None
+            results.append({'id': pk, 'name': name} if self.unique_names else {'name': name})
+        return results
+
+    def record_change(self, pk, name, previous_name=None):
+        """
+            Apply a committed create/rename (name set) or delete (name None).
+            previous_name is only needed for types without unique names; the
+            others look it up in the index.
+        """
+        if self.unique_names and self.index is not None and pk in self.index.ids and self.index.ids[pk] == name:
+            return  # Saved without renaming
+
+        def apply():
+            version = bump_namespace(self.namespace)
+            with self.lock:
+                if self.index is None or self.version != version - 1:
+                    # Missed someone else's change: the next lookup rebuilds
+                    self.version = None
+                    return
+                old_name = self.index.ids.get(pk) if self.unique_names else previous_name
+                if old_name != name:
+                    if old_name is not None:
+                        self.index.remove(pk, old_name)
+                    if name is not None:
+                        self.index.add(pk if self.unique_names else None, name)
+                self.version = version
+        transaction.on_commit(apply)
+
+    def invalidate(self):
+        """Make every process, this one included, rebuild on its next lookup."""
+        def apply():
+            bump_namespace(self.namespace)
+            with self.lock:
+                self.reset()
+        transaction.on_commit(apply)
+
+
+AUTOCOMPLETE_SOURCES = {
+    'racehorse': AutocompleteSource(Racehorse),
+    'jockey': AutocompleteSource(Jockey),
+    'race': AutocompleteSource(Race, unique_names=False),
+}
+
+
+def invalidate_autocomplete():
+    """For bulk loads, which bypass the signals that keep the indexes current"""
+    for source in AUTOCOMPLETE_SOURCES.values():
+        source.invalidate()
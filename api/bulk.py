@@ -0,0 +1,89 @@
+# api/bulk.py
+"""
+Set-based loading helpers shared by the import_results and populate_db commands.
+
+On PostgreSQL participations are streamed with COPY into a temporary staging
+table and moved into api_participation with a single INSERT ... SELECT that
+skips rows violating the unique race/horse and race/jockey constraints. Other
+databases fall back to bulk_create(ignore_conflicts=True).
+"""
+import csv
+import io
+
+from django.db import connection
+
+from api.models import Participation
+
+PARTICIPATION_COLUMNS = ('racehorse_id', 'race_id', 'jockey_id', 'position', 'finish_time', 'margin', 'odds')
+
+
+def _copy_value(value):
+    # COPY ... CSV treats an unquoted empty field as NULL
+    return '' if value is None else str(value)
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Stream rows into table with COPY FROM STDIN (PostgreSQL only)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(value) for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+        buffer,
+    )
+
+
+def insert_participations(rows):
+    """
+        Insert participation tuples ordered as PARTICIPATION_COLUMNS, skipping
+        duplicates of an existing (race, racehorse) or (race, jockey) entry.
+        Must run inside a transaction. Returns the number of rows inserted.
+    """
+    if not rows:
+        return 0
+    if connection.vendor != 'postgresql':
+        # bulk_create can't report how many rows ignore_conflicts skipped
+        before = Participation.objects.count()
+        Participation.objects.bulk_create(
+            [Participation(**dict(zip(PARTICIPATION_COLUMNS, row))) for row in rows],
+            ignore_conflicts=True,
+            batch_size=5000,
+        )
+        return Participation.objects.count() - before
+
+    table = Participation._meta.db_table
+    columns = ', '.join(PARTICIPATION_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS participation_stage ('
+            'racehorse_id bigint, race_id bigint, jockey_id bigint, position integer, '
+            'finish_time interval, margin numeric(5, 2), odds numeric(6, 2)'
+            ') ON COMMIT DELETE ROWS'
+        )
+        copy_rows(cursor, 'participation_stage', PARTICIPATION_COLUMNS, rows)
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) '
+            f'SELECT {columns} FROM participation_stage '
+            f'ON CONFLICT DO NOTHING'
+        )
+        inserted = cursor.rowcount
+        cursor.execute('TRUNCATE participation_stage')
+    return inserted
+
+
+def upsert_by_name(model, entities):
+    """
+        Insert {name: field dict} entities that don't exist yet (ON CONFLICT on
+        the unique name column does nothing) and return {name: id} for all of
+        them.
+    """
+    if not entities:
+        return {}
+    model.objects.bulk_create(
+        [model(name=name, **fields) for name, fields in entities.items()],
+        ignore_conflicts=True,
+        batch_size=5000,
+    )
+    return dict(model.objects.filter(name__in=list(entities)).values_list('name', 'id'))
@@ -0,0 +1,115 @@
+# api/cache.py
+"""
+Versioned cache namespaces.
+
+Every cached API response is keyed with the current version of its namespace.
+Invalidating a namespace is an INCR on its version key (plus a SET of its
+last-modified time, used for conditional GETs): old entries are never looked
+up again and simply age out through their TTL, so writes never scan the
+keyspace or flush the shared Redis DB (Celery and throttle keys live there
+too).
+"""
+import asyncio
+import time
+import weakref
+
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Namespaces whose cached payloads embed a model's data. Horse, jockey and race
+# names, stats and results are nested in every list, so a write to any of them
+# has to bump all four.
+NAMESPACE_DEPENDENCIES = {
+    'racehorse': ('racehorse', 'jockey', 'race', 'participation'),
+    'jockey': ('jockey', 'racehorse', 'race', 'participation'),
+    'race': ('race', 'racehorse', 'jockey', 'participation'),
+    'participation': ('participation', 'racehorse', 'jockey', 'race'),
+}
+
+
+def _version_key(namespace):
+    return f'ns_version:{namespace}'
+
+
+def _modified_key(namespace):
+    return f'ns_modified:{namespace}'
+
+
+def _initial_version():
+    # Seed from the clock so a version key lost to eviction never restarts at
+    # a number that older cache entries were stored under
+    return int(time.time() * 1000)
+
+
+def namespace_version(namespace):
+    """Return the current version of a namespace, creating it if needed."""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def anamespace_version(namespace):
+    """namespace_version() for async views, reading the same key through async_redis()"""
+    version = await async_redis().get(cache.make_key(_version_key(namespace)))
+    if version is None:
+        return await sync_to_async(namespace_version)(namespace)
+    # django-redis stores integers unpickled, so INCR can work on them
+    return int(version)
+
+
+# redis.asyncio connections belong to the event loop that opened them
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def async_redis():
+    """A redis.asyncio client on the cache's Redis for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = redis.asyncio.from_url(settings.REDIS_URL)
+    return client
+
+
+def namespace_state(namespace):
+    """
+        Return (version, last modified unix time) for a namespace, in one round
+        trip once both keys exist. A missing timestamp is seeded with the
+        current time: nothing can have changed after it, so it never makes a
+        client keep a stale copy.
+    """
+    keys = [_version_key(namespace), _modified_key(namespace)]
+    values = cache.get_many(keys)
+    version = values.get(keys[0])
+    if version is None:
+        version = namespace_version(namespace)
+    modified = values.get(keys[1])
+    if modified is None:
+        cache.add(keys[1], time.time(), timeout=None)
+        modified = cache.get(keys[1])
+    return version, modified
+
+
+def bump_namespace(namespace):
+    key = _version_key(namespace)
+    cache.set(_modified_key(namespace), time.time(), timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Missing key: start a fresh version instead
+        cache.add(key, _initial_version(), timeout=None)
+        return cache.get(key)
+
+
+def invalidate(model_name):
+    """
+        Bump every namespace that depends on model_name once the current
+        transaction commits, so readers can't re-cache uncommitted state.
+    """
+    namespaces = NAMESPACE_DEPENDENCIES.get(model_name, (model_name,))
+    transaction.on_commit(lambda: [bump_namespace(ns) for ns in namespaces])
@@ -0,0 +1,130 @@
+# api/checks.py
+"""
+System check that every filter, search and ordering field the API exposes
+is backed by an index.
+
+Equality, range and ordering lookups need a B-tree index (explicit, unique
+or foreign key) that leads with the field. Substring lookups (icontains,
+iexact, ...) can't use a B-tree, so they need one of the trigram indexes
+created by migration 0007.
+"""
+import importlib
+
+from django.core import checks
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.filters import OrderingFilter
+
+# Fields deliberately left unindexed: too few distinct values for an index
+# to beat a scan, and always combined with a more selective filter.
+INDEX_CHECK_EXEMPT = {
+    ('racehorse', 'is_active'),
+    ('race', 'track_condition'),
+    ('participation', 'position'),
+}
+
+PATTERN_LOOKUPS = {'iexact', 'contains', 'icontains', 'startswith', 'istartswith', 'endswith', 'iendswith'}
+
+
+def trigram_indexes():
+    migration = importlib.import_module('api.migrations.0007_trigram_indexes')
+    return set(migration.TRIGRAM_INDEXES)
+
+
+def resolve_field(model, path):
+    """Follow a lookup path like race__date to (model, field)."""
+    parts = path.lstrip('-').split('__')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    if parts[-1] == 'pk':
+        return model, model._meta.pk
+    return model, model._meta.get_field(parts[-1])
+
+
+def has_btree_index(model, field, pinned=()):
+    """
+        pinned: fields every query of the view filters on with equality, so an
+        index may lead with them (the leaderboard scope fields)
+    """
+    if field.primary_key or field.unique or field.db_index:
+        return True
+    leading = [
+        next((name for name in (f.lstrip('-') for f in index.fields) if name not in pinned), None)
+        for index in model._meta.indexes if index.fields and index.condition is None
+    ]
+    leading += [c.fields[0] for c in model._meta.constraints if getattr(c, 'fields', None) and c.condition is None]
+    leading += [fields[0] for fields in model._meta.unique_together]
+    return field.name in leading
+
+
+def has_trigram_index(model, field):
+    return (model._meta.db_table, field.column) in trigram_indexes()
+
+
+def ordering_fields(viewset):
+    """
+        The fields OrderingFilter lets a client order by. Without
+        ordering_fields it allows every readable serializer field, and with
+        '__all__' every model field, so those count as exposed too.
+    """
+    if not any(issubclass(backend, OrderingFilter) for backend in getattr(viewset, 'filter_backends', ())):
+        return []
+    fields = getattr(viewset, 'ordering_fields', None)
+    if fields == '__all__':
+        return [field.name for field in viewset.queryset.model._meta.fields]
+    if fields is None:
+        serializer_class = getattr(viewset, 'serializer_class', None)
+        if serializer_class is None:
+            return []
+        return [
+            field.source.replace('.', '__') or name
+            for name, field in serializer_class(context={}).fields.items()
+            if not field.write_only and field.source != '*'
+        ]
+    return fields
+
+
+def exposed_lookups(viewset):
+    """(path, lookup, where) for everything a client can filter, search or order the viewset by."""
+    filterset_class = getattr(viewset, 'filterset_class', None)
+    if filterset_class is not None:
+        for name, filter_ in filterset_class.base_filters.items():
+            yield filter_.field_name, filter_.lookup_expr, f'{filterset_class.__name__}.{name}'
+    for field in getattr(viewset, 'search_fields', None) or ():
+        yield field.lstrip('^=@$'), 'icontains', f'{viewset.__name__}.search_fields'
+    for field in ordering_fields(viewset):
+        yield field, 'exact', f'{viewset.__name__}.ordering_fields'
+    for ordering in getattr(viewset, 'keyset_orderings', None) or ():
+        yield ordering[0], 'exact', f'{viewset.__name__}.keyset_orderings'
+
+
+@checks.register(checks.Tags.models)
+def check_filter_indexes(app_configs=None, **kwargs):
+    from api.urls import router
+
+    errors = []
+    for _, viewset, _ in router.registry:
+        queryset = getattr(viewset, 'queryset', None)
+        if queryset is None:
+            continue
+        for path, lookup, where in exposed_lookups(viewset):
+            try:
+                model, field = resolve_field(queryset.model, path)
+            except (FieldDoesNotExist, AttributeError):
+                continue  # Annotations and properties are checked elsewhere
+            if (model._meta.model_name, field.name) in INDEX_CHECK_EXEMPT:
+                continue
+            if lookup in PATTERN_LOOKUPS:
+                supported, kind = has_trigram_index(model, field), 'trigram'
+            else:
+                supported, kind = has_btree_index(model, field, getattr(viewset, 'pinned_fields', ())), 'B-tree'
+            if not supported:
+                errors.append(checks.Error(
+                    f"{where} exposes {model.__name__}.{field.name} ({lookup}) without a supporting {kind} index.",
+                    hint=(
+                        f"Add an index on {model.__name__}.{field.name}, or list it in "
+                        "api.checks.INDEX_CHECK_EXEMPT if a scan is intended."
+                    ),
+                    obj=viewset,
+                    id='api.E001',
+                ))
+    return errors
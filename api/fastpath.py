@@ -0,0 +1,258 @@
+# api/fastpath.py
+"""
+values()-based list serialization for the main viewsets.
+
+A FastSerializer renders the same dicts as a read serializer's many=True
+output without building model instances or running DRF's per-row field
+machinery. It instantiates the real serializer once per request to learn
+which fields to render (so ?fields= trimming applies), then compiles each
+field into a values() path and a converter:
+
+- model fields reuse the DRF field's own to_representation, so decimals,
+  dates, datetimes and durations come out byte for byte the same;
+- image fields are wrapped in a FieldFile and rendered by the DRF field;
+- primary-key related fields are the raw foreign key value;
+- properties and SerializerMethodFields must be listed in `computed` with
+  the values they read, and run against a Row (a dict with attribute
+  access), so the model and serializer code is reused as is;
+- nested lists are loaded for the whole page with one query each.
+
+aserialize() does the same through the async ORM for the ASGI views in
+api.async_views.
+
+FAST_LIST_SERIALIZATION in settings switches the list actions between this
+path and the serializers.
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.fields.files import FieldFile
+from rest_framework import serializers
+
+from api.checks import resolve_field
+from api.models import Racehorse, Jockey, Race, RaceQuerySet, Participation
+from api.serializers import (
+    RacehorseSerializer, JockeySerializer, RaceSerializer, ParticipationSerializer, RacehorseForJockeySerializer,
+)
+
+
+class Row(dict):
+    """A values() row that model properties and serializer methods can read as attributes."""
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def model_property(model, name, *paths):
+    """A computed entry that evaluates a model property against the row."""
+    return paths, getattr(model, name).fget
+
+
+class NestedList:
+    """A many=True nested field, filled for a whole page with one query."""
+
+    def __init__(self, fast_serializer_class, parent_path):
+        self.fast_serializer_class = fast_serializer_class
+        self.parent_path = parent_path
+
+    def rows(self, context, parent_ids):
+        fast = self.fast_serializer_class(context)
+        rows = fast.get_queryset().filter(**{f'{self.parent_path}__in': parent_ids})
+        return fast, rows.values(self.parent_path, *fast.paths)
+
+    def load(self, context, parent_ids):
+        fast, rows = self.rows(context, parent_ids)
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[self.parent_path], []).append(fast.to_representation(row))
+        return grouped
+
+    async def aload(self, context, parent_ids):
+        fast, rows = self.rows(context, parent_ids)
+        grouped = {}
+        async for row in rows:
+            grouped.setdefault(row[self.parent_path], []).append(fast.to_representation(row))
+        return grouped
+
+
+class FastSerializer:
+    serializer_class = None
+    queryset = None
+    # Output field -> (values() paths it reads, function of a Row or serializer method name)
+    computed = {}
+    # Output field -> NestedList
+    nested = {}
+    # Annotations that computed fields read, added only when one of them is rendered
+    annotations = {}
+
+    def __init__(self, context):
+        self.serializer = self.serializer_class(context=context)
+        self.context = context
+        self.fields = []
+        self.paths = ['id']
+        self.needs_row = False
+        model = self.serializer_class.Meta.model
+        for name, field in self.serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in self.nested:
+                self.fields.append((name, None, None))
+                continue
+            if name in self.computed:
+                paths, function = self.computed[name]
+                if isinstance(function, str):
+                    function = getattr(self.serializer, function)
+                self.paths.extend(path for path in paths if path not in self.paths)
+                self.fields.append((name, None, function))
+                self.needs_row = True
+                continue
+            if isinstance(field, (serializers.ReadOnlyField, serializers.SerializerMethodField)):
+                raise ImproperlyConfigured(f"{type(self).__name__} has no computed entry for '{name}'")
+            path = field.source.replace('.', '__')
+            if path not in self.paths:
+                self.paths.append(path)
+            self.fields.append((name, path, self.converter(model, path, field)))
+
+    @staticmethod
+    def converter(model, path, field):
+        if isinstance(field, serializers.RelatedField):
+            return None  # The foreign key value is the representation
+        if isinstance(field, serializers.FileField):
+            _, model_field = resolve_field(model, path)
+            return lambda name: field.to_representation(FieldFile(None, model_field, name))
+        return field.to_representation
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    def prepare(self, queryset, extra_paths=()):
+        """Add the annotations the rendered fields read and select their values (plus extra_paths)."""
+        annotations = {
+            name: value for name, value in self.annotations.items()
+            if name in self.paths and name not in queryset.query.annotations
+        }
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        paths = self.paths + [path for path in extra_paths if path not in self.paths]
+        # select_related/prefetch_related are meaningless (and prefetching fails) on values()
+        return queryset.select_related(None).prefetch_related(None).values(*paths)
+
+    def to_representation(self, row):
+        data = {}
+        proxy = Row(row) if self.needs_row else None
+        for name, path, convert in self.fields:
+            if path is None:
+                data[name] = convert(proxy) if convert is not None else None
+                continue
+            value = row[path]
+            data[name] = None if value is None else (convert(value) if convert is not None else value)
+        return data
+
+    def nested_fields(self):
+        return [name for name, _, convert in self.fields if convert is None and name in self.nested]
+
+    def serialize(self, rows):
+        rows = list(rows)
+        ids = [row['id'] for row in rows]
+        nested = {name: self.nested[name].load(self.context, ids) for name in self.nested_fields()}
+        return self.merge(rows, nested)
+
+    async def aserialize(self, rows):
+        """serialize() for fetched rows, loading the nested lists through the async ORM"""
+        ids = [row['id'] for row in rows]
+        nested = {name: await self.nested[name].aload(self.context, ids) for name in self.nested_fields()}
+        return self.merge(rows, nested)
+
+    def merge(self, rows, nested):
+        results = []
+        for row in rows:
+            data = self.to_representation(row)
+            for name, grouped in nested.items():
+                data[name] = grouped.get(row['id'], [])
+            results.append(data)
+        return results
+
+
+class HorseParticipationsFast(FastSerializer):
+    serializer_class = RacehorseSerializer.ParticipationSerializer
+    queryset = Participation.objects.order_by('position', 'pk')
+    computed = {'result_status': model_property(Participation, 'result_status', 'position')}
+
+
+class JockeyParticipationsFast(HorseParticipationsFast):
+    serializer_class = JockeySerializer.ParticipationSerializer
+
+
+class RaceParticipationsFast(HorseParticipationsFast):
+    serializer_class = RaceSerializer.ParticipationSerializer
+
+
+class PartnershipsList(NestedList):
+    """A jockey's racehorses, from the grouped partnerships query"""
+
+    def __init__(self):
+        self.serializer = RacehorseForJockeySerializer()
+
+    def load(self, context, parent_ids):
+        return {
+            jockey_id: [self.serializer.to_representation(row) for row in rows]
+            for jockey_id, rows in Participation.objects.partnerships(parent_ids).items()
+        }
+
+    async def aload(self, context, parent_ids):
+        return await sync_to_async(self.load)(context, parent_ids)
+
+
+CAREER_STATS_COMPUTED = {
+    'total_races': (('num_races',), 'get_total_races'),
+    'total_wins': (('num_wins',), 'get_total_wins'),
+    'win_rate': (('num_races', 'num_wins'), 'get_win_rate'),
+    'g1_wins': (('num_g1_wins',), 'get_g1_wins'),
+}
+
+
+class RacehorseFast(FastSerializer):
+    serializer_class = RacehorseSerializer
+    queryset = Racehorse.objects.all()
+    computed = {
+        **CAREER_STATS_COMPUTED,
+        'age': model_property(Racehorse, 'age', 'birth_date'),
+    }
+    nested = {'participations': NestedList(HorseParticipationsFast, 'racehorse_id')}
+
+
+class JockeyFast(FastSerializer):
+    serializer_class = JockeySerializer
+    queryset = Jockey.objects.all()
+    computed = {
+        **CAREER_STATS_COMPUTED,
+        'age': model_property(Jockey, 'age', 'birth_date'),
+    }
+    nested = {
+        'participations': NestedList(JockeyParticipationsFast, 'jockey_id'),
+        'racehorses': PartnershipsList(),
+    }
+
+
+class RaceFast(FastSerializer):
+    serializer_class = RaceSerializer
+    queryset = Race.objects.all()
+    computed = {
+        'winner': (('winner_name',), lambda row: row.winner_name),
+        'total_participants': (('participant_count',), lambda row: row.participant_count),
+    }
+    annotations = RaceQuerySet.summary_annotations()
+    nested = {'participations': NestedList(RaceParticipationsFast, 'race_id')}
+
+
+class ParticipationFast(FastSerializer):
+    serializer_class = ParticipationSerializer
+    queryset = Participation.objects.all()
+    computed = {
+        'is_winner': model_property(Participation, 'is_winner', 'position'),
+        'result_status': model_property(Participation, 'result_status', 'position'),
+    }
+
@@ -1,7 +1,37 @@
 # api/filters.py
 import django_filters
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models.functions import Greatest
 from api.models import Racehorse, Jockey, Race, Participation
 from rest_framework import filters
+from rest_framework.settings import api_settings
+
+
+class RankedSearchFilter(filters.SearchFilter):
+    """
+        SearchFilter that orders matches by relevance on PostgreSQL.
+
+        Matching is unchanged (icontains on every search field), which the
+        pg_trgm GIN indexes from migration 0007 serve instead of a sequential
+        scan. Results are then ranked by their best trigram similarity to the
+        search text, unless the client asked for an explicit ?ordering=.
+        Other databases get plain SearchFilter behaviour.
+    """
+    def filter_queryset(self, request, queryset, view):
+        queryset = super().filter_queryset(request, queryset, view)
+        terms = self.get_search_terms(request)
+        search_fields = self.get_search_fields(view, request)
+        if not terms or not search_fields or request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset
+
+        text = ' '.join(terms)
+        # Drop DRF's lookup prefixes (^name, =name, ...)
+        similarities = [TrigramSimilarity(field.lstrip('^=@$'), text) for field in search_fields]
+        rank = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+        return queryset.annotate(search_rank=rank).order_by('-search_rank', 'pk')
 
 class RacehorseFilter(django_filters.FilterSet):
     class Meta:
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from django_redis import get_redis_connection
+from rest_framework.test import APIClient
+
+from api.cache import bump_namespace
+from api.models import User
+from api.mixins import CachedResponseMixin
+
+
+class Command(BaseCommand):
+    help = "Compare Redis memory and hit rate of shared vs per-user response cache keys for N simulated users"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help="Number of simulated logged-in users")
+        parser.add_argument('--rounds', type=int, default=3, help="Times each user repeats the request mix")
+
+    def request_mix(self):
+        return [
+            reverse('racehorse-list'),
+            reverse('racehorse-list') + '?page=1',
+            reverse('jockey-list') + '?ordering=name',
+            reverse('race-list') + '?classification=G1&ordering=-date',
+            reverse('race-list') + '?ordering=-date&classification=G1',
+            reverse('participation-list') + '?position=1',
+        ]
+
+    def run_policy(self, vary_on_user, users, rounds):
+        redis = get_redis_connection('default')
+        for namespace in ('racehorse', 'jockey', 'race', 'participation'):
+            bump_namespace(namespace)
+        memory_before = redis.info('memory')['used_memory']
+
+        statuses = {'HIT': 0, 'STALE': 0, 'MISS': 0}
+        urls = self.request_mix()
+        with mock.patch.object(CachedResponseMixin, 'cache_vary_on_user', vary_on_user):
+            for _ in range(rounds):
+                for user in users:
+                    client = APIClient(HTTP_HOST='localhost')
+                    client.force_authenticate(user=user)
+                    for url in urls:
+                        statuses[client.get(url)['X-Cache-Status']] += 1
+
+        memory_used = redis.info('memory')['used_memory'] - memory_before
+        total = sum(statuses.values())
+        hit_rate = (statuses['HIT'] + statuses['STALE']) / total * 100 if total else 0
+        return statuses, memory_used, hit_rate
+
+    def handle(self, *args, **options):
+        # Unsaved users are enough: only request.user.id feeds the cache key
+        users = [User(id=10_000_000 + i, username=f'bench-user-{i}') for i in range(options['users'])]
+
+        # Throttling would turn the simulated traffic into 429s
+        from api import views
+        patches = [
+            mock.patch.object(viewset, 'throttle_classes', [])
+            for viewset in (views.RacehorseViewSet, views.JockeyViewSet, views.RaceViewSet, views.ParticipationViewSet)
+        ]
+        for patch in patches:
+            patch.start()
+        try:
+            for label, vary_on_user in (("per-user keys", True), ("shared keys", False)):
+                self.stdout.write(f"Running {label} with {len(users)} users...")
+                statuses, memory_used, hit_rate = self.run_policy(vary_on_user, users, options['rounds'])
+                self.stdout.write(
+                    f"{label}: {statuses['MISS']} misses, {statuses['HIT']} hits, {statuses['STALE']} stale, "
+                    f"hit rate {hit_rate:.1f}%, Redis memory +{memory_used / 1024:.1f} KiB"
+                )
+        finally:
+            for patch in patches:
+                patch.stop()
+        self.stdout.write(self.style.SUCCESS("Cache key benchmark complete!"))
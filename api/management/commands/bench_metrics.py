@@ -0,0 +1,99 @@
+import logging
+import statistics
+import time
+from contextlib import ExitStack
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, RequestFactory, override_settings
+from django.urls import resolve
+from rest_framework.views import APIView
+
+from api import metrics
+from api.metrics import MetricsMiddleware, Registry
+
+METRICS_MIDDLEWARE = 'api.metrics.MetricsMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request overhead of MetricsMiddleware on the current database. Every request is sent "
+        "once through a stack with the middleware and once without (alternating, Silk and throttling off) and "
+        "the median latencies are compared; as that difference is within the noise of fast requests, the "
+        "middleware is also timed on its own around the same response, and that time relative to the median "
+        "request is the overhead checked against --max-overhead. The query and cache hooks stay installed in "
+        "both stacks but do nothing outside a recorded request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per case and stack")
+        parser.add_argument('--calls', type=int, default=20000, help="Direct middleware calls per case")
+        parser.add_argument('--max-overhead', type=float, default=1.0, help="Fail above this overhead (percent)")
+
+    def cases(self):
+        # A cache hit is the cheapest request, so the relative overhead is largest there
+        yield "racehorses, cached", lambda i: '/api/racehorses/'
+        # A new query string every time misses the cache and runs the queries
+        yield "races, uncached", lambda i: f'/api/races/?nocache={i}'
+        yield "autocomplete", lambda i: '/api/autocomplete/?q=a'
+
+    def client(self, enabled):
+        middleware = [m for m in settings.MIDDLEWARE if not m.startswith('silk.') and m != METRICS_MIDDLEWARE]
+        with override_settings(MIDDLEWARE=[METRICS_MIDDLEWARE, *middleware] if enabled else middleware):
+            client = Client()
+            client.get('/api/racehorses/')
+        return client
+
+    def timed(self, client, url):
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f"GET {url} returned {response.status_code}")
+        return elapsed
+
+    def middleware_cost(self, url, calls):
+        """Seconds MetricsMiddleware adds around a response that is already there"""
+        response = Client().get(url)
+        request = RequestFactory().get(url)
+        request.resolver_match = resolve(request.path_info)
+        middleware = MetricsMiddleware(lambda request: response)
+        started = time.perf_counter()
+        for _ in range(calls):
+            middleware(request)
+        return (time.perf_counter() - started) / calls
+
+    def handle(self, *args, **options):
+        with ExitStack() as stack:
+            stack.enter_context(override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], METRICS_FLUSH_INTERVAL=float('inf'),
+            ))
+            stack.enter_context(mock.patch.object(APIView, 'check_throttles', lambda self, request: None))
+            # Keep the benchmark's requests out of the real metrics
+            stack.enter_context(mock.patch.object(metrics, 'registry', Registry()))
+            logging.disable(logging.INFO)
+            stack.callback(logging.disable, logging.NOTSET)
+            clients = {True: self.client(True), False: self.client(False)}
+
+            self.stdout.write(
+                f"{'case':<20} {'off p50 ms':>11} {'on p50 ms':>10} {'delta ms':>9} {'middleware us':>14} {'overhead':>9}"
+            )
+            worst = 0
+            for label, url in self.cases():
+                samples = {True: [], False: []}
+                for i in range(options['requests']):
+                    for enabled in ((True, False) if i % 2 else (False, True)):
+                        samples[enabled].append(self.timed(clients[enabled], url(i)))
+                off, on = statistics.median(samples[False]), statistics.median(samples[True])
+                cost = self.middleware_cost(url(0), options['calls'])
+                overhead = cost / off * 100
+                worst = max(worst, overhead)
+                self.stdout.write(
+                    f"{label:<20} {off * 1000:>11.3f} {on * 1000:>10.3f} {(on - off) * 1000:>9.3f} "
+                    f"{cost * 1e6:>14.1f} {overhead:>8.2f}%"
+                )
+
+        if worst > options['max_overhead']:
+            raise CommandError(f"Metrics overhead {worst:.2f}% is above {options['max_overhead']}%")
+        self.stdout.write(self.style.SUCCESS("Metrics benchmark complete!"))
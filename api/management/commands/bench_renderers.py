@@ -0,0 +1,65 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+from api.views import RaceViewSet, ParticipationViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Time JSONRenderer/JSONParser against the orjson renderer and parser on large race and participation "
+        "list payloads built from the current database, and check both renderers produce the same bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help="Rows per payload")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per case; the best is reported")
+
+    def payloads(self, rows):
+        for label, viewset, params in [
+            ("races with participations", RaceViewSet, {}),
+            ("participations", ParticipationViewSet, {}),
+        ]:
+            request = Request(APIRequestFactory().get('/', params, HTTP_HOST='localhost'))
+            view = viewset(action='list', request=request, format_kwarg=None, kwargs={}, args=())
+            fast = view.fast_serializer_class(view.get_serializer_context())
+            yield label, fast.serialize(fast.prepare(view.get_queryset())[:rows])
+
+    def best(self, repeat, function):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = function()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+
+    @staticmethod
+    def parse(parser_class, body):
+        return parser_class().parse(io.BytesIO(body), 'application/json', {})
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f"{'payload':<28} {'rows':>6} {'MB':>6} {'step':<7} {'stdlib ms':>10} {'orjson ms':>10} {'speedup':>8}")
+        for label, data in self.payloads(options['rows']):
+            stdlib_time, stdlib_body = self.best(repeat, lambda: JSONRenderer().render(data))
+            orjson_time, orjson_body = self.best(repeat, lambda: ORJSONRenderer().render(data))
+            if stdlib_body != orjson_body:
+                raise CommandError(f"{label}: ORJSONRenderer output differs from JSONRenderer")
+            size = len(stdlib_body) / 1e6
+            stdlib_parse, _ = self.best(repeat, lambda: self.parse(JSONParser, stdlib_body))
+            orjson_parse, _ = self.best(repeat, lambda: self.parse(ORJSONParser, stdlib_body))
+            for step, stdlib_seconds, orjson_seconds in [
+                ('render', stdlib_time, orjson_time), ('parse', stdlib_parse, orjson_parse),
+            ]:
+                self.stdout.write(
+                    f"{label:<28} {len(data):>6} {size:>6.1f} {step:<7} {stdlib_seconds * 1000:>10.1f} "
+                    f"{orjson_seconds * 1000:>10.1f} {stdlib_seconds / orjson_seconds:>7.1f}x"
+                )
+        self.stdout.write(self.style.SUCCESS("Renderer benchmark complete!"))
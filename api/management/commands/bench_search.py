@@ -0,0 +1,61 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.views import RacehorseViewSet, JockeyViewSet, RaceViewSet, ParticipationViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Time search= and icontains lookups through the viewsets' filter backends against the current database "
+        "(populate_db --horses/--races builds a large one). On PostgreSQL, also reports whether the plan uses "
+        "the trigram indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terms', nargs='+', default=['ship', 'week', 'tokyo', 'mcqueen', 'rud'])
+        parser.add_argument('--repeat', type=int, default=20, help="Runs per case and term")
+
+    def cases(self, term):
+        return [
+            ("racehorses ?search=", RacehorseViewSet, {'search': term}),
+            ("racehorses ?name__icontains=", RacehorseViewSet, {'name__icontains': term}),
+            ("jockeys ?search=", JockeyViewSet, {'search': term}),
+            ("races ?search= (name, location)", RaceViewSet, {'search': term}),
+            ("participations ?racehorse__name__icontains=", ParticipationViewSet, {'racehorse__name__icontains': term}),
+        ]
+
+    def filtered_queryset(self, viewset, params):
+        request = Request(APIRequestFactory().get('/', params))
+        view = viewset(action='list', request=request, format_kwarg=None, kwargs={}, args=())
+        # Skips get_queryset, so neither its prefetches nor the simulated delay are timed
+        return view.filter_queryset(viewset.queryset.model._default_manager.order_by('pk'))
+
+    def handle(self, *args, **options):
+        results = {}
+        for term in options['terms']:
+            for label, viewset, params in self.cases(term):
+                queryset = self.filtered_queryset(viewset, params)
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    # What a list page costs: the COUNT plus the first page
+                    queryset.count()
+                    list(queryset[:10])
+                    timings.append((time.perf_counter() - started) * 1000)
+                results.setdefault(label, []).extend(timings)
+                if connection.vendor == 'postgresql' and term == options['terms'][0]:
+                    plan = queryset[:10].explain()
+                    self.stdout.write(f"{label}: {'trigram index' if '_trgm' in plan else 'NO trigram index'}")
+
+        self.stdout.write(f"{'case':<48} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for label, timings in results.items():
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            self.stdout.write(f"{label:<48} {statistics.median(timings):>8.2f} {p95:>8.2f} {p99:>8.2f}")
+        self.stdout.write(self.style.SUCCESS("Search benchmark complete!"))
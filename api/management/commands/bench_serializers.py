@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.views import RacehorseViewSet, JockeyViewSet, RaceViewSet, ParticipationViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare list serialization throughput (rows/second) of the DRF serializers and the values()-based "
+        "fast path (api.fastpath) on the current database, and check both render the same JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Rows serialized per run")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per case; the best is reported")
+
+    def cases(self):
+        return [
+            ("racehorses", RacehorseViewSet, {}),
+            ("racehorses ?fields=id,name,win_rate", RacehorseViewSet, {'fields': 'id,name,win_rate'}),
+            ("jockeys", JockeyViewSet, {}),
+            ("races", RaceViewSet, {}),
+            ("participations", ParticipationViewSet, {}),
+        ]
+
+    def make_view(self, viewset, params):
+        request = Request(APIRequestFactory().get('/', params, HTTP_HOST='localhost'))
+        view = viewset(action='list', request=request, format_kwarg=None, kwargs={}, args=())
+        # Runs get_queryset once per case, outside the timings
+        return view, view.filter_queryset(view.get_queryset())
+
+    def best_rate(self, rows, repeat, serialize):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serialize()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return rows / best if best else float('inf'), data
+
+    def handle(self, *args, **options):
+        count, repeat = options['rows'], options['repeat']
+        renderer = JSONRenderer()
+        self.stdout.write(f"{'case':<40} {'rows':>6} {'drf rows/s':>12} {'fast rows/s':>12} {'speedup':>8}")
+        for label, viewset, params in self.cases():
+            view, queryset = self.make_view(viewset, params)
+            fast = view.fast_serializer_class(view.get_serializer_context())
+            fast_rows = fast.prepare(queryset)[:count]
+            rows = len(fast_rows)
+            if not rows:
+                self.stdout.write(f"{label:<40} {'no rows':>6}")
+                continue
+            # Both sides include the page query, as a list request does
+            drf_rate, drf_data = self.best_rate(
+                rows, repeat, lambda: view.get_serializer(list(queryset[:count]), many=True).data
+            )
+            fast_rate, fast_data = self.best_rate(rows, repeat, lambda: fast.serialize(fast_rows.all()))
+            if renderer.render(drf_data) != renderer.render(fast_data):
+                raise CommandError(f"{label}: the fast path renders different JSON")
+            self.stdout.write(
+                f"{label:<40} {rows:>6} {drf_rate:>12.0f} {fast_rate:>12.0f} {fast_rate / drf_rate:>7.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS("Serializer benchmark complete!"))
@@ -0,0 +1,327 @@
+import functools
+import inspect
+import io
+import json
+import logging
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer, Serializer
+from rest_framework.views import APIView
+
+from api.cache import bump_namespace
+from api.fastpath import FastSerializer
+from api.models import Racehorse, Jockey, Race, Participation, User
+from api.renderers import ORJSONRenderer, NDJSONStreamRenderer, CSVStreamRenderer
+from api.urls import router, urlpatterns
+
+# Bumped before every cold request so no cached response is served
+NAMESPACES = ('racehorse', 'jockey', 'race', 'participation')
+
+# Routes without a GET to benchmark, and staff-only diagnostics
+SKIPPED_ROUTES = {
+    'race-results', 'profile-list', 'profile-detail', 'profile-download', 'slow-query-list', 'slow-query-detail',
+}
+
+# Time spent in these (less the queries they run) is reported as serialization
+SERIALIZATION_METHODS = [
+    (Serializer, 'to_representation'),
+    (ListSerializer, 'to_representation'),
+    (FastSerializer, 'serialize'),
+    (FastSerializer, 'aserialize'),
+    (JSONRenderer, 'render'),
+    (ORJSONRenderer, 'render'),
+    (NDJSONStreamRenderer, 'encode'),
+    (CSVStreamRenderer, 'encode'),
+]
+
+# Regressions below this many milliseconds are noise whatever the ratio
+MIN_DELTA_MS = 2.0
+
+
+class Probe:
+    """Query count, DB time and serialization time of the current request"""
+
+    def __init__(self):
+        self.depth = 0
+        self.reset()
+
+    def reset(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialization = 0.0
+        self.db_in_serialization = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db += elapsed
+            if self.depth:
+                self.db_in_serialization += elapsed
+
+    def enter(self):
+        self.depth += 1
+        return time.perf_counter()
+
+    def leave(self, started):
+        self.depth -= 1
+        if not self.depth:
+            self.serialization += time.perf_counter() - started
+
+    def timed(self, function):
+        """Wrap a serializer or renderer method so its outermost call is timed"""
+        if inspect.iscoroutinefunction(function):
+            async def wrapper(*args, **kwargs):
+                started = self.enter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    self.leave(started)
+        else:
+            def wrapper(*args, **kwargs):
+                started = self.enter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.leave(started)
+        return functools.wraps(function)(wrapper)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every GET route in api/urls.py. Seeds a fresh test database with populate_db at the given "
+        "scale (or uses the current one with --use-current-db), then times each case in-process and records "
+        "latency percentiles, query count, DB time, serialization time and response size. Results are written "
+        "as JSON; with --baseline, the run fails when a case regresses by more than --threshold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horses', type=int, default=2000)
+        parser.add_argument('--jockeys', type=int, default=300)
+        parser.add_argument('--races', type=int, default=3000)
+        parser.add_argument('--runners-per-race', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--use-current-db', action='store_true', help="Benchmark the configured database as is")
+        parser.add_argument('--keepdb', action='store_true', help="Keep (and reuse) the seeded test database")
+        parser.add_argument('--repeat', type=int, default=20, help="Measured requests per case")
+        parser.add_argument('--warmup', type=int, default=2, help="Unmeasured requests per case")
+        parser.add_argument('--warm-cache', action='store_true', help="Measure cached responses instead of cold ones")
+        parser.add_argument('--only', help="Run only the cases whose label contains this text")
+        parser.add_argument('--output', default='benchmark-results.json')
+        parser.add_argument('--baseline', help="Results file to compare against")
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help="Allowed relative increase of latency, DB time, serialization time and size",
+        )
+
+    def handle(self, *args, **options):
+        test_db = not options['use_current_db']
+        if test_db:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            if test_db:
+                self.seed(options)
+            cases = self.cases()
+            self.check_coverage(cases)
+            results = self.run(cases, options)
+        finally:
+            if test_db:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'vendor': connection.vendor,
+            'scale': {name: options[name] for name in ('horses', 'jockeys', 'races', 'runners_per_race', 'seed')},
+            'cache': 'warm' if options['warm_cache'] else 'cold',
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.print_results(results)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = self.compare(results, baseline['results'], options['threshold'])
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+
+    def seed(self, options):
+        self.stdout.write("Seeding benchmark data...")
+        call_command(
+            'populate_db', horses=options['horses'], jockeys=options['jockeys'], races=options['races'],
+            runners_per_race=options['runners_per_race'], seed=options['seed'], stdout=io.StringIO(),
+        )
+        User.objects.get_or_create(username='benchmark', defaults={'email': 'benchmark@example.com'})
+
+    def cases(self):
+        """(label, url name, url kwargs, query parameters) for every case"""
+        def first(model):
+            return {'pk': model.objects.order_by('pk').values_list('pk', flat=True).first()}
+        horse, jockey, race, participation, user = map(first, (Racehorse, Jockey, Race, Participation, User))
+        term = (Racehorse.objects.order_by('pk').values_list('name', flat=True).first() or 'a')[:4]
+        return [
+            ('api root', 'api-root', {}, {}),
+            ('racehorses', 'racehorse-list', {}, {}),
+            ('racehorses page 3 by -birth_date', 'racehorse-list', {}, {'page': 3, 'ordering': '-birth_date'}),
+            ('racehorses search', 'racehorse-list', {}, {'search': term}),
+            ('racehorses expand=participations', 'racehorse-list', {}, {'expand': 'participations'}),
+            ('racehorses fields=id,name,win_rate', 'racehorse-list', {}, {'fields': 'id,name,win_rate'}),
+            ('racehorse detail', 'racehorse-detail', horse, {}),
+            ('racehorses export ndjson', 'racehorse-export', {}, {'format': 'ndjson'}),
+            ('jockeys', 'jockey-list', {}, {}),
+            ('jockeys expand=participations,racehorses', 'jockey-list', {}, {'expand': 'participations,racehorses'}),
+            ('jockeys fields=name,total_wins', 'jockey-list', {}, {'fields': 'name,total_wins'}),
+            ('jockey detail', 'jockey-detail', jockey, {}),
+            ('races', 'race-list', {}, {}),
+            ('races G1 in 2020', 'race-list', {}, {'classification': 'G1', 'date__range': '2020-01-01,2020-12-31'}),
+            ('races cursor 50', 'race-list', {}, {'pagination': 'cursor', 'page_size': 50}),
+            ('race detail', 'race-detail', race, {}),
+            ('races export csv', 'race-export', {}, {'format': 'csv'}),
+            ('participations', 'participation-list', {}, {}),
+            ('participations winners cursor 100', 'participation-list', {}, {
+                'position': 1, 'pagination': 'cursor', 'page_size': 100,
+            }),
+            ('participations by horse name', 'participation-list', {}, {'racehorse__name__icontains': term}),
+            ('participation detail', 'participation-detail', participation, {}),
+            ('participations export winners', 'participation-export', {}, {'format': 'ndjson', 'position': 1}),
+            ('users', 'user-list', {}, {}),
+            ('user detail', 'user-detail', user, {}),
+            ('horse leaderboard', 'horse-leaderboard-list', {}, {}),
+            ('horse leaderboard 2020 G1 by win rate', 'horse-leaderboard-list', {}, {
+                'year': 2020, 'classification': 'G1', 'ordering': '-win_rate', 'min_starts': 3,
+            }),
+            ('jockey leaderboard 2020 spring', 'jockey-leaderboard-list', {}, {'year': 2020, 'season': 'SP'}),
+            ('autocomplete', 'autocomplete', {}, {'q': term, 'type': 'racehorse'}),
+            ('async racehorses', 'async-racehorse-list', {}, {}),
+            ('async racehorse detail', 'async-racehorse-detail', horse, {}),
+            ('async races cursor 50', 'async-race-list', {}, {'pagination': 'cursor', 'page_size': 50}),
+            ('async race detail', 'async-race-detail', race, {}),
+            ('async participations', 'async-participation-list', {}, {}),
+            ('async participation detail', 'async-participation-detail', participation, {}),
+        ]
+
+    def check_coverage(self, cases):
+        routes = {getattr(pattern, 'name', None) for pattern in [*router.urls, *urlpatterns]} - {None}
+        missing = routes - SKIPPED_ROUTES - {url_name for _, url_name, _, _ in cases}
+        if missing:
+            raise CommandError(f"No benchmark case for route(s): {', '.join(sorted(missing))}")
+
+    def run(self, cases, options):
+        probe = Probe()
+        client = Client()
+        results = {}
+        with ExitStack() as stack:
+            # Measure the API itself: no Silk recording, throttling or request logging
+            stack.enter_context(override_settings(
+                MIDDLEWARE=[m for m in settings.MIDDLEWARE if not m.startswith('silk.')],
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ))
+            stack.enter_context(mock.patch.object(APIView, 'check_throttles', lambda self, request: None))
+            for cls, name in SERIALIZATION_METHODS:
+                stack.enter_context(mock.patch.object(cls, name, probe.timed(cls.__dict__[name])))
+            stack.enter_context(connection.execute_wrapper(probe))
+            logging.disable(logging.INFO)
+            stack.callback(logging.disable, logging.NOTSET)
+
+            for label, url_name, kwargs, params in cases:
+                if options['only'] and options['only'] not in label:
+                    continue
+                url = reverse(url_name, kwargs=kwargs)
+                samples = [
+                    self.measure(client, probe, label, url, params, options['warm_cache'])
+                    for _ in range(options['warmup'] + options['repeat'])
+                ][options['warmup']:]
+                results[label] = self.summarize(url, params, samples)
+        return results
+
+    def measure(self, client, probe, label, url, params, warm_cache):
+        if not warm_cache:
+            for namespace in NAMESPACES:
+                bump_namespace(namespace)
+        probe.reset()
+        started = time.perf_counter()
+        response = client.get(url, params)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f"{label}: {url} returned HTTP {response.status_code}")
+        return {
+            'latency': elapsed * 1000,
+            'queries': probe.queries,
+            'db': probe.db * 1000,
+            'serialization': (probe.serialization - probe.db_in_serialization) * 1000,
+            'bytes': len(body),
+        }
+
+    @staticmethod
+    def summarize(url, params, samples):
+        latencies = sorted(sample['latency'] for sample in samples)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        def median(name):
+            return statistics.median(sample[name] for sample in samples)
+
+        return {
+            'url': url,
+            'params': params,
+            'p50_ms': round(percentile(0.5), 3),
+            'p95_ms': round(percentile(0.95), 3),
+            'p99_ms': round(percentile(0.99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'queries': max(sample['queries'] for sample in samples),
+            'db_ms': round(median('db'), 3),
+            'serialization_ms': round(median('serialization'), 3),
+            'bytes': max(sample['bytes'] for sample in samples),
+        }
+
+    @staticmethod
+    def compare(results, baseline, threshold):
+        regressions = []
+        for label, current in results.items():
+            previous = baseline.get(label)
+            if previous is None:
+                continue
+            if current['queries'] > previous['queries']:
+                regressions.append(f"{label}: queries {previous['queries']} -> {current['queries']}")
+            for metric in ('p50_ms', 'p95_ms', 'db_ms', 'serialization_ms'):
+                before, after = previous[metric], current[metric]
+                if after - before > max(before * threshold, MIN_DELTA_MS):
+                    regressions.append(f"{label}: {metric} {before:.1f} -> {after:.1f}")
+            if current['bytes'] > previous['bytes'] * (1 + threshold):
+                regressions.append(f"{label}: bytes {previous['bytes']} -> {current['bytes']}")
+        return regressions
+
+    def print_results(self, results):
+        self.stdout.write(
+            f"{'case':<38} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'db ms':>8} "
+            f"{'ser ms':>8} {'bytes':>10}"
+        )
+        for label, result in results.items():
+            self.stdout.write(
+                f"{label:<38} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                f"{result['queries']:>7} {result['db_ms']:>8.2f} {result['serialization_ms']:>8.2f} "
+                f"{result['bytes']:>10}"
+            )
@@ -0,0 +1,185 @@
+import csv
+import json
+import os
+import time
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date, parse_duration
+
+from api.autocomplete import invalidate_autocomplete
+from api.bulk import insert_participations, upsert_by_name
+from api.cache import invalidate
+from api.models import Racehorse, Jockey, Race
+from api.stats import rebuild_stats
+
+RACE_FIELDS = (
+    'location', 'track_configuration', 'track_condition', 'classification',
+    'season', 'track_length', 'track_surface', 'prize_money', 'currency',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import historical race results from a CSV or NDJSON file with one result per line. "
+        "Columns: race_name, race_date, location, track_configuration, track_condition, classification, "
+        "season, track_length, track_surface, prize_money, currency, racehorse, breed, gender, birth_date, "
+        "country, jockey, position, finish_time, margin, odds"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension")
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Rows loaded per transaction")
+        parser.add_argument(
+            '--checkpoint',
+            help="Checkpoint file used to resume an interrupted import (default: <path>.checkpoint)",
+        )
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+        parser.add_argument('--skip-stats', action='store_true', help="Don't rebuild the career stats tables")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        checkpoint = {'offset': 0, 'rows': 0, 'inserted': 0, 'skipped': 0}
+        if os.path.exists(checkpoint_path) and not options['restart']:
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+            self.stdout.write(f"Resuming after {checkpoint['rows']} rows (byte {checkpoint['offset']}).")
+
+        # Name -> id maps are loaded once and grow as new entities are created
+        self.horses = dict(Racehorse.objects.values_list('name', 'id').iterator())
+        self.jockeys = dict(Jockey.objects.values_list('name', 'id').iterator())
+        self.races = {(name, day): pk for name, day, pk in Race.objects.values_list('name', 'date', 'id').iterator()}
+
+        started = time.monotonic()
+        rows_this_run = 0
+        with open(path, 'rb') as f:
+            header = None
+            if file_format == 'csv':
+                header = next(csv.reader([f.readline().decode('utf-8-sig')]))
+            if checkpoint['offset']:
+                f.seek(checkpoint['offset'])
+
+            chunk = []
+            while True:
+                line = f.readline()
+                if line.strip():
+                    chunk.append(self.parse_line(line.decode('utf-8'), header, checkpoint['rows'] + len(chunk) + 1))
+                if len(chunk) >= options['chunk_size'] or (not line and chunk):
+                    inserted, skipped = self.load_chunk([row for row in chunk if row is not None])
+                    skipped += chunk.count(None)
+                    checkpoint.update(
+                        offset=f.tell(),
+                        rows=checkpoint['rows'] + len(chunk),
+                        inserted=checkpoint['inserted'] + inserted,
+                        skipped=checkpoint['skipped'] + skipped,
+                    )
+                    with open(checkpoint_path, 'w') as out:
+                        json.dump(checkpoint, out)
+                    rows_this_run += len(chunk)
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f"{checkpoint['rows']} rows read, {checkpoint['inserted']} inserted, "
+                        f"{checkpoint['skipped']} skipped ({rows_this_run / elapsed:.0f} rows/s)"
+                    )
+                    chunk = []
+                if not line:
+                    break
+
+        if not options['skip_stats']:
+            self.stdout.write("Rebuilding career stats...")
+            rebuild_stats()
+        invalidate('participation')
+        invalidate_autocomplete()
+        os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Import complete: {checkpoint['inserted']} results inserted in {time.monotonic() - started:.1f}s."
+        ))
+
+    def parse_line(self, line, header, line_number):
+        try:
+            if header is not None:
+                record = dict(zip(header, next(csv.reader([line]))))
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError(f"expected a JSON object, got {type(record).__name__}")
+            record = {key: (value if value != '' else None) for key, value in record.items()}
+            race_date = parse_date(str(record['race_date']))
+            if race_date is None:
+                raise ValueError(f"invalid race_date {record['race_date']!r}")
+            for field in ('race_name', 'racehorse'):
+                if not isinstance(record[field], str) or not record[field].strip():
+                    raise ValueError(f"missing {field}")
+            position = int(record['position'])
+            if position < 1:
+                raise ValueError(f"invalid position {position}")
+            return {
+                'race': (record['race_name'], race_date),
+                'race_fields': {field: record[field] for field in RACE_FIELDS if record.get(field) is not None},
+                'racehorse': record['racehorse'],
+                'racehorse_fields': {
+                    'breed': record.get('breed') or '',
+                    'gender': record.get('gender') or Racehorse.GenderChoices.MALE,
+                    'birth_date': parse_date(record['birth_date']) if record.get('birth_date') else None,
+                    'country': record.get('country'),
+                },
+                'jockey': record.get('jockey'),
+                'position': position,
+                'finish_time': parse_duration(str(record['finish_time'])) if record.get('finish_time') else None,
+                'margin': Decimal(str(record['margin'])) if record.get('margin') is not None else None,
+                'odds': Decimal(str(record['odds'])) if record.get('odds') is not None else None,
+            }
+        except (KeyError, TypeError, ValueError, ArithmeticError, csv.Error) as e:
+            self.stderr.write(f"Line {line_number}: skipped ({e})")
+            return None
+
+    def load_chunk(self, rows):
+        skipped = 0
+        with transaction.atomic():
+            new_horses = {
+                row['racehorse']: row['racehorse_fields'] for row in rows if row['racehorse'] not in self.horses
+            }
+            new_jockeys = {
+                row['jockey']: {} for row in rows if row['jockey'] and row['jockey'] not in self.jockeys
+            }
+            self.horses.update(upsert_by_name(Racehorse, new_horses))
+            self.jockeys.update(upsert_by_name(Jockey, new_jockeys))
+
+            new_races = {}
+            for row in rows:
+                if row['race'] in self.races or row['race'] in new_races:
+                    continue
+                race = Race(name=row['race'][0], date=row['race'][1], **row['race_fields'])
+                try:
+                    race.full_clean(validate_unique=False)
+                except ValidationError as e:
+                    self.stderr.write(f"Race {row['race'][0]} on {row['race'][1]}: skipped ({e.messages[0]})")
+                    continue
+                new_races[row['race']] = race
+            for race in Race.objects.bulk_create(new_races.values(), batch_size=5000):
+                self.races[(race.name, race.date)] = race.id
+
+            participations = []
+            for row in rows:
+                race_id = self.races.get(row['race'])
+                if race_id is None:
+                    skipped += 1
+                    continue
+                participations.append((
+                    self.horses[row['racehorse']],
+                    race_id,
+                    self.jockeys.get(row['jockey']),
+                    row['position'],
+                    row['finish_time'],
+                    row['margin'],
+                    row['odds'],
+                ))
+            inserted = insert_participations(participations)
+        return inserted, skipped + len(participations) - inserted
@@ -0,0 +1,94 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urljoin, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/second and latency of the sync (WSGI) and async (ASGI) read endpoints at several "
+        "levels of concurrency. Start both servers first, e.g. `gunicorn racehorse_drf.wsgi -w 4 --threads 8 "
+        "-b :8000` and `uvicorn racehorse_drf.asgi:application --workers 4 --port 8001`; each client keeps "
+        "one HTTP/1.1 keep-alive connection and requests the paths in turn for --duration seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-url', default='http://127.0.0.1:8000/api/')
+        parser.add_argument('--async-url', default='http://127.0.0.1:8001/api/async/')
+        parser.add_argument(
+            '--paths', nargs='+', default=['racehorses/', 'races/', 'participations/', 'races/?page=2'],
+            help="Paths relative to both base URLs",
+        )
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[100, 500, 1000])
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per run")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'target':<6} {'clients':>7} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}"
+        )
+        for concurrency in options['concurrency']:
+            for target in ('sync', 'async'):
+                base = options[f'{target}_url']
+                urls = [urljoin(base, path) for path in options['paths']]
+                latencies, errors, elapsed = asyncio.run(self.run(urls, concurrency, options['duration']))
+                if not latencies:
+                    raise CommandError(f"No successful responses from {base} ({errors} errors)")
+                latencies.sort()
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                self.stdout.write(
+                    f"{target:<6} {concurrency:>7} {len(latencies):>9} {errors:>7} {len(latencies) / elapsed:>9.1f} "
+                    f"{statistics.median(latencies) * 1000:>8.1f} {p99 * 1000:>8.1f}"
+                )
+        self.stdout.write(self.style.SUCCESS("Load test complete!"))
+
+    async def run(self, urls, concurrency, duration):
+        latencies, errors = [], [0]
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            self.client(urls[i % len(urls):] + urls[:i % len(urls)], deadline, latencies, errors)
+            for i in range(concurrency)
+        ))
+        return latencies, errors[0], time.perf_counter() - started
+
+    async def client(self, urls, deadline, latencies, errors):
+        connection = None
+        i = 0
+        while time.perf_counter() < deadline:
+            url = urlsplit(urls[i % len(urls)])
+            i += 1
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection(url.hostname, url.port or 80)
+                status, keep_alive = await self.request(*connection, url)
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                status, keep_alive = None, False
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors[0] += 1
+            if not keep_alive and connection is not None:
+                connection[1].close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
+
+    async def request(self, reader, writer, url):
+        target = url.path + (f'?{url.query}' if url.query else '')
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {url.netloc}\r\nAccept: application/json\r\n\r\n".encode())
+        await writer.drain()
+        head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split()[1])
+        headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(':') for line in head[1:])}
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await reader.readexactly(int(headers.get('content-length', 0)))
+        return status, headers.get('connection', '').lower() != 'close'
@@ -1,14 +1,114 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
+from api.autocomplete import invalidate_autocomplete
+from api.bulk import insert_participations, upsert_by_name
+from api.cache import invalidate
 from api.models import Racehorse, Jockey, Race, Participation
+from api.stats import rebuild_stats
 from datetime import date, timedelta
+from decimal import Decimal
 import random
+import time
+
+HORSE_PREFIXES = [
+    "Special", "Silence", "Tokai", "Mejiro", "Oguri", "Gold", "Symboli", "Rice", "Narita", "Daiwa",
+    "Vodka", "Grass", "El Condor", "Air", "Manhattan", "Agnes", "Seiun", "Matikane", "Super", "King",
+    "Fine", "Mihono", "Twin", "Sakura", "Biko", "Nice", "Haru", "Kitasan", "Satono", "Admire",
+]
+HORSE_SUFFIXES = [
+    "Week", "Suzuka", "Teio", "McQueen", "Cap", "Ship", "Rudolf", "Shower", "Brian", "Scarlet",
+    "Wonder", "Pasa", "Groove", "Cafe", "Tachyon", "Sky", "Tannhauser", "Creek", "Flash", "Halo",
+    "Motion", "Bourbon", "Turbo", "Bakushin", "Pegasus", "Nature", "Urara", "Black", "Diamond", "Vega",
+]
+JOCKEY_FIRST_NAMES = [
+    "Yutaka", "Katsumi", "Hironobu", "Mirco", "Christophe", "Yuichi", "Norihiro", "Kenichi", "Hayato",
+    "Ryan", "Frankie", "William", "Oisin", "Joao", "Irad", "Flavien", "Mike", "Ryusei", "Takeshi", "Yuga",
+]
+JOCKEY_LAST_NAMES = [
+    "Take", "Ando", "Tanabe", "Demuro", "Lemaire", "Fukunaga", "Yokoyama", "Ikezoe", "Yoshida", "Moore",
+    "Dettori", "Buick", "Murphy", "Moreira", "Ortiz", "Prat", "Smith", "Sakai", "Kitamura", "Kawada",
+]
+LOCATIONS = [
+    ("Tokyo Racecourse", Race.TrackConfiguration.LEFT_HANDED),
+    ("Nakayama Racecourse", Race.TrackConfiguration.RIGHT_HANDED),
+    ("Hanshin Racecourse", Race.TrackConfiguration.RIGHT_HANDED),
+    ("Kyoto Racecourse", Race.TrackConfiguration.RIGHT_HANDED),
+    ("Chukyo Racecourse", Race.TrackConfiguration.LEFT_HANDED),
+    ("Niigata Racecourse", Race.TrackConfiguration.STRAIGHT),
+    ("Longchamp", Race.TrackConfiguration.RIGHT_HANDED),
+    ("Churchill Downs", Race.TrackConfiguration.LEFT_HANDED),
+]
+COUNTRIES = ["Japan", "Japan", "Japan", "Ireland", "France", "USA", "Great Britain", "Australia"]
+BREEDS = ["Thoroughbred"] * 9 + ["Arabian"]
+# (surface, weight, allowed conditions); conditions follow the rules in Race.clean
+SURFACES = [
+    (Race.TrackSurface.TURF, 55, sorted(Race.TURF_CONDITIONS)),
+    (Race.TrackSurface.DIRT, 40, sorted(Race.DIRT_CONDITIONS)),
+    (Race.TrackSurface.SYNTHETIC, 5, sorted(Race.SYNTHETIC_CONDITIONS)),
+]
+# (classification, weight, base prize money)
+CLASSIFICATIONS = [
+    (Race.Classification.GRADE_1, 2, 2000000),
+    (Race.Classification.GRADE_2, 4, 800000),
+    (Race.Classification.GRADE_3, 6, 500000),
+    (Race.Classification.LISTED, 8, 250000),
+    (Race.Classification.HANDICAP, 25, 120000),
+    (Race.Classification.MAIDEN, 30, 60000),
+    (Race.Classification.OTHER, 25, 80000),
+]
+SEASONS = {
+    12: Race.Season.WINTER, 1: Race.Season.WINTER, 2: Race.Season.WINTER,
+    3: Race.Season.SPRING, 4: Race.Season.SPRING, 5: Race.Season.SPRING,
+    6: Race.Season.SUMMER, 7: Race.Season.SUMMER, 8: Race.Season.SUMMER,
+    9: Race.Season.FALL, 10: Race.Season.FALL, 11: Race.Season.FALL,
+}
+# Generated races fall in a fixed window so a seed always gives the same data
+FIRST_RACE_DATE = date(2000, 1, 1)
+LAST_RACE_DATE = date(2024, 12, 31)
+# Races per meeting; the race number keeps same-day names at a venue apart
+RACES_PER_MEETING = 12
+
+
+def unique_names(count, make_name):
+    """count distinct names; repeats get a numeric suffix."""
+    seen = set()
+    names = []
+    for i in range(count):
+        name = make_name()
+        if name in seen:
+            name = f"{name} {i}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def random_date(rng, start, end):
+    return start + timedelta(days=rng.randrange((end - start).days + 1))
 
 class Command(BaseCommand):
-    help = "Populate the database with sample Umamusume racehorses, jockeys, and races"
+    help = (
+        "Populate the database with sample Umamusume racehorses, jockeys, and races. "
+        "--horses/--jockeys/--races add a deterministic synthetic dataset on top, e.g. "
+        "--horses 50000 --jockeys 2000 --races 100000 --runners-per-race 12 for 1.2M participations"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horses', type=int, default=0, help="Synthetic racehorses to generate")
+        parser.add_argument('--jockeys', type=int, default=0, help="Synthetic jockeys to generate")
+        parser.add_argument('--races', type=int, default=0, help="Synthetic races to generate")
+        parser.add_argument('--runners-per-race', type=int, default=12, help="Field size of every synthetic race")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed; the same seed gives the same data")
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Races written per transaction")
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
         self.stdout.write("Starting database population...")
+        self.populate_sample(random.Random(options['seed']))
+        if options['horses'] or options['jockeys'] or options['races']:
+            self.populate_synthetic(options)
+        self.stdout.write(self.style.SUCCESS("Database population complete!"))
+
+    def populate_sample(self, rng):
 
         # --- 1. Create Racehorses ---
         horses_data = [
@@ -70,11 +170,11 @@ class Command(BaseCommand):
         # --- 4. Create Participations ---
         for race in races:
             # Pick unique horses and unique jockeys for this race
-            participants = random.sample(horses, 3)
-            selected_jockeys = random.sample(jockeys, 3)
+            participants = rng.sample(horses, 3)
+            selected_jockeys = rng.sample(jockeys, 3)
 
             positions = list(range(1, len(participants) + 1))
-            random.shuffle(positions)
+            rng.shuffle(positions)
 
             for i, horse in enumerate(participants):
                 Participation.objects.get_or_create(
@@ -85,6 +185,134 @@ class Command(BaseCommand):
                 )
 
         self.stdout.write("Created race participations.")
-        self.stdout.write(self.style.SUCCESS("Database population complete!"))
+
+    def populate_synthetic(self, options):
+        seed = options['seed']
+        runners = options['runners_per_race']
+        if options['races'] and runners > min(options['horses'], options['jockeys']):
+            raise CommandError("--runners-per-race can't exceed --horses or --jockeys")
+        started = time.monotonic()
+
+        # --- 1. Racehorses and jockeys; names are unique, re-runs reuse existing rows ---
+        rng = random.Random(f"{seed}:horses")
+        horse_names = unique_names(
+            options['horses'], lambda: f"{rng.choice(HORSE_PREFIXES)} {rng.choice(HORSE_SUFFIXES)}"
+        )
+        horse_ids = []
+        for start in range(0, len(horse_names), options['chunk_size']):
+            horses = {
+                name: {
+                    "birth_date": random_date(rng, date(1995, 1, 1), date(2022, 6, 30)),
+                    "breed": rng.choice(BREEDS),
+                    "gender": rng.choices(list(Racehorse.GenderChoices), weights=[50, 35, 15])[0],
+                    "country": rng.choice(COUNTRIES),
+                }
+                for name in horse_names[start:start + options['chunk_size']]
+            }
+            ids = upsert_by_name(Racehorse, horses)
+            horse_ids.extend(ids[name] for name in horses)
+        self.stdout.write(f"Generated {len(horse_ids)} racehorses.")
+
+        rng = random.Random(f"{seed}:jockeys")
+        jockey_names = unique_names(
+            options['jockeys'], lambda: f"{rng.choice(JOCKEY_FIRST_NAMES)} {rng.choice(JOCKEY_LAST_NAMES)}"
+        )
+        jockey_ids = []
+        for start in range(0, len(jockey_names), options['chunk_size']):
+            jockeys = {
+                name: {
+                    "birth_date": random_date(rng, date(1960, 1, 1), date(2004, 12, 31)),
+                    "height_cm": Decimal(rng.randint(1500, 1750)) / 10,
+                    "weight_kg": Decimal(rng.randint(450, 560)) / 10,
+                }
+                for name in jockey_names[start:start + options['chunk_size']]
+            }
+            ids = upsert_by_name(Jockey, jockeys)
+            jockey_ids.extend(ids[name] for name in jockeys)
+        self.stdout.write(f"Generated {len(jockey_ids)} jockeys.")
+
+        # --- 2. Races and their fields, one transaction per chunk ---
+        # Races aren't unique by name, so a re-run skips (name, date) pairs that already exist.
+        # Each field is drawn from its own race-seeded generator, so skipping races
+        # doesn't shift the data generated for the ones after them.
+        rng = random.Random(f"{seed}:races")
+        existing = set(Race.objects.values_list('name', 'date').iterator())
+        created = inserted = skipped = 0
+        remaining = options['races']
+        while remaining > 0:
+            races = []
+            for _ in range(min(remaining, options['chunk_size'])):
+                races.append(self.synthetic_race(rng))
+            remaining -= len(races)
+            generated = len(races)
+            races = [race for race in races if (race.name, race.date) not in existing]
+            skipped += generated - len(races)
+            existing.update((race.name, race.date) for race in races)
+            with transaction.atomic():
+                races = Race.objects.bulk_create(races, batch_size=5000)
+                rows = []
+                for race in races:
+                    field_rng = random.Random(f"{seed}:{race.name}:{race.date}")
+                    rows.extend(self.synthetic_field(field_rng, race, horse_ids, jockey_ids, runners))
+                inserted += insert_participations(rows)
+            created += len(races)
+            rate = inserted / (time.monotonic() - started)
+            self.stdout.write(f"{created} races, {inserted} participations ({rate:.0f} rows/s)")
+
+        # Bulk inserts skip the per-row signal handlers
+        self.stdout.write("Rebuilding career stats...")
+        rebuild_stats()
+        invalidate('participation')
+        invalidate_autocomplete()
+        if skipped:
+            self.stdout.write(f"Skipped {skipped} races whose name and date already existed.")
+        self.stdout.write(f"Generated {created} races and {inserted} participations in {time.monotonic() - started:.1f}s.")
+
+    def synthetic_race(self, rng):
+        race_date = random_date(rng, FIRST_RACE_DATE, LAST_RACE_DATE)
+        location, configuration = rng.choice(LOCATIONS)
+        surface, _, conditions = rng.choices(SURFACES, weights=[weight for _, weight, _ in SURFACES])[0]
+        classification, _, prize = rng.choices(
+            CLASSIFICATIONS, weights=[weight for _, weight, _ in CLASSIFICATIONS]
+        )[0]
+        track_length = rng.choice(range(1000, 3601, 200))
+        number = rng.randint(1, RACES_PER_MEETING)
+        return Race(
+            name=f"{location.split()[0]} {number}R {track_length}m {Race.Classification(classification).label}",
+            date=race_date,
+            location=location,
+            track_configuration=configuration,
+            track_condition=rng.choice(conditions),
+            classification=classification,
+            season=SEASONS[race_date.month],
+            track_length=track_length,
+            track_surface=surface,
+            prize_money=Decimal(prize * rng.randint(8, 15) // 10),
+            currency="JPY",
+        )
+
+    def synthetic_field(self, rng, race, horse_ids, jockey_ids, runners):
+        """Participation rows ordered as api.bulk.PARTICIPATION_COLUMNS, winner first."""
+        # About 16.5 m/s for the winner, then each runner a little further behind
+        seconds = race.track_length / rng.uniform(15.5, 17.5)
+        margin = Decimal(0)
+        rows = []
+        for position, (horse_id, jockey_id) in enumerate(
+            zip(rng.sample(horse_ids, runners), rng.sample(jockey_ids, runners)), start=1
+        ):
+            if position > 1:
+                lengths = Decimal(rng.randint(1, 40)) / 10
+                margin = min(margin + lengths, Decimal('999.99'))
+                seconds += float(lengths) * 0.2
+            rows.append((
+                horse_id,
+                race.id,
+                jockey_id,
+                position,
+                timedelta(seconds=round(seconds, 1)),
+                margin if position > 1 else None,
+                Decimal(round(min(rng.lognormvariate(2, 0.9) + 1, 999), 1)).quantize(Decimal('0.01')),
+            ))
+        return rows
 
 
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.stats import rebuild_stats, verify_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the racehorse/jockey career stats tables and leaderboards and verify them against Participation"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only', action='store_true',
+            help="Only compare the stored stats with a from-scratch aggregation",
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help="Rows per bulk_create batch",
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            self.stdout.write("Rebuilding career stats...")
+            for label, total in rebuild_stats(chunk_size=options['chunk_size']).items():
+                self.stdout.write(f"Wrote {total} {label} rows.")
+
+        self.stdout.write("Verifying career stats...")
+        mismatches = verify_stats()
+        for label, pk, field, stored, expected in mismatches[:50]:
+            self.stdout.write(f"{label} {pk}: {field} is {stored}, expected {expected}")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} career stats mismatches found.")
+        self.stdout.write(self.style.SUCCESS("Career stats verified!"))
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+
+from api.slow_queries import ranked, reset
+
+
+class Command(BaseCommand):
+    help = "List the slow query fingerprints captured from requests, by total time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help="Fingerprints to list")
+        parser.add_argument('--plans', action='store_true', help="Also print each fingerprint's EXPLAIN ANALYZE plan")
+        parser.add_argument('--reset', action='store_true', help="Forget every captured fingerprint and plan")
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            reset()
+            self.stdout.write(self.style.SUCCESS("Slow queries reset."))
+            return
+
+        entries = ranked(options['limit'])
+        if not entries:
+            self.stdout.write("No slow queries captured.")
+            return
+        self.stdout.write(f"{'fingerprint':<16} {'count':>7} {'total ms':>11} {'mean ms':>9} {'max ms':>9}  sql")
+        for entry in entries:
+            self.stdout.write(
+                f"{entry['fingerprint']:<16} {entry['count']:>7} {entry['total_ms']:>11.1f} "
+                f"{entry['mean_ms']:>9.1f} {entry['max_ms']:>9.1f}  {entry['sql']}"
+            )
+            for site in entry['call_sites']:
+                field = f" {site['serializer_field']}" if site['serializer_field'] else ''
+                self.stdout.write(f"{'':>16} {site['count']:>7}x {site['view']}{field} at {site['code']}")
+            if options['plans']:
+                if entry['plan'] is None:
+                    self.stdout.write(f"{'':>16} (no plan yet)")
+                    continue
+                taken = datetime.fromtimestamp(entry['plan_at'], timezone.utc).isoformat(timespec='seconds')
+                self.stdout.write(
+                    f"{'':>16} plan taken {taken} for a run of {entry['plan_query_ms']:.1f} ms:"
+                )
+                for line in entry['plan'].splitlines():
+                    self.stdout.write(f"{'':>18}{line}")
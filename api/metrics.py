@@ -0,0 +1,352 @@
+# api/metrics.py
+"""
+Request metrics for production, exported at /metrics in the Prometheus text
+format.
+
+MetricsMiddleware times every request and attributes it to the view and
+action that served it (RacehorseViewSet/list, AutocompleteView/get, ...).
+While the request runs, a wrapper installed on every database connection
+counts its queries and their time, and MetricsCacheClient (the django-redis
+client class) counts its cache hits and misses. Latency and response size go
+into fixed-bucket histograms.
+
+Each worker process adds its numbers up in memory and, every
+METRICS_FLUSH_INTERVAL seconds, adds them to one Redis hash with
+HINCRBYFLOAT. The hash holds the totals of every worker and outlives
+restarts, as Prometheus counters should; /metrics renders it, so a scrape may
+miss up to one flush interval of another worker's requests.
+
+Nothing here touches the database and nothing but two additions runs per
+query, so unlike Silk this stays on in production (bench_metrics measures the
+overhead). Queries slower than SLOW_QUERY_MS go on to api.slow_queries.
+"""
+import bisect
+import contextvars
+import hmac
+import logging
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django_redis import get_redis_connection
+from django_redis.client import DefaultClient
+from redis.exceptions import RedisError
+
+from api import slow_queries
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = 'metrics:requests'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name: (type, help)
+FAMILIES = {
+    'api_requests_total': ('counter', "Requests served, by view, action and status code."),
+    'api_request_duration_seconds': ('histogram', "Time from the first middleware to the response."),
+    'api_response_size_bytes': ('histogram', "Response body size. Streamed responses are not counted."),
+    'api_db_queries_total': ('counter', "SQL queries run while serving requests."),
+    'api_db_query_duration_seconds_total': ('counter', "Time spent running those queries."),
+    'api_cache_hits_total': ('counter', "Cache reads that found a value."),
+    'api_cache_misses_total': ('counter', "Cache reads that found nothing."),
+    'api_response_cache_total': ('counter', "Cached responses by X-Cache-Status (HIT, STALE or MISS)."),
+}
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_MISSING = object()
+
+
+class RequestMetrics:
+    """What one request has done so far"""
+    __slots__ = ('request', 'started', 'queries', 'query_seconds', 'cache_hits', 'cache_misses', 'slow_query_seconds')
+
+    def __init__(self, request=None):
+        self.request = request
+        self.started = time.perf_counter()
+        self.slow_query_seconds = settings.SLOW_QUERY_MS / 1000
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.query_seconds += elapsed
+        if elapsed >= metrics.slow_query_seconds and metrics.request is not None:
+            capture_slow_query(sql, params, many, elapsed, metrics.request)
+
+
+def capture_slow_query(sql, params, many, seconds, request):
+    try:
+        slow_queries.capture(sql, params, many, seconds, *view_labels(request))
+    except Exception:
+        # Like the metrics themselves, never at the cost of the query
+        logger.exception("Could not record a slow query")
+
+
+@receiver(connection_created)
+def install_query_hook(sender, connection, **kwargs):
+    # Bottom of the stack: execute_wrapper() blocks opened before the
+    # connection was made pop their own wrapper off the top. Connections
+    # outside DATABASES (api.profiling's EXPLAIN one) are not the app's queries.
+    if connection.alias in settings.DATABASES and record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def record_cache_read(hit):
+    """Count a cache read made without the Django cache (e.g. through redis.asyncio)"""
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+class MetricsCacheClient(DefaultClient):
+    """django-redis client that counts the hits and misses of the request being served"""
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, default=_MISSING, version=version, client=client)
+        record_cache_read(value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        values = super().get_many(keys, version=version, client=client)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(values)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
+
+
+def _labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+
+
+class Series:
+    """
+        The counters of one view and action and their hash fields, built once.
+        Histogram buckets count only their own range here and are made
+        cumulative when taken.
+    """
+    QUERIES, QUERY_SECONDS, CACHE_HITS, CACHE_MISSES, DURATION_SUM, DURATION_COUNT, SIZE_SUM, SIZE_COUNT = range(8)
+    DURATION_BUCKETS = 8
+    SIZE_BUCKETS = DURATION_BUCKETS + len(LATENCY_BUCKETS) + 1
+
+    def __init__(self, view, action):
+        self.labels = labels = _labels(view=view, action=action)
+        self.fields = [
+            f'api_db_queries_total{{{labels}}}',
+            f'api_db_query_duration_seconds_total{{{labels}}}',
+            f'api_cache_hits_total{{{labels}}}',
+            f'api_cache_misses_total{{{labels}}}',
+            f'api_request_duration_seconds_sum{{{labels}}}',
+            f'api_request_duration_seconds_count{{{labels}}}',
+            f'api_response_size_bytes_sum{{{labels}}}',
+            f'api_response_size_bytes_count{{{labels}}}',
+        ]
+        for name, buckets in (('api_request_duration_seconds', LATENCY_BUCKETS), ('api_response_size_bytes', SIZE_BUCKETS)):
+            self.fields += [f'{name}_bucket{{{labels},le="{le}"}}' for le in (*buckets, '+Inf')]
+        self.counts = [0] * len(self.fields)
+        self.statuses = {}
+        self.cache_statuses = {}
+
+    def take(self):
+        """(field, increment) pairs since the last take()"""
+        counts, self.counts = self.counts, [0] * len(self.fields)
+        statuses, self.statuses = self.statuses, {}
+        cache_statuses, self.cache_statuses = self.cache_statuses, {}
+        if not counts[self.DURATION_COUNT]:
+            return []
+        for start, buckets in ((self.DURATION_BUCKETS, LATENCY_BUCKETS), (self.SIZE_BUCKETS, SIZE_BUCKETS)):
+            for i in range(start + 1, start + len(buckets) + 1):
+                counts[i] += counts[i - 1]
+        increments = list(zip(self.fields, counts))
+        increments += [(f'api_requests_total{{{self.labels},status="{status}"}}', count) for status, count in statuses.items()]
+        increments += [
+            (f'api_response_cache_total{{{self.labels},{_labels(status=status)}}}', count)
+            for status, count in cache_statuses.items()
+        ]
+        return increments
+
+
+class Registry:
+    """Counts of this process not yet added to Redis"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.unsent = {}
+        self.flush_at = time.monotonic() + settings.METRICS_FLUSH_INTERVAL
+
+    def observe(self, view, action, status, seconds, size, metrics, cache_status=None):
+        """Add one request; return True when it is time to flush()"""
+        series = self.series.get((view, action))
+        if series is None:
+            series = self.series.setdefault((view, action), Series(view, action))
+        with self.lock:
+            counts = series.counts
+            counts[Series.QUERIES] += metrics.queries
+            counts[Series.QUERY_SECONDS] += metrics.query_seconds
+            counts[Series.CACHE_HITS] += metrics.cache_hits
+            counts[Series.CACHE_MISSES] += metrics.cache_misses
+            counts[Series.DURATION_SUM] += seconds
+            counts[Series.DURATION_COUNT] += 1
+            counts[Series.DURATION_BUCKETS + bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            if size is not None:
+                counts[Series.SIZE_SUM] += size
+                counts[Series.SIZE_COUNT] += 1
+                counts[Series.SIZE_BUCKETS + bisect.bisect_left(SIZE_BUCKETS, size)] += 1
+            series.statuses[status] = series.statuses.get(status, 0) + 1
+            if cache_status:
+                series.cache_statuses[cache_status] = series.cache_statuses.get(cache_status, 0) + 1
+        return time.monotonic() >= self.flush_at
+
+    def flush(self):
+        with self.lock:
+            pending, self.unsent = self.unsent, {}
+            for series in self.series.values():
+                for field, value in series.take():
+                    pending[field] = pending.get(field, 0) + value
+            self.flush_at = time.monotonic() + settings.METRICS_FLUSH_INTERVAL
+        if not pending:
+            return
+        try:
+            pipeline = get_redis_connection('default').pipeline(transaction=False)
+            for field, value in pending.items():
+                pipeline.hincrbyfloat(REDIS_KEY, field, value)
+            pipeline.execute()
+        except RedisError:
+            logger.warning("Could not flush request metrics to Redis; keeping them for the next flush", exc_info=True)
+            with self.lock:
+                for field, value in pending.items():
+                    self.unsent[field] = self.unsent.get(field, 0) + value
+
+
+registry = Registry()
+
+
+def view_labels(request):
+    """(view, action) of the view that served request"""
+    match = getattr(request, 'resolver_match', None)
+    method = request.method.lower()
+    if match is None:
+        return '<unresolved>', method
+    func = match.func
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    actions = getattr(func, 'actions', None)
+    view = view_class.__name__ if view_class else match.view_name
+    return view, (actions.get(method) if actions else None) or method
+
+
+class MetricsMiddleware:
+    """
+        Records every request into the process registry. Put it first in
+        MIDDLEWARE so the latency covers the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics(request)
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if self.observe(request, response, metrics):
+            registry.flush()
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(request)
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        if self.observe(request, response, metrics):
+            await sync_to_async(registry.flush)()
+        return response
+
+    @staticmethod
+    def observe(request, response, metrics):
+        view, action = view_labels(request)
+        return registry.observe(
+            view, action, response.status_code, time.perf_counter() - metrics.started,
+            None if response.streaming else len(response.content), metrics, response.get('X-Cache-Status'),
+        )
+
+
+_SORT_LE = re.compile(r',le="([^"]+)"\}$')
+
+
+def _sort_key(field):
+    match = _SORT_LE.search(field)
+    if match is None:
+        return field, 0.0
+    return field[:match.start()], float(match.group(1))
+
+
+def render(totals):
+    """Prometheus text exposition of the {field: value} totals"""
+    family_of = {}
+    for name, (kind, _) in FAMILIES.items():
+        samples = (f'{name}_bucket', f'{name}_sum', f'{name}_count') if kind == 'histogram' else (name,)
+        for sample in samples:
+            family_of[sample] = name
+    by_family = {name: [] for name in FAMILIES}
+    for field in totals:
+        family = family_of.get(field.split('{', 1)[0])
+        if family:
+            by_family[family].append(field)
+
+    lines = []
+    for name, fields in by_family.items():
+        kind, help_text = FAMILIES[name]
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for field in sorted(fields, key=_sort_key):
+            lines.append(f'{field} {totals[field]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """GET /metrics for Prometheus; requires "Authorization: Bearer <METRICS_TOKEN>" when that is set"""
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    registry.flush()
+    totals = {
+        field.decode(): value.decode()
+        for field, value in get_redis_connection('default').hgetall(REDIS_KEY).items()
+    }
+    return HttpResponse(render(totals), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,91 @@
+# Generated by Django 5.1.1 on 2026-10-17 19:46
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+
+# Race.PRIZE_SHARES and Race.Classification.GRADE_1 as of this migration
+PRIZE_SHARES = {1: Decimal('0.60'), 2: Decimal('0.20'), 3: Decimal('0.10'), 4: Decimal('0.05'), 5: Decimal('0.03')}
+GRADE_1 = 'G1'
+STAT_FIELDS = ('starts', 'wins', 'places', 'g1_wins', 'earnings')
+
+
+def career_stats(participations, group_field):
+    """Career numbers per racehorse or jockey, computed like api.stats.aggregate_stats did here"""
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+    earnings = Sum(
+        Case(
+            *[
+                When(position=position, then=Round(F('race__prize_money') * Value(share), 2))
+                for position, share in PRIZE_SHARES.items()
+            ],
+            default=Value(Decimal('0')),
+            output_field=money,
+        ),
+        output_field=money,
+    )
+    return (
+        participations.filter(**{f'{group_field}__isnull': False})
+        .values(group_field)
+        .annotate(
+            starts=Count('id'),
+            wins=Count('id', filter=Q(position=1)),
+            places=Count('id', filter=Q(position__lte=3)),
+            g1_wins=Count('id', filter=Q(position=1, race__classification=GRADE_1)),
+            earnings=Coalesce(earnings, Value(Decimal('0')), output_field=money),
+        )
+        .order_by(group_field)
+    )
+
+
+def populate_career_stats(apps, schema_editor):
+    """Fill the new stats tables from the existing participations"""
+    Participation = apps.get_model('api', 'Participation')
+    for model_name, group_field in (('RacehorseStats', 'racehorse'), ('JockeyStats', 'jockey')):
+        Stats = apps.get_model('api', model_name)
+        Stats.objects.bulk_create(
+            Stats(**{f'{group_field}_id': row[group_field]}, **{f: row[f] for f in STAT_FIELDS})
+            for row in career_stats(Participation.objects.all(), group_field)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_user_avatar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JockeyStats',
+            fields=[
+                ('starts', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('places', models.PositiveIntegerField(default=0, help_text='Top three finishes')),
+                ('g1_wins', models.PositiveIntegerField(default=0)),
+                ('earnings', models.DecimalField(decimal_places=2, default=0, help_text='Share of prize_money won', max_digits=14)),
+                ('jockey', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.jockey')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RacehorseStats',
+            fields=[
+                ('starts', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('places', models.PositiveIntegerField(default=0, help_text='Top three finishes')),
+                ('g1_wins', models.PositiveIntegerField(default=0)),
+                ('earnings', models.DecimalField(decimal_places=2, default=0, help_text='Share of prize_money won', max_digits=14)),
+                ('racehorse', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.racehorse')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(populate_career_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Trigram indexes for the name/location searches (PostgreSQL only)
+
+from django.db import migrations
+
+# (table, column) pairs searched with icontains or ?search=. The indexes are
+# on UPPER(column::text), the expression Django compiles icontains to, so
+# LIKE '%term%' lookups and the trigram ranking can use them.
+TRIGRAM_INDEXES = [
+    ('api_racehorse', 'name'),
+    ('api_racehorse', 'breed'),
+    ('api_racehorse', 'country'),
+    ('api_jockey', 'name'),
+    ('api_race', 'name'),
+    ('api_race', 'location'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+            f'ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_career_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.1 on 2026-10-17 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jockey',
+            index=models.Index(fields=['birth_date'], name='jockey_birth_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(condition=models.Q(('position', 1)), fields=['racehorse'], name='participation_horse_wins_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['jockey', 'position'], name='participation_jockey_pos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['date', 'id'], name='race_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['classification', 'date'], name='race_classification_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['track_surface', 'date'], name='race_surface_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['season', 'date'], name='race_season_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['name'], name='race_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['track_length'], name='race_track_length_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['prize_money'], name='race_prize_money_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='racehorse',
+            index=models.Index(fields=['birth_date'], name='racehorse_birth_date_idx'),
+        ),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 5.1.1 on 2026-10-17 21:35
+
+import itertools
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+
+# Race.PRIZE_SHARES, Race.Classification.GRADE_1 and the leaderboard scopes as of this migration
+PRIZE_SHARES = {1: Decimal('0.60'), 2: Decimal('0.20'), 3: Decimal('0.10'), 4: Decimal('0.05'), 5: Decimal('0.03')}
+GRADE_1 = 'G1'
+STAT_FIELDS = ('starts', 'wins', 'places', 'g1_wins', 'earnings')
+SCOPE_LOOKUPS = {
+    'year': 'race__date__year',
+    'season': 'race__season',
+    'surface': 'race__track_surface',
+    'classification': 'race__classification',
+}
+ANY_SCOPE = {'year': 0, 'season': '', 'surface': '', 'classification': ''}
+
+
+def leaderboard_rows(participations, group_field):
+    """
+        Every leaderboard row, one aggregation per subset of scope fields kept
+        (the others are ANY), computed like api.stats.aggregate_leaderboard
+        did here
+    """
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+    earnings = Sum(
+        Case(
+            *[
+                When(position=position, then=Round(F('race__prize_money') * Value(share), 2))
+                for position, share in PRIZE_SHARES.items()
+            ],
+            default=Value(Decimal('0')),
+            output_field=money,
+        ),
+        output_field=money,
+    )
+    for kept in itertools.product((True, False), repeat=len(SCOPE_LOOKUPS)):
+        lookups = {field: lookup for (field, lookup), keep in zip(SCOPE_LOOKUPS.items(), kept) if keep}
+        rows = (
+            participations.filter(**{f'{group_field}__isnull': False})
+            .values(group_field, *lookups.values())
+            .annotate(
+                starts=Count('id'),
+                wins=Count('id', filter=Q(position=1)),
+                places=Count('id', filter=Q(position__lte=3)),
+                g1_wins=Count('id', filter=Q(position=1, race__classification=GRADE_1)),
+                earnings=Coalesce(earnings, Value(Decimal('0')), output_field=money),
+            )
+            .order_by(group_field)
+        )
+        for row in rows.iterator(chunk_size=2000):
+            yield {
+                group_field: row[group_field],
+                **{field: row[lookups[field]] if field in lookups else ANY_SCOPE[field] for field in SCOPE_LOOKUPS},
+                **{field: row[field] for field in STAT_FIELDS},
+                'win_rate': row['wins'] * 100 / row['starts'] if row['starts'] else 0.0,
+            }
+
+
+def populate_leaderboards(apps, schema_editor):
+    """Fill the new leaderboards from the existing participations"""
+    Participation = apps.get_model('api', 'Participation')
+    fields = (*SCOPE_LOOKUPS, *STAT_FIELDS, 'win_rate')
+    for model_name, group_field in (('RacehorseLeaderboard', 'racehorse'), ('JockeyLeaderboard', 'jockey')):
+        Leaderboard = apps.get_model('api', model_name)
+        rows = leaderboard_rows(Participation.objects.all(), group_field)
+        # bulk_create() would hold every row in memory at once
+        while batch := list(itertools.islice(rows, 5000)):
+            Leaderboard.objects.bulk_create(
+                Leaderboard(**{f'{group_field}_id': row[group_field]}, **{f: row[f] for f in fields}) for row in batch
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_workload_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JockeyLeaderboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('places', models.PositiveIntegerField(default=0, help_text='Top three finishes')),
+                ('g1_wins', models.PositiveIntegerField(default=0)),
+                ('earnings', models.DecimalField(decimal_places=2, default=0, help_text='Share of prize_money won', max_digits=14)),
+                ('year', models.PositiveSmallIntegerField(default=0, help_text='0 for all years')),
+                ('season', models.CharField(blank=True, choices=[('SP', 'Spring'), ('SU', 'Summer'), ('FA', 'Fall'), ('WI', 'Winter')], default='', max_length=2)),
+                ('surface', models.CharField(blank=True, choices=[('D', 'Dirt'), ('T', 'Turf'), ('S', 'Synthetic'), ('O', 'Other')], default='', max_length=2)),
+                ('classification', models.CharField(blank=True, choices=[('G1', 'Grade 1'), ('G2', 'Grade 2'), ('G3', 'Grade 3'), ('L', 'Listed'), ('H', 'Handicap'), ('M', 'Maiden'), ('O', 'Other')], default='', max_length=2)),
+                ('win_rate', models.FloatField(default=0, help_text='wins * 100 / starts')),
+                ('jockey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_rows', to='api.jockey')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'season', 'surface', 'classification', '-wins', '-jockey'], name='jockey_board_wins_idx'), models.Index(fields=['year', 'season', 'surface', 'classification', '-win_rate', '-jockey'], name='jockey_board_win_rate_idx'), models.Index(fields=['year', 'season', 'surface', 'classification', '-g1_wins', '-jockey'], name='jockey_board_g1_wins_idx'), models.Index(fields=['year', 'season', 'surface', 'classification', '-earnings', '-jockey'], name='jockey_board_earnings_idx'), models.Index(fields=['year', 'season', 'surface', 'classification', '-places', '-jockey'], name='jockey_board_places_idx')],
+                'constraints': [models.UniqueConstraint(fields=('jockey', 'year', 'season', 'surface', 'classification'), name='jockey_board_scope_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RacehorseLeaderboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('places', models.PositiveIntegerField(default=0, help_text='Top three finishes')),
+                ('g1_wins', models.PositiveIntegerField(default=0)),
+                ('earnings', models.DecimalField(decimal_places=2, default=0, help_text='Share of prize_money won', max_digits=14)),
+                ('year', models.PositiveSmallIntegerField(default=0, help_text='0 for all years')),
+                ('season', models.CharField(blank=True, choices=[('SP', 'Spring'), ('SU', 'Summer'), ('FA', 'Fall'), ('WI', 'Winter')], default='', max_length=2)),
+                ('surface', models.CharField(blank=True, choices=[('D', 'Dirt'), ('T', 'Turf'), ('S', 'Synthetic'), ('O', 'Other')], default='', max_length=2)),
+                ('classification', models.CharField(blank=True, choices=[('G1', 'Grade 1'), ('G2', 'Grade 2'), ('G3', 'Grade 3'), ('L', 'Listed'), ('H', 'Handicap'), ('M', 'Maiden'), ('O', 'Other')], default='', max_length=2)),
+                ('win_rate', models.FloatField(default=0, help_text='wins * 100 / starts')),
+                ('racehorse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_rows', to='api.racehorse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'season', 'surface', 'classification', '-wins', '-racehorse'], name='horse_board_wins_idx'), models.Index(fields=['year', 'season', 'surface', 'classification', '-win_rate', '-racehorse'], name='horse_board_win_rate_idx'), models.Index(fields=['year', 'season', 'surface', 'classification', '-g1_wins', '-racehorse'], name='horse_board_g1_wins_idx'), models.Index(fields=['year', 'season', 'surface', 'classification', '-earnings', '-racehorse'], name='horse_board_earnings_idx'), models.Index(fields=['year', 'season', 'surface', 'classification', '-places', '-racehorse'], name='horse_board_places_idx')],
+                'constraints': [models.UniqueConstraint(fields=('racehorse', 'year', 'season', 'surface', 'classification'), name='horse_board_scope_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_leaderboards, migrations.RunPython.noop),
+    ]
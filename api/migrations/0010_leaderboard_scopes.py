@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Q
+
+ANY = ''
+
+
+def delete_unserved_scopes(apps, schema_editor):
+    """
+        Leaderboards now keep all races, one scope field alone, or the year
+        with one other field: drop the rows pinning two or more of season,
+        surface and classification.
+    """
+    pairs = (('season', 'surface'), ('season', 'classification'), ('surface', 'classification'))
+    unserved = Q()
+    for first, second in pairs:
+        unserved |= ~Q(**{first: ANY}) & ~Q(**{second: ANY})
+    for model_name in ('RacehorseLeaderboard', 'JockeyLeaderboard'):
+        apps.get_model('api', model_name).objects.filter(unserved).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_leaderboards'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_unserved_scopes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,232 @@
+# api/mixins.py
+import hashlib
+import time
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from api.cache import namespace_version, namespace_state
+from api.renderers import NDJSONStreamRenderer, CSVStreamRenderer
+
+
+def normalized_query(request, ignored=(), defaults=None):
+    """
+        Sorted query parameters without empty values, ignored parameters or
+        parameters set to their default, so equivalent URLs compare equal.
+    """
+    defaults = defaults or {}
+    params = []
+    for name, values in request.query_params.lists():
+        if name in ignored:
+            continue
+        for value in values:
+            if value == '' or defaults.get(name) == value:
+                continue
+            params.append((name, value))
+    return urlencode(sorted(params))
+
+
+class CachedResponseMixin:
+    """
+        Cache list and retrieve responses with stampede protection.
+
+        Entries are fresh for cache_soft_ttl seconds and kept until
+        cache_hard_ttl. Once an entry goes stale, the first request to take the
+        Redis lock recomputes it while everyone else keeps getting the stale
+        copy. On a cold key, requests that lose the lock wait briefly for the
+        winner instead of all running the expensive list at once. The
+        X-Cache-Status header reports HIT, STALE or MISS.
+
+        Responses are shared by all users: the key is built from the path and
+        the normalized query string only. Views whose output depends on the
+        requesting user must set cache_vary_on_user = True.
+    """
+    cache_namespace = None
+    cache_vary_on_user = False
+    # Query parameters whose value here is the same as leaving them out
+    cache_default_params = {'page': '1'}
+    # Query parameters that never change the response data
+    cache_ignored_params = ('format',)
+    cache_soft_ttl = 60 * 15
+    cache_hard_ttl = 60 * 20
+    cache_lock_timeout = 30
+    cache_wait_timeout = 10
+    cache_wait_interval = 0.05
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def get_cache_digest(self, request):
+        query = normalized_query(request, self.cache_ignored_params, self.cache_default_params)
+        # Image fields are rendered as absolute URLs, so scheme and host are part of the payload
+        parts = [request.scheme, request.get_host(), request.path, query]
+        if self.cache_vary_on_user:
+            parts.append(str(request.user.id if request.user.is_authenticated else 'anon'))
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def get_cache_key(self, request):
+        namespace = self.cache_namespace
+        return f'{namespace}_{self.action}_v{namespace_version(namespace)}_{self.get_cache_digest(request)}'
+
+    def cached_response(self, request, compute, *args, **kwargs):
+        key = self.get_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None and entry['fresh_until'] > time.time():
+            return self._cached_response(entry, 'HIT')
+
+        lock_key = f'{key}:lock'
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, self.cache_lock_timeout):
+            try:
+                return self._compute_and_store(key, compute, request, *args, **kwargs)
+            finally:
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+
+        # Another worker is recomputing this key
+        if entry is not None:
+            return self._cached_response(entry, 'STALE')
+        deadline = time.time() + self.cache_wait_timeout
+        while time.time() < deadline:
+            time.sleep(self.cache_wait_interval)
+            entry = cache.get(key)
+            if entry is not None:
+                return self._cached_response(entry, 'HIT')
+        return self._compute_and_store(key, compute, request, *args, **kwargs)
+
+    def _compute_and_store(self, key, compute, request, *args, **kwargs):
+        response = compute(request, *args, **kwargs)
+        if response.status_code == 200:
+            entry = {'data': response.data, 'fresh_until': time.time() + self.cache_soft_ttl}
+            cache.set(key, entry, self.cache_hard_ttl)
+        response['X-Cache-Status'] = 'MISS'
+        return response
+
+    def _cached_response(self, entry, status):
+        response = Response(entry['data'])
+        response['X-Cache-Status'] = status
+        return response
+
+
+class ConditionalGetMixin:
+    """
+        ETag/Last-Modified support for list and retrieve.
+
+        The validators come from the version and last bump time of
+        cache_namespace only, which every write to the view's model or to
+        the data nested in it already updates (see api.cache), so working
+        them out never touches the database. Matching
+        If-None-Match/If-Modified-Since requests get a 304 before any
+        serializer runs.
+    """
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+    def get_validators(self, request):
+        version, bumped_at = namespace_state(self.cache_namespace)
+        last_modified = int(bumped_at)
+        query = normalized_query(request, ('format',), {'page': '1'})
+        digest = hashlib.md5(f'{request.path}|{query}|{version}'.encode()).hexdigest()
+        return f'W/"{digest}"', last_modified
+
+    def conditional_response(self, request, compute, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        response = not_modified or compute(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class SparseFieldsetViewMixin:
+    """
+        Lets get_queryset skip the joins, prefetches and annotations behind
+        fields the serializer will not render: those left out with ?fields=
+        and the nested lists not asked for with ?expand= (see
+        api.serializers.SparseFieldsetMixin).
+    """
+    def field_requested(self, *names):
+        serializer_class = self.get_serializer_class()
+        if self.action not in ('list', 'retrieve') or not hasattr(serializer_class, 'selected_fields'):
+            return True
+        selected = serializer_class.selected_fields(self.request)
+        if selected is None:
+            return not set(names) <= serializer_class.unexpanded_fields(self.request)
+        return not selected.isdisjoint(names)
+
+
+class ExportMixin:
+    """
+        GET <list url>/export/?format=ndjson|csv streams every row matching the
+        view's filters, search and ordering.
+
+        Rows are read with values_list() through iterator(), which uses a
+        server-side cursor on PostgreSQL, and encoded a chunk at a time into a
+        StreamingHttpResponse, so memory stays flat and the first bytes go out
+        after the first chunk whatever the size of the export. export_fields
+        maps output columns to model field lookups.
+    """
+    export_fields = {}
+    export_chunk_size = 2000
+
+    def get_export_queryset(self):
+        # Plain manager queryset: no annotations or prefetches to build per row
+        return self.queryset.model._default_manager.order_by('pk')
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONStreamRenderer, CSVStreamRenderer])
+    def export(self, request, *args, **kwargs):
+        columns = list(self.export_fields)
+        queryset = self.filter_queryset(self.get_export_queryset())
+        rows = queryset.values_list(*self.export_fields.values()).iterator(chunk_size=self.export_chunk_size)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(rows, columns),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.basename}s.{renderer.format}"'
+        return response
+
+
+class FastListMixin:
+    """
+        Serve the list action through fast_serializer_class (see api.fastpath)
+        when FAST_LIST_SERIALIZATION is on. Filtering, search, ordering and
+        pagination run on the values() queryset exactly as they would on
+        instances; the keyset ordering fields are always selected so cursor
+        pagination can read them off the rows.
+    """
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_serializer_class is None or not getattr(settings, 'FAST_LIST_SERIALIZATION', False):
+            return super().list(request, *args, **kwargs)
+        fast = self.fast_serializer_class(self.get_serializer_context())
+        queryset = self.get_fast_queryset(fast)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(queryset))
+
+    def get_fast_queryset(self, fast):
+        """The filtered values() queryset fast renders from"""
+        keyset_paths = [
+            'id' if field == 'pk' else field
+            for ordering in getattr(self, 'keyset_orderings', ()) for field in ordering
+        ]
+        return fast.prepare(self.filter_queryset(self.get_queryset()), keyset_paths)
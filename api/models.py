@@ -1,4 +1,7 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 
@@ -11,6 +14,20 @@ class User(AbstractUser):
         default="avatars/default.png"  # optional default image
     )
 
+# Career stats (total races, wins, G1 wins) read from the denormalized stats table
+class CareerStatsQuerySet(models.QuerySet):
+    def with_stats(self):
+        """
+            Annotate num_races, num_wins and num_g1_wins from the related stats
+            row (kept up to date by api.signals) so serializers don't run a
+            COUNT per row. Entities without a stats row yet report zeros.
+        """
+        return self.annotate(
+            num_races=Coalesce('stats__starts', Value(0)),
+            num_wins=Coalesce('stats__wins', Value(0)),
+            num_g1_wins=Coalesce('stats__g1_wins', Value(0)),
+        )
+
 # This is the model for the Racehorse (name, age, breed)
 class Racehorse(models.Model):
     class GenderChoices(models.TextChoices):
@@ -28,6 +45,13 @@ class Racehorse(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CareerStatsQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['birth_date'], name='racehorse_birth_date_idx'),
+        ]
+
     @property
     def total_races(self):
         return self.participations.count()
@@ -69,6 +93,13 @@ class Jockey(models.Model):
     birth_date = models.DateField(blank=True, null=True)
     racehorses = models.ManyToManyField(Racehorse, through="Participation", related_name='jockeys')
 
+    objects = CareerStatsQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['birth_date'], name='jockey_birth_date_idx'),
+        ]
+
     @property
     def age(self):
         from datetime import date
@@ -102,6 +133,28 @@ class Jockey(models.Model):
         return self.name
 
     
+# Winner and field size read with the race row instead of two queries per race
+class RaceQuerySet(models.QuerySet):
+    @staticmethod
+    def summary_annotations():
+        """
+            winner_name and participant_count as correlated subqueries, for
+            with_summary() and for values() querysets (api.fastpath)
+        """
+        runners = Participation.objects.filter(race=OuterRef('pk'))
+        return {
+            # Same pick as Race.winner: the first-placed runner
+            'winner_name': Subquery(
+                runners.filter(position=1).order_by('position', 'pk').values('racehorse__name')[:1]
+            ),
+            'participant_count': Coalesce(Subquery(
+                runners.order_by().values('race').annotate(count=Count('pk')).values('count')
+            ), Value(0)),
+        }
+
+    def with_summary(self):
+        return self.annotate(**self.summary_annotations())
+
 # This is the model for the Race (name, date, location, 
 # track_configuration, track_condition, classification, season, track_length, track_surface)
 class Race(models.Model):
@@ -147,6 +200,15 @@ class Race(models.Model):
         FALL = 'FA', 'Fall'
         WINTER = 'WI', 'Winter'
 
+    # Share of prize_money paid out per finishing position
+    PRIZE_SHARES = {
+        1: Decimal('0.60'),
+        2: Decimal('0.20'),
+        3: Decimal('0.10'),
+        4: Decimal('0.05'),
+        5: Decimal('0.03'),
+    }
+
     DIRT_CONDITIONS = {'fast', 'frozen', 'good', 'heavy', 'muddy', 'sloppy', 'slow', 'wet_fast'}
     TURF_CONDITIONS = {'firm', 'good', 'hard', 'soft', 'yielding'}
     SYNTHETIC_CONDITIONS = {'standard', 'wet_fast', 'sloppy', 'frozen', 'harsh'}
@@ -169,6 +231,20 @@ class Race(models.Model):
 
     track_surface = models.CharField(max_length=2, choices=TrackSurface.choices)
 
+    objects = RaceQuerySet.as_manager()
+
+    class Meta:
+        # Match RaceFilter and the list orderings; date is paired with id for keyset pages
+        indexes = [
+            models.Index(fields=['date', 'id'], name='race_date_idx'),
+            models.Index(fields=['classification', 'date'], name='race_classification_date_idx'),
+            models.Index(fields=['track_surface', 'date'], name='race_surface_date_idx'),
+            models.Index(fields=['season', 'date'], name='race_season_date_idx'),
+            models.Index(fields=['name'], name='race_name_idx'),
+            models.Index(fields=['track_length'], name='race_track_length_idx'),
+            models.Index(fields=['prize_money'], name='race_prize_money_idx'),
+        ]
+
     @property
     def winner(self):
         winner_participation = self.participations.filter(position=1).select_related('racehorse').first()
@@ -180,6 +256,11 @@ class Race(models.Model):
     
     def __str__(self):
         return f"{self.name} on {self.date}"
+
+    def save(self, *args, **kwargs):
+        # Run the career-stats handlers in api.signals inside the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
     
     def clean(self):
         super().clean()
@@ -190,6 +271,24 @@ class Race(models.Model):
         elif self.track_surface == self.TrackSurface.SYNTHETIC and self.track_condition not in self.SYNTHETIC_CONDITIONS:
             raise ValidationError({'track_condition': 'Invalid track condition for synthetic surface.'})
     
+class ParticipationQuerySet(models.QuerySet):
+    def partnerships(self, jockeys):
+        """
+            Group participations by (jockey, racehorse) for the given jockeys and
+            return {jockey_id: [row, ...]} where each row carries the horse name
+            and the total/win counts for that pairing. One query for all jockeys.
+        """
+        rows = (
+            self.filter(jockey__in=jockeys)
+            .values('jockey_id', 'racehorse_id', 'racehorse__name')
+            .annotate(total=Count('id'), wins=Count('id', filter=Q(position=1)))
+            .order_by('jockey_id', 'racehorse_id')
+        )
+        breakdown = {}
+        for row in rows:
+            breakdown.setdefault(row['jockey_id'], []).append(row)
+        return breakdown
+
 # This is the model for the race entry (racehorse, race, jockey, position, is_winner)
 class Participation(models.Model):
     racehorse = models.ForeignKey(Racehorse, related_name='participations', on_delete=models.CASCADE)
@@ -200,12 +299,19 @@ class Participation(models.Model):
     margin = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True, help_text="Lengths behind the winner")
     odds = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True, help_text="Starting odds")
 
+    objects = ParticipationQuerySet.as_manager()
+
     class Meta:
         ordering = ['position']
         constraints = [
             models.UniqueConstraint(fields=['race', 'racehorse'], name='unique_race_racehorse'),
             models.UniqueConstraint(fields=['race', 'jockey'], name='unique_race_jockey')
         ]
+        indexes = [
+            # Wins per horse (total_wins, g1_wins, partnerships) only read first places
+            models.Index(fields=['racehorse'], condition=models.Q(position=1), name='participation_horse_wins_idx'),
+            models.Index(fields=['jockey', 'position'], name='participation_jockey_pos_idx'),
+        ]
 
     @property
     def result_status(self):
@@ -222,5 +328,107 @@ class Participation(models.Model):
     def is_winner(self):
         return self.position == 1
 
+    def save(self, *args, **kwargs):
+        # Run the career-stats handlers in api.signals inside the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.racehorse.name} in {self.race.name} - Position: {self.position} {'(Winner)' if self.is_winner else ''}"
+
+# Denormalized career numbers, updated incrementally by api.signals and
+# rebuilt in bulk by the rebuild_stats management command
+class CareerStats(models.Model):
+    starts = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    places = models.PositiveIntegerField(default=0, help_text="Top three finishes")
+    g1_wins = models.PositiveIntegerField(default=0)
+    earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Share of prize_money won")
+
+    STAT_FIELDS = ('starts', 'wins', 'places', 'g1_wins', 'earnings')
+
+    class Meta:
+        abstract = True
+
+    @property
+    def win_rate(self):
+        return (self.wins / self.starts) * 100 if self.starts > 0 else 0
+
+class RacehorseStats(CareerStats):
+    racehorse = models.OneToOneField(Racehorse, primary_key=True, related_name='stats', on_delete=models.CASCADE)
+
+    def __str__(self):
+        return f"Stats for {self.racehorse_id}"
+
+class JockeyStats(CareerStats):
+    jockey = models.OneToOneField(Jockey, primary_key=True, related_name='stats', on_delete=models.CASCADE)
+
+    def __str__(self):
+        return f"Stats for {self.jockey_id}"
+
+# Leaderboards: career numbers per scope of races, updated with the stats
+# tables by api.stats.apply_results() and rebuilt with them
+class Leaderboard(CareerStats):
+    """
+        One horse's or jockey's numbers over the races of one year, season,
+        surface and classification. A scope field left at ANY (0 or '')
+        covers all its values. Only the combinations in SCOPES are kept, so
+        every result counts in one row of its subject per entry there, and
+        any ranking the endpoint serves is a range of one index.
+    """
+    ANY_YEAR = 0
+    ANY = ''
+    SCOPE_FIELDS = ('year', 'season', 'surface', 'classification')
+    # Scope fields a leaderboard can be narrowed by together: all races, any
+    # one field, or the year with one of the others
+    SCOPES = (
+        (), ('year',), ('season',), ('surface',), ('classification',),
+        ('year', 'season'), ('year', 'surface'), ('year', 'classification'),
+    )
+    # Orderings served by /api/leaderboards/, each backed by an index
+    RANKINGS = ('wins', 'win_rate', 'g1_wins', 'earnings', 'places')
+
+    year = models.PositiveSmallIntegerField(default=ANY_YEAR, help_text="0 for all years")
+    season = models.CharField(max_length=2, blank=True, default=ANY, choices=Race.Season.choices)
+    surface = models.CharField(max_length=2, blank=True, default=ANY, choices=Race.TrackSurface.choices)
+    classification = models.CharField(max_length=2, blank=True, default=ANY, choices=Race.Classification.choices)
+    # Stored rather than computed so it can be ranked through an index
+    win_rate = models.FloatField(default=0, help_text="wins * 100 / starts")
+
+    class Meta:
+        abstract = True
+
+
+def leaderboard_constraints(prefix, subject):
+    # Also the conflict target of the upsert in api.stats
+    return [models.UniqueConstraint(fields=[subject, *Leaderboard.SCOPE_FIELDS], name=f'{prefix}_scope_uniq')]
+
+
+def leaderboard_indexes(prefix, subject):
+    # Scope, then the ranking and the keyset tie-breaker, both descending
+    return [
+        models.Index(fields=[*Leaderboard.SCOPE_FIELDS, f'-{ranking}', f'-{subject}'], name=f'{prefix}_{ranking}_idx')
+        for ranking in Leaderboard.RANKINGS
+    ]
+
+
+class RacehorseLeaderboard(Leaderboard):
+    racehorse = models.ForeignKey(Racehorse, related_name='leaderboard_rows', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = leaderboard_constraints('horse_board', 'racehorse')
+        indexes = leaderboard_indexes('horse_board', 'racehorse')
+
+    def __str__(self):
+        return f"Leaderboard row for {self.racehorse_id}"
+
+
+class JockeyLeaderboard(Leaderboard):
+    jockey = models.ForeignKey(Jockey, related_name='leaderboard_rows', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = leaderboard_constraints('jockey_board', 'jockey')
+        indexes = leaderboard_indexes('jockey_board', 'jockey')
+
     def __str__(self):
-        return f"{self.racehorse.name} in {self.race.name} - Position: {self.position} {'(Winner)' if self.is_winner else ''}"
\ No newline at end of file
+        return f"Leaderboard row for {self.jockey_id}"
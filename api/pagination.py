@@ -0,0 +1,266 @@
+# api/pagination.py
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+        Keyset (seek) pagination over one of the view's keyset_orderings.
+
+        Each page is fetched with WHERE (a, b) > (last a, last b) ORDER BY a, b
+        LIMIT n, so the cost does not grow with depth and no COUNT(*) is run.
+        The cursor encodes the ordering values of the boundary row; they are
+        checked against the ordering's model fields before any query runs.
+        ?ordering= picks one of the allowed orderings; a leading '-' on its
+        first field reverses the whole key.
+    """
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.set_page([row async for row in self.page_queryset(queryset, request, view)])
+
+    def page_queryset(self, queryset, request, view):
+        """The query for one page plus a look-ahead row"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, view)
+        self.cursor = self.decode_cursor(request, queryset.model)
+
+        self.backwards = self.cursor is not None and self.cursor['direction'] == 'previous'
+        ordering = [self.flip(field) for field in self.ordering] if self.backwards else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.seek(ordering, self.cursor['values']))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.backwards:
+            rows.reverse()
+        self.has_next = has_more if not self.backwards else True
+        self.has_previous = self.cursor is not None if not self.backwards else has_more
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, request, view):
+        allowed = getattr(view, 'keyset_orderings', (('pk',),))
+        requested = request.query_params.get(self.ordering_query_param, '')
+        requested = [field.strip() for field in requested.split(',') if field.strip()]
+        descending = bool(requested) and requested[0].startswith('-')
+        fields = [field.lstrip('-') for field in requested]
+        if not fields:
+            return list(allowed[0])
+        for ordering in allowed:
+            # Accept the ordering with or without its tie-breaker field
+            if fields in (list(ordering), list(ordering[:-1])):
+                break
+        else:
+            ordering = allowed[0]
+        return [f'-{field}' if descending else field for field in ordering]
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def seek(ordering, values):
+        """
+            (a, b, c) after (x, y, z) as a OR of equality prefixes, ANDed with
+            a >= x. The OR alone is not sargable; the bound on the leading
+            field gives the planner an index range to start the scan from.
+        """
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            prefix = {f.lstrip('-'): value for f, value in zip(ordering[:i], values[:i])}
+            condition |= Q(**prefix, **{f'{name}__{lookup}': values[i]})
+        if len(ordering) > 1:
+            lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+            condition &= Q(**{f'{ordering[0].lstrip("-")}__{lookup}': values[0]})
+        return condition
+
+    @staticmethod
+    def model_field(model, name):
+        """The model field an ordering lookup such as race__date ends on"""
+        *relations, last = name.split(LOOKUP_SEP)
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.pk if last == 'pk' else model._meta.get_field(last)
+
+    @staticmethod
+    def value_of(row, field):
+        name = field.lstrip('-')
+        if isinstance(row, dict):
+            # values() rows (the fast list path) carry the lookup as a key
+            value = row['id' if name == 'pk' else name]
+        else:
+            value = row
+            for part in name.split('__'):
+                value = getattr(value, part)
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if cursor['direction'] not in ('next', 'previous') or len(cursor['values']) != len(self.ordering):
+                raise ValueError
+            # A tampered value would otherwise only fail inside the query
+            cursor['values'] = [
+                self.model_field(model, field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, cursor['values'])
+            ]
+            if None in cursor['values']:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, row, direction):
+        cursor = {'direction': direction, 'values': [self.value_of(row, field) for field in self.ordering]}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], 'next')
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], 'previous')
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class LeaderboardPagination(KeysetPagination):
+    """
+        KeysetPagination that ranks best first: without ?ordering= the view's
+        first keyset ordering runs descending. Each page is then a single
+        query walking one leaderboard index.
+    """
+    def get_ordering(self, request, view):
+        if not request.query_params.get(self.ordering_query_param, '').strip():
+            return [self.flip(field) for field in view.keyset_orderings[0]]
+        return super().get_ordering(request, view)
+
+
+class SelectablePagination(PageNumberPagination):
+    """
+        Page-number pagination by default; ?pagination=cursor (or any ?cursor=)
+        switches the request to KeysetPagination, so existing page clients
+        keep working unchanged.
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+        return await apaginate_page_number(self, queryset, request, view)
+
+    def use_keyset(self, request):
+        return request.query_params.get(self.mode_query_param) == 'cursor' or 'cursor' in request.query_params
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+async def apaginate_page_number(pagination, queryset, request, view=None):
+    """
+        PageNumberPagination.paginate_queryset through the async ORM. The
+        COUNT is awaited and handed to the Django paginator, so validating the
+        page number and building the links run no query.
+    """
+    page_size = pagination.get_page_size(request)
+    if not page_size:
+        return None
+    paginator = pagination.django_paginator_class(queryset, page_size)
+    paginator.count = await queryset.acount()
+    page_number = pagination.get_page_number(request, paginator)
+    try:
+        pagination.page = paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    pagination.page.object_list = [row async for row in pagination.page.object_list]
+    if paginator.num_pages > 1 and pagination.template is not None:
+        pagination.display_page_controls = True
+    pagination.request = request
+    return list(pagination.page)
+
+
+async def apaginate_queryset(pagination, queryset, request, view=None):
+    """Async paginate_queryset for the paginators the API uses"""
+    if pagination is None:
+        return None
+    if hasattr(pagination, 'apaginate_queryset'):
+        return await pagination.apaginate_queryset(queryset, request, view)
+    if isinstance(pagination, PageNumberPagination):
+        return await apaginate_page_number(pagination, queryset, request, view)
+    raise TypeError(f"{type(pagination).__name__} has no async support")
@@ -0,0 +1,376 @@
+# api/profiling.py
+"""
+Request profiling that is safe to leave on in production.
+
+ProfilingMiddleware runs PROFILING_SAMPLE_RATE of requests under cProfile.
+Every request also keeps a cheap log of its SQL (text, parameters, time).
+One shared thread starts taking stack samples of a request every
+PROFILING_STACK_INTERVAL seconds once it has run for STACK_ARM_FRACTION of
+PROFILING_SLOW_MS; until then it wakes about once per arming delay, so
+requests that finish well under the threshold are never sampled. Only
+sampled requests and requests slower than PROFILING_SLOW_MS are kept, in a
+Redis ring buffer of the last PROFILING_BUFFER_SIZE profiles. The plans of
+their slowest SELECTs are added afterwards by the explain_profile Celery
+task, on SLOW_QUERY_EXPLAIN_DATABASE like the slow query plans.
+
+A slow request that was not sampled has no cProfile stats, as cProfile can
+only be started before a request, not once it turns out to be slow. Its
+stack samples, in collapsed-stack format, stand in for them. Async requests
+interleave on the event loop thread, so neither can be attributed to one of
+them: they keep their SQL and timings only.
+
+Staff users browse the buffer at /api/admin/profiles/ and download .prof
+files (for pstats or snakeviz) or collapsed stacks (for flamegraph.pl or
+speedscope) from /api/admin/profiles/<id>/download/.
+"""
+import contextvars
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+
+import orjson
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django_redis import get_redis_connection
+
+from api.metrics import view_labels
+from api.slow_queries import jsonable_params
+
+logger = logging.getLogger(__name__)
+
+IDS_KEY = 'profiling:ids'
+SUMMARIES_KEY = 'profiling:summaries'
+RECORDS_KEY = 'profiling:records'
+BLOBS_KEY = 'profiling:blobs'
+
+# Per request, to bound memory on runaway loops
+MAX_LOGGED_QUERIES = 500
+# Functions listed in a profile's text report; the .prof download has them all
+PROFILE_TOP_FUNCTIONS = 40
+# Share of PROFILING_SLOW_MS a request runs before its stacks are sampled
+STACK_ARM_FRACTION = 0.5
+
+
+class QueryLog:
+    """The SQL, parameters and time of each query of one request"""
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+        self.seconds = 0.0
+
+
+_current_log = contextvars.ContextVar('profiling_query_log', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    log = _current_log.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        log.count += 1
+        log.seconds += elapsed
+        if len(log.queries) < MAX_LOGGED_QUERIES:
+            log.queries.append((sql, params, many, elapsed))
+
+
+@receiver(connection_created)
+def install_query_hook(sender, connection, **kwargs):
+    # Installed for good like api.metrics.record_query: cheaper per request
+    # than an execute_wrapper() block
+    if connection.alias in settings.DATABASES and record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class StackSampler:
+    """
+        One daemon thread per process sampling the stacks of the requests
+        registered with watch() once they near PROFILING_SLOW_MS.
+    """
+    def __init__(self):
+        self.reset()
+        # Forked workers don't inherit the thread, so start their own
+        os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        self.active = {}
+        self.started = False
+        # Set to cut a sleep short when the settings it was computed from change
+        self.wakeup = threading.Event()
+
+    def ensure_started(self):
+        if not self.started:
+            self.started = True
+            threading.Thread(target=self.run, name='profiling-stack-sampler', daemon=True).start()
+
+    def watch(self):
+        self.ensure_started()
+        watched = Watched()
+        self.active[threading.get_ident()] = watched
+        return watched
+
+    def unwatch(self):
+        self.active.pop(threading.get_ident(), None)
+
+    def run(self):
+        while True:
+            interval = settings.PROFILING_STACK_INTERVAL
+            arm_after = settings.PROFILING_SLOW_MS / 1000 * STACK_ARM_FRACTION
+            now = time.perf_counter()
+            watching = list(self.active.items())
+            armed = [(thread_id, watched) for thread_id, watched in watching if now - watched.started >= arm_after]
+            if armed:
+                frames = sys._current_frames()
+                for thread_id, watched in armed:
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        if watched.stacks is None:
+                            watched.stacks = Counter()
+                        watched.stacks[collapse(frame)] += 1
+                delay = interval
+            else:
+                # Nothing armed: sleep until the oldest request arms. Requests
+                # registered meanwhile arm no sooner than arm_after from now.
+                wake = min((watched.started + arm_after for _, watched in watching), default=now + arm_after)
+                delay = max(wake - now, interval)
+            self.wakeup.wait(delay)
+            self.wakeup.clear()
+
+
+class Watched:
+    """A request the sampler is watching; stacks stays None until it is first sampled"""
+    __slots__ = ('started', 'stacks')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stacks = None
+
+
+def collapse(frame):
+    """root;...;leaf stack of frame in collapsed-stack format"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+sampler = StackSampler()
+
+
+@receiver(setting_changed)
+def wake_sampler(setting, **kwargs):
+    if setting.startswith('PROFILING_'):
+        sampler.wakeup.set()
+
+
+def profile_stats(profiler):
+    """(top functions by cumulative time as text, marshalled stats as in a .prof file)"""
+    text = io.StringIO()
+    # Stats() takes the profiler's table; it is also what Stats.dump_stats() writes
+    stats = pstats.Stats(profiler, stream=text)
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    return text.getvalue(), marshal.dumps(stats.stats)
+
+
+def build_record(request, response, elapsed, reason, queries, profiler=None, stacks=None):
+    """(summary, record, downloadable blob or None) of one captured request"""
+    profile = samples = blob = download = None
+    if profiler is not None:
+        profile, blob = profile_stats(profiler)
+        download = 'prof'
+    elif stacks:
+        samples = [{'stack': stack, 'samples': count} for stack, count in stacks.most_common()]
+        blob = '\n'.join(f'{stack} {count}' for stack, count in stacks.items()).encode()
+        download = 'folded'
+
+    view, action = view_labels(request)
+    summary = {
+        'id': uuid.uuid4().hex,
+        'reason': reason,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': view,
+        'action': action,
+        'status': response.status_code,
+        'duration_ms': round(elapsed * 1000, 3),
+        'db_ms': round(queries.seconds * 1000, 3),
+        'query_count': queries.count,
+        'captured_at': datetime.now(timezone.utc).isoformat(),
+        'download': download,
+    }
+    logged = [
+        {'sql': sql, 'params': [] if many else [str(param) for param in params or ()], 'duration_ms': round(seconds * 1000, 3)}
+        for sql, params, many, seconds in queries.queries
+    ]
+    return summary, {**summary, 'queries': logged, 'profile': profile, 'stacks': samples}, blob
+
+
+def slowest_selects(queries):
+    """[index, sql, params] of the logged SELECTs to explain, slowest first"""
+    selected, seen = [], set()
+    for i in sorted(range(len(queries.queries)), key=lambda i: -queries.queries[i][3]):
+        if len(selected) >= settings.PROFILING_EXPLAIN_LIMIT:
+            break
+        sql, params, many, _ = queries.queries[i]
+        # Only SELECTs: EXPLAIN of anything else is not guaranteed side-effect free
+        if many or sql in seen or not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        seen.add(sql)
+        selected.append([i, sql, jsonable_params(params)])
+    return selected
+
+
+def store(summary, record, blob):
+    """Push onto the ring buffer, dropping what falls off its end"""
+    redis = get_redis_connection('default')
+    profile_id = summary['id']
+    pipeline = redis.pipeline()
+    pipeline.hset(SUMMARIES_KEY, profile_id, orjson.dumps(summary))
+    pipeline.hset(RECORDS_KEY, profile_id, zlib.compress(orjson.dumps(record)))
+    if blob is not None:
+        pipeline.hset(BLOBS_KEY, profile_id, zlib.compress(blob))
+    pipeline.lpush(IDS_KEY, profile_id)
+    pipeline.lrange(IDS_KEY, settings.PROFILING_BUFFER_SIZE, -1)
+    pipeline.ltrim(IDS_KEY, 0, settings.PROFILING_BUFFER_SIZE - 1)
+    evicted = pipeline.execute()[-2]
+    if evicted:
+        pipeline = redis.pipeline()
+        for key in (SUMMARIES_KEY, RECORDS_KEY, BLOBS_KEY):
+            pipeline.hdel(key, *evicted)
+        pipeline.execute()
+
+
+def store_plans(profile_id, plans):
+    """Add [index, plan] pairs to the record's queries, if it is still in the buffer"""
+    record = get_record(profile_id)
+    if record is None:
+        return
+    for i, plan in plans:
+        record['queries'][i]['explain'] = plan
+    redis = get_redis_connection('default')
+    redis.hset(RECORDS_KEY, profile_id, zlib.compress(orjson.dumps(record)))
+    if not redis.hexists(SUMMARIES_KEY, profile_id):
+        # Evicted meanwhile: don't leave the record behind
+        redis.hdel(RECORDS_KEY, profile_id)
+
+
+def list_summaries():
+    """Summaries in the buffer, newest first"""
+    redis = get_redis_connection('default')
+    ids = redis.lrange(IDS_KEY, 0, -1)
+    if not ids:
+        return []
+    return [orjson.loads(summary) for summary in redis.hmget(SUMMARIES_KEY, ids) if summary is not None]
+
+
+def get_record(profile_id):
+    record = get_redis_connection('default').hget(RECORDS_KEY, profile_id)
+    return orjson.loads(zlib.decompress(record)) if record is not None else None
+
+
+def get_blob(profile_id):
+    blob = get_redis_connection('default').hget(BLOBS_KEY, profile_id)
+    return zlib.decompress(blob) if blob is not None else None
+
+
+class ProfilingMiddleware:
+    """
+        Keeps a profile of sampled and slow requests. Put it right after
+        MetricsMiddleware so the profile covers the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profiler = None
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (e.g. Silk's) is already running on this thread
+                profiler = None
+        watched = None if profiler else sampler.watch()
+        queries = QueryLog()
+        token = _current_log.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_log.reset(token)
+            if profiler is not None:
+                profiler.disable()
+            else:
+                sampler.unwatch()
+
+        reason = self.reason(profiler is not None, elapsed)
+        if reason:
+            self.keep(request, response, elapsed, reason, queries, profiler, watched and watched.stacks)
+        return response
+
+    async def __acall__(self, request):
+        sampled = random.random() < settings.PROFILING_SAMPLE_RATE
+        queries = QueryLog()
+        token = _current_log.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_log.reset(token)
+
+        reason = self.reason(sampled, elapsed)
+        if reason:
+            await sync_to_async(self.keep)(request, response, elapsed, reason, queries)
+        return response
+
+    @staticmethod
+    def reason(sampled, elapsed):
+        if sampled:
+            return 'sampled'
+        return 'slow' if elapsed * 1000 >= settings.PROFILING_SLOW_MS else None
+
+    @staticmethod
+    def keep(request, response, elapsed, reason, queries, profiler=None, stacks=None):
+        from api.tasks import explain_profile
+
+        try:
+            summary, record, blob = build_record(request, response, elapsed, reason, queries, profiler, stacks)
+            store(summary, record, blob)
+            selects = slowest_selects(queries)
+            if selects:
+                explain_profile.delay(summary['id'], selects)
+        except Exception:
+            # Profiling must never fail the request it profiled
+            logger.exception("Could not store the profile of %s %s", request.method, request.path)
@@ -0,0 +1,86 @@
+# api/query_budget.py
+"""
+Query budgets: fail when a block of code runs more SQL than declared.
+
+    with QueryBudget(4):
+        client.get(url)
+
+    @QueryBudget(4)
+    def test_list(self): ...
+
+Every query is recorded with its call site: the innermost stack frame in
+this project's code, so an N+1 shows up as one line of a model property or
+serializer method with a high count. On overrun, QueryBudgetExceeded (an
+AssertionError) carries the SQL grouped by call site, most frequent first.
+
+Viewsets declare their budgets in query_budgets ({action: max queries});
+api/test_query_budgets.py holds every list and retrieve endpoint to them at
+two data sizes.
+"""
+import os
+import traceback
+from collections import Counter
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import connections
+
+# Frames from here, the metrics, profiling and slow query hooks, tests and
+# third-party code are never the call site
+IGNORED_PATHS = (
+    os.path.abspath(__file__), os.path.join('api', 'metrics.py'), os.path.join('api', 'profiling.py'),
+    os.path.join('api', 'slow_queries.py'), 'site-packages', os.sep + 'test_',
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def call_site():
+    """file:line (function) of the innermost frame in project code"""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(base_dir) and not any(part in filename for part in IGNORED_PATHS):
+            return f'{os.path.relpath(filename, base_dir)}:{frame.lineno} ({frame.name})'
+    return '<outside project code>'
+
+
+class QueryBudget(ContextDecorator):
+    def __init__(self, max_queries=None, using='default', label=None):
+        self.max_queries = max_queries
+        self.using = using
+        self.label = label
+
+    def __enter__(self):
+        self.queries = []
+        self._wrapper = connections[self.using].execute_wrapper(self.record)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._wrapper.__exit__(exc_type, exc_value, tb)
+        if exc_type is None and self.max_queries is not None and len(self.queries) > self.max_queries:
+            raise QueryBudgetExceeded(self.report(
+                f"{len(self.queries)} queries, budget is {self.max_queries}"
+            ))
+        return False
+
+    def record(self, execute, sql, params, many, context):
+        self.queries.append((call_site(), sql))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def report(self, headline):
+        """headline plus every query, grouped by call site"""
+        lines = [f"{self.label}: {headline}" if self.label else headline]
+        sites = Counter(site for site, _ in self.queries)
+        for site, count in sites.most_common():
+            lines.append(f"  {count}x {site}")
+            for sql, times in Counter(sql for s, sql in self.queries if s == site).most_common():
+                lines.append(f"      {times}x {sql}")
+        return '\n'.join(lines)
+
@@ -0,0 +1,139 @@
+# api/renderers.py
+"""
+API renderers.
+
+ORJSONRenderer is the default JSON renderer (see REST_FRAMEWORK in
+settings): it encodes with orjson and falls back to DRF's encoder for the
+types orjson does not know, so its output matches JSONRenderer's except for
+non-finite floats.
+
+The stream renderers serve the export endpoints. The export actions return
+a StreamingHttpResponse directly, so these renderers only render error
+responses (as a JSON line). Listing them on the action lets DRF's content
+negotiation accept ?format=ndjson|csv (or the matching Accept header), and
+each one knows how to encode a stream of values_list() rows in its format.
+"""
+import abc
+import csv
+import io
+import json
+import re
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import orjson
+from django.utils.duration import duration_string
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+        JSONRenderer with orjson doing the encoding. Dates, datetimes, UUIDs
+        and non-string keys are handled natively; Decimal, timedelta, lazy
+        strings and the rest go through DRF's JSONEncoder.default, so the
+        bytes are the same as JSONRenderer's compact, unicode output.
+        Indented output (the browsable API, ?indent=), settings orjson
+        cannot reproduce and floats below 1e-4 or from 1e16 up, which orjson
+        spells differently (1e16 for 1e+16, 0.00001 for 1e-05), are left to
+        JSONRenderer.
+
+        The one difference left: NaN and infinities are rendered as null,
+        where JSONRenderer raises ValueError (orjson gives no way to tell
+        them apart from None once encoded).
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+    default = staticmethod(JSONEncoder().default)
+    # A float orjson wrote in exponent form, or with the leading zeros Python
+    # writes as e-05 and below. A string that happens to match only costs a
+    # fallback.
+    float_spelling = re.compile(rb'[:,\[](?:-?\d+(?:\.\d+)?e|-?0\.0000)')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if (
+            self.get_indent(accepted_media_type, renderer_context) is not None
+            or self.ensure_ascii or not self.compact
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=self.options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the stdlib encoder accepts
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.float_spelling.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped by JSONRenderer too: they are line terminators in JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def export_value(value):
+    """Format a database value the way the API serializers render it."""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, timedelta):
+        return duration_string(value)
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+
+class StreamRenderer(BaseRenderer, abc.ABC):
+    # Rows encoded per chunk written to the response
+    rows_per_chunk = 500
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Errors (throttling, unknown ?format=) are the only non-streamed bodies
+        if data is None:
+            return b''
+        return (json.dumps(data, ensure_ascii=False) + '\n').encode(self.charset)
+
+    def stream(self, rows, columns):
+        """Yield the encoded export, a chunk of rows at a time."""
+        header = self.header(columns)
+        if header:
+            yield header
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.rows_per_chunk:
+                yield self.encode(chunk, columns)
+                chunk = []
+        if chunk:
+            yield self.encode(chunk, columns)
+
+    def header(self, columns):
+        return ''
+
+    @abc.abstractmethod
+    def encode(self, rows, columns):
+        """Encode a chunk of rows."""
+
+
+class NDJSONStreamRenderer(StreamRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def encode(self, rows, columns):
+        return ''.join(
+            json.dumps(dict(zip(columns, map(export_value, row))), ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+
+class CSVStreamRenderer(StreamRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def header(self, columns):
+        return self.encode([columns], columns)
+
+    def encode(self, rows, columns):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([export_value(value) for value in row] for row in rows)
+        return buffer.getvalue()
@@ -1,41 +1,95 @@
-from django.db import transaction
+from collections import Counter
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from .models import Racehorse, Jockey, Race, Participation, User
-
-class RacehorseForJockeySerializer(serializers.ModelSerializer):
-    jockey_total_races = serializers.SerializerMethodField()
-    jockey_total_wins = serializers.SerializerMethodField()
+from .models import Racehorse, Jockey, Race, Participation, User, Leaderboard, RacehorseLeaderboard, JockeyLeaderboard
+from .stats import ANY_SCOPE, apply_results, result_of
+from .cache import invalidate
+
+def split_param(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+class SparseFieldsetMixin:
+    """
+        ?fields=a,b limits the output to the named fields. Nested lists in
+        expandable_fields are opt-in: they are only rendered when named in
+        ?fields= or in ?expand= (or always, when EXPAND_NESTED_BY_DEFAULT is
+        on for clients that still need the old shape). Only the top-level
+        serializer of a request is trimmed; the dropped fields are never
+        evaluated, and views use selected_fields()/unexpanded_fields() to
+        skip the matching prefetches and annotations.
+    """
+    expandable_fields = ()
+
+    @classmethod
+    def selected_fields(cls, request):
+        """The field names requested with ?fields=, or None when it is absent"""
+        if request is None:
+            return None
+        fields = split_param(request.query_params.get('fields', ''))
+        if not fields:
+            return None
+        expand = split_param(request.query_params.get('expand', ''))
+        return fields | (expand & set(cls.expandable_fields))
+
+    @classmethod
+    def unexpanded_fields(cls, request):
+        """The expandable fields left out of a request without ?fields="""
+        if request is None or getattr(settings, 'EXPAND_NESTED_BY_DEFAULT', False):
+            return set()
+        return set(cls.expandable_fields) - split_param(request.query_params.get('expand', ''))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        selected = self.selected_fields(request)
+        dropped = self.unexpanded_fields(request) if selected is None else set(self.fields) - selected
+        for name in dropped & set(self.fields):
+            self.fields.pop(name)
+
+class CareerStatsSerializerMixin(serializers.Serializer):
+    """
+        Read total_races/total_wins/win_rate/g1_wins from the with_stats()
+        annotations when the queryset provides them, falling back to the model
+        properties otherwise (e.g. on objects fetched without annotations).
+    """
+    total_races = serializers.SerializerMethodField()
+    total_wins = serializers.SerializerMethodField()
+    win_rate = serializers.SerializerMethodField()
+    g1_wins = serializers.SerializerMethodField()
+
+    def get_total_races(self, obj):
+        if hasattr(obj, 'num_races'):
+            return obj.num_races
+        return obj.total_races
+
+    def get_total_wins(self, obj):
+        if hasattr(obj, 'num_wins'):
+            return obj.num_wins
+        return obj.total_wins
+
+    def get_win_rate(self, obj):
+        if hasattr(obj, 'num_races') and hasattr(obj, 'num_wins'):
+            return (obj.num_wins / obj.num_races) * 100 if obj.num_races > 0 else 0
+        return obj.win_rate
+
+    def get_g1_wins(self, obj):
+        if hasattr(obj, 'num_g1_wins'):
+            return obj.num_g1_wins
+        return obj.g1_wins
+
+class RacehorseForJockeySerializer(serializers.Serializer):
+    """
+        Serializes rows from Participation.objects.partnerships(): one horse a
+        jockey has ridden, with the pairing's race and win counts.
+    """
+    name = serializers.CharField(source='racehorse__name')
+    jockey_total_races = serializers.IntegerField(source='total')
+    jockey_total_wins = serializers.IntegerField(source='wins')
     jockey_win_rate = serializers.SerializerMethodField()
 
-    class Meta:
-        model = Racehorse
-        fields = (
-            'name',
-            'jockey_total_races',
-            'jockey_total_wins',
-            'jockey_win_rate',
-        )
-
-    def get_jockey_total_races(self, obj):
-        jockey = self.context.get("jockey")
-        if not jockey:
-            return 0
-        return Participation.objects.filter(racehorse=obj, jockey=jockey).count()
-
-    def get_jockey_total_wins(self, obj):
-        jockey = self.context.get("jockey")
-        if not jockey:
-            return 0
-        return Participation.objects.filter(
-            racehorse=obj,
-            jockey=jockey,
-            position=1  # or however you define a "win"
-        ).count()
-
-    def get_jockey_win_rate(self, obj):
-        total_races = self.get_jockey_total_races(obj)
-        total_wins = self.get_jockey_total_wins(obj)
-        return round((total_wins / total_races) * 100, 2) if total_races > 0 else 0.0
+    def get_jockey_win_rate(self, row):
+        return round((row['wins'] / row['total']) * 100, 2) if row['total'] > 0 else 0.0
 
 class RacehorseNestedWriteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -105,7 +159,7 @@ class UserWriteSerializer(serializers.ModelSerializer):
         return instance
 
 
-class RacehorseSerializer(serializers.ModelSerializer):
+class RacehorseSerializer(SparseFieldsetMixin, CareerStatsSerializerMixin, serializers.ModelSerializer):
     class ParticipationSerializer(serializers.ModelSerializer):
         racehorse = serializers.CharField(source='racehorse.name')
         jockey = serializers.CharField(source='jockey.name')
@@ -122,6 +176,7 @@ class RacehorseSerializer(serializers.ModelSerializer):
                 'result_status'
             )
     participations = ParticipationSerializer(many=True, read_only=True)
+    expandable_fields = ('participations',)
 
     class Meta:
         model = Racehorse
@@ -140,7 +195,7 @@ class RacehorseWriteSerializer(serializers.ModelSerializer):
             'image', 'is_active'
         )
 
-class JockeySerializer(serializers.ModelSerializer):
+class JockeySerializer(SparseFieldsetMixin, CareerStatsSerializerMixin, serializers.ModelSerializer):
     class ParticipationSerializer(serializers.ModelSerializer):
         racehorse = serializers.CharField(source='racehorse.name')
         jockey = serializers.CharField(source='jockey.name')
@@ -158,6 +213,7 @@ class JockeySerializer(serializers.ModelSerializer):
             )
     participations = ParticipationSerializer(many=True, read_only=True)
     racehorses = serializers.SerializerMethodField()
+    expandable_fields = ('participations', 'racehorses')
 
     class Meta:
         model = Jockey
@@ -167,12 +223,12 @@ class JockeySerializer(serializers.ModelSerializer):
         )
 
     def get_racehorses(self, obj):
-        horses = Racehorse.objects.filter(participations__jockey=obj).distinct()
-        return RacehorseForJockeySerializer(
-            horses,
-            many=True,
-            context={'jockey': obj}
-        ).data
+        # List views pass the grouped breakdown for the whole page in context;
+        # otherwise fetch it for this jockey alone (still a single query).
+        partnerships = self.context.get('partnerships')
+        if partnerships is None:
+            partnerships = Participation.objects.partnerships([obj.pk])
+        return RacehorseForJockeySerializer(partnerships.get(obj.pk, []), many=True).data
 
 class JockeyWriteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -181,7 +237,7 @@ class JockeyWriteSerializer(serializers.ModelSerializer):
             'name', 'image', 'height_cm', 'weight_kg', 'birth_date'
         )
 
-class ParticipationSerializer(serializers.ModelSerializer):
+class ParticipationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     racehorse_name = serializers.CharField(source='racehorse.name')
     jockey_name = serializers.CharField(source='jockey.name')
     race_name = serializers.CharField(source='race.name')
@@ -264,7 +320,7 @@ class ParticipationWriteSerializer(serializers.ModelSerializer):
 
 
 
-class RaceSerializer(serializers.ModelSerializer):
+class RaceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class ParticipationSerializer(serializers.ModelSerializer):
         racehorse = serializers.CharField(source='racehorse.name')
         jockey = serializers.CharField(source='jockey.name')
@@ -280,9 +336,10 @@ class RaceSerializer(serializers.ModelSerializer):
                 'odds',
                 'result_status'
             )
-    winner = serializers.CharField(source='winner.name', allow_null=True)
-    total_participants = serializers.ReadOnlyField()
+    winner = serializers.SerializerMethodField()
+    total_participants = serializers.SerializerMethodField()
     participations = ParticipationSerializer(many=True, read_only=True)
+    expandable_fields = ('participations',)
 
     class Meta:
         model = Race
@@ -293,6 +350,18 @@ class RaceSerializer(serializers.ModelSerializer):
             'winner', 'total_participants', 'participations'
         )
 
+    # Read the with_summary() annotations when the queryset provides them
+    def get_winner(self, obj):
+        if hasattr(obj, 'winner_name'):
+            return obj.winner_name
+        winner = obj.winner
+        return winner.name if winner else None
+
+    def get_total_participants(self, obj):
+        if hasattr(obj, 'participant_count'):
+            return obj.participant_count
+        return obj.total_participants
+
 class RaceWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Race
@@ -306,4 +375,125 @@ class RaceWriteSerializer(serializers.ModelSerializer):
         """Ensure track_condition matches the surface rules."""
         instance = Race(**data)
         instance.clean()  # Calls the model's validation logic
-        return data
\ No newline at end of file
+        return data
+
+class RaceResultEntrySerializer(serializers.Serializer):
+    racehorse = serializers.IntegerField()
+    jockey = serializers.IntegerField()
+    position = serializers.IntegerField(min_value=1)
+    finish_time = serializers.DurationField(required=False, allow_null=True)
+    margin = serializers.DecimalField(max_digits=5, decimal_places=2, required=False, allow_null=True)
+    odds = serializers.DecimalField(max_digits=6, decimal_places=2, required=False, allow_null=True)
+
+class RaceResultsSerializer(serializers.Serializer):
+    """
+        A whole finishing order for one race (passed as context['race']).
+        Horse and jockey ids are checked with one query each and the
+        unique_race_racehorse/unique_race_jockey constraints in memory, then
+        every runner is inserted with a single bulk_create. A runner entered
+        concurrently in between still trips the constraints, which is
+        reported as a 400 with nothing recorded.
+    """
+    results = RaceResultEntrySerializer(many=True, allow_empty=False)
+
+    def validate_results(self, results):
+        race = self.context['race']
+        horse_ids = [entry['racehorse'] for entry in results]
+        jockey_ids = [entry['jockey'] for entry in results]
+        known_horses = set(Racehorse.objects.filter(pk__in=horse_ids).values_list('pk', flat=True))
+        known_jockeys = set(Jockey.objects.filter(pk__in=jockey_ids).values_list('pk', flat=True))
+        entered = list(race.participations.values_list('racehorse_id', 'jockey_id'))
+        entered_horses = {horse for horse, _ in entered}
+        entered_jockeys = {jockey for _, jockey in entered}
+        horse_counts = Counter(horse_ids)
+        jockey_counts = Counter(jockey_ids)
+
+        errors = []
+        for entry in results:
+            entry_errors = {}
+            if entry['racehorse'] not in known_horses:
+                entry_errors['racehorse'] = [f"Invalid pk \"{entry['racehorse']}\" - object does not exist."]
+            elif horse_counts[entry['racehorse']] > 1 or entry['racehorse'] in entered_horses:
+                entry_errors['racehorse'] = ["This racehorse is already entered in the race."]
+            if entry['jockey'] not in known_jockeys:
+                entry_errors['jockey'] = [f"Invalid pk \"{entry['jockey']}\" - object does not exist."]
+            elif jockey_counts[entry['jockey']] > 1 or entry['jockey'] in entered_jockeys:
+                entry_errors['jockey'] = ["This jockey is already riding in the race."]
+            errors.append(entry_errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return results
+
+    def create(self, validated_data):
+        race = self.context['race']
+        try:
+            with transaction.atomic():
+                participations = Participation.objects.bulk_create([
+                    Participation(
+                        race=race,
+                        racehorse_id=entry['racehorse'],
+                        jockey_id=entry['jockey'],
+                        position=entry['position'],
+                        finish_time=entry.get('finish_time'),
+                        margin=entry.get('margin'),
+                        odds=entry.get('odds'),
+                    )
+                    for entry in validated_data['results']
+                ])
+                # bulk_create skips the model signals: update stats and caches once for the batch
+                apply_results(added=[result_of(p, race) for p in participations])
+                invalidate('participation')
+        except IntegrityError:
+            # A concurrent request entered one of these runners after validate_results() looked
+            raise serializers.ValidationError({
+                'results': ["A racehorse or jockey was entered in the race by another request. No results were recorded."]
+            })
+        return participations
+
+    def to_representation(self, participations):
+        return {
+            'race': self.context['race'].id,
+            'participations': [
+                {'id': p.id, 'racehorse': p.racehorse_id, 'jockey': p.jockey_id, 'position': p.position}
+                for p in participations
+            ],
+        }
+
+
+class LeaderboardParamsSerializer(serializers.Serializer):
+    """Query parameters of a leaderboard; a scope field left out covers all races"""
+    year = serializers.IntegerField(required=False, min_value=1)
+    season = serializers.ChoiceField(Race.Season.choices, required=False)
+    surface = serializers.ChoiceField(Race.TrackSurface.choices, required=False)
+    classification = serializers.ChoiceField(Race.Classification.choices, required=False)
+    min_starts = serializers.IntegerField(required=False, default=1, min_value=1)
+
+    def validate(self, attrs):
+        # Only the scopes in Leaderboard.SCOPES are precomputed
+        if tuple(field for field in Leaderboard.SCOPE_FIELDS if field in attrs) not in Leaderboard.SCOPES:
+            raise serializers.ValidationError(
+                "Combine at most the year with one of season, surface or classification."
+            )
+        return attrs
+
+    def scope(self):
+        return {
+            field: self.validated_data.get(field, any_value)
+            for field, any_value in zip(Leaderboard.SCOPE_FIELDS, ANY_SCOPE)
+        }
+
+LEADERBOARD_FIELDS = ['name', 'starts', 'wins', 'places', 'g1_wins', 'earnings', 'win_rate']
+
+class RacehorseLeaderboardSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='racehorse.name')
+
+    class Meta:
+        model = RacehorseLeaderboard
+        fields = ['racehorse', *LEADERBOARD_FIELDS]
+
+class JockeyLeaderboardSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='jockey.name')
+
+    class Meta:
+        model = JockeyLeaderboard
+        fields = ['jockey', *LEADERBOARD_FIELDS]
@@ -1,45 +1,125 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from api.models import Racehorse, Jockey, Race, Participation
-from django.core.cache import cache
+from api.stats import Result, RESULT_FIELDS, result_of, apply_results
+from api.cache import invalidate
+from api.autocomplete import AUTOCOMPLETE_SOURCES
+
+# Race fields that feed the career stats and leaderboards
+RACE_RESULT_FIELDS = ('classification', 'prize_money', 'date', 'season', 'track_surface')
 
 @receiver([post_save, post_delete], sender=Racehorse)
 def invalidate_racehorse_cache(sender, instance, **kwargs):
     """
-        Invalidate racehorse list caches when a racehorse is created, updated, or deleted
+        Invalidate cached lists embedding racehorses when a racehorse is created, updated, or deleted
     """
-    print("Clearing racehorse cache")
-
-    # Clear racehorse list caches
-    cache.clear()
+    invalidate('racehorse')
 
 @receiver([post_save, post_delete], sender=Jockey)
 def invalidate_jockey_cache(sender, instance, **kwargs):
     """
-        Invalidate jockey list caches when a jockey is created, updated, or deleted
+        Invalidate cached lists embedding jockeys when a jockey is created, updated, or deleted
     """
-    print("Clearing jockey cache")
-
-    # Clear jockey list caches
-    cache.delete_pattern('*jockey_list*')
+    invalidate('jockey')
 
 @receiver([post_save, post_delete], sender=Race)
 def invalidate_race_cache(sender, instance, **kwargs):
     """
-        Invalidate race list caches when a race is created, updated, or deleted
+        Invalidate cached lists embedding races when a race is created, updated, or deleted
     """
-    print("Clearing race cache")
-
-    # Clear race list caches
-    cache.delete_pattern('*race_list*')
+    invalidate('race')
 
 @receiver([post_save, post_delete], sender=Participation)
 def invalidate_participation_cache(sender, instance, **kwargs):
     """
-        Invalidate participation list caches when a participation is created, updated, or deleted
+        Invalidate the participation list and the racehorse/jockey/race lists
+        that embed participations when one is created, updated, or deleted
+    """
+    invalidate('participation')
+
+@receiver(pre_save, sender=Participation)
+def remember_previous_result(sender, instance, raw=False, **kwargs):
+    """
+        Capture the stored result before an edit so post_save can apply a delta
+    """
+    instance._previous_result = None
+    if instance.pk and not raw:
+        previous = Participation.objects.filter(pk=instance.pk).values_list(*RESULT_FIELDS).first()
+        if previous:
+            instance._previous_result = Result(*previous)
+
+@receiver(post_save, sender=Participation)
+def update_stats_on_participation_save(sender, instance, raw=False, **kwargs):
+    """
+        Apply the created/edited result to the horse and jockey career stats
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_previous_result', None)
+    apply_results(added=[result_of(instance)], removed=[previous] if previous else [])
+
+@receiver(post_delete, sender=Participation)
+def update_stats_on_participation_delete(sender, instance, **kwargs):
+    """
+        Remove a deleted result from the horse and jockey career stats
     """
-    print("Clearing participation cache")
+    race = Race.objects.filter(pk=instance.race_id).first()
+    if race:
+        apply_results(removed=[result_of(instance, race)])
 
-    # Clear participation list caches
-    cache.delete_pattern('*participation_list*')
+@receiver(pre_save, sender=Race)
+def remember_previous_race(sender, instance, raw=False, **kwargs):
+    """
+        Capture the name and the fields behind stats and leaderboards before a race is edited
+    """
+    instance._previous_race = None
+    if instance.pk and not raw:
+        instance._previous_race = Race.objects.filter(pk=instance.pk).values(
+            'name', *RACE_RESULT_FIELDS
+        ).first()
 
+@receiver(post_save, sender=Race)
+def update_stats_on_race_save(sender, instance, raw=False, **kwargs):
+    """
+        Re-credit G1 wins and earnings for every runner when a race's
+        classification or prize money changes, and move its results between
+        leaderboard scopes when its year, season or surface does
+    """
+    previous = getattr(instance, '_previous_race', None)
+    if raw or not previous:
+        return
+    # In the order of Result's race fields
+    before = (
+        previous['classification'], previous['prize_money'], previous['date'].year,
+        previous['season'], previous['track_surface'],
+    )
+    after = (instance.classification, instance.prize_money, instance.date.year, instance.season, instance.track_surface)
+    if before == after:
+        return
+    runners = list(instance.participations.values_list('racehorse_id', 'jockey_id', 'position'))
+    apply_results(
+        added=[Result(*runner, *after) for runner in runners],
+        removed=[Result(*runner, *before) for runner in runners],
+    )
+
+@receiver([post_save, post_delete], sender=Racehorse)
+@receiver([post_save, post_delete], sender=Jockey)
+def update_name_autocomplete(sender, instance, signal, **kwargs):
+    """
+        Keep this process's horse/jockey autocomplete index in step with renames and deletes
+    """
+    name = None if signal is post_delete else instance.name
+    AUTOCOMPLETE_SOURCES[sender._meta.model_name].record_change(instance.pk, name)
+
+@receiver([post_save, post_delete], sender=Race)
+def update_race_autocomplete(sender, instance, signal, **kwargs):
+    """
+        Keep this process's race autocomplete index in step with new, renamed and deleted races
+    """
+    if signal is post_delete:
+        AUTOCOMPLETE_SOURCES['race'].record_change(instance.pk, None, instance.name)
+        return
+    previous = getattr(instance, '_previous_race', None)
+    previous_name = previous['name'] if previous else None
+    if previous_name != instance.name:
+        AUTOCOMPLETE_SOURCES['race'].record_change(instance.pk, instance.name, previous_name)
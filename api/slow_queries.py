@@ -0,0 +1,199 @@
+# api/slow_queries.py
+"""
+Slow statements seen while serving requests, grouped by fingerprint.
+
+api.metrics already times every query of a request; any that takes at least
+SLOW_QUERY_MS comes here. Its fingerprint is the SQL with literals, LIMIT
+values and IN lists collapsed, so /api/races/?date__range=... is one entry
+whatever the dates. Each fingerprint keeps its count, total and maximum time
+in Redis, along with where it ran: the view and action, the serializer field
+being rendered (if any) and the innermost line of project code.
+
+The first time a SELECT fingerprint is seen, and again every
+SLOW_QUERY_EXPLAIN_INTERVAL seconds, the explain_slow_query Celery task takes
+its plan with EXPLAIN (ANALYZE, BUFFERS) on SLOW_QUERY_EXPLAIN_DATABASE (a
+replica if there is one), away from the request. ANALYZE runs the query for
+real, so writes are never explained and the task rolls back and runs under
+a statement timeout.
+
+`manage.py slow_queries` and /api/admin/slow-queries/ list fingerprints by
+total time.
+"""
+import hashlib
+import re
+import sys
+import time
+
+import orjson
+from django.conf import settings
+from django.db import connections, transaction
+from django_redis import get_redis_connection
+from rest_framework.fields import Field
+from rest_framework.serializers import Serializer
+
+from api.query_budget import call_site
+
+RANKING_KEY = 'slow_queries:total_ms'
+
+
+def _query_key(fingerprint):
+    return f'slow_queries:query:{fingerprint}'
+
+
+def _sites_key(fingerprint):
+    return f'slow_queries:sites:{fingerprint}'
+
+
+def _explain_lock_key(fingerprint):
+    return f'slow_queries:explain:{fingerprint}'
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """sql with every literal and parameter as ? and IN (...) lists of any length alike"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDERS.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def serializer_field():
+    """Serializer.field being rendered by the caller's caller, if any"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == 'to_representation':
+            owner, field = frame.f_locals.get('self'), frame.f_locals.get('field')
+            if isinstance(owner, Serializer) and isinstance(field, Field):
+                return f'{type(owner).__name__}.{field.field_name}'
+        frame = frame.f_back
+    return None
+
+
+def capture(sql, params, many, seconds, view, action):
+    """Record one slow statement; called by api.metrics.record_query"""
+    normalized = normalize(sql)
+    key = fingerprint(normalized)
+    milliseconds = seconds * 1000
+    site = orjson.dumps([f'{view}.{action}', serializer_field(), call_site()])
+    redis = get_redis_connection('default')
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.zincrby(RANKING_KEY, milliseconds, key)
+    pipeline.hsetnx(_query_key(key), 'sql', normalized)
+    pipeline.hsetnx(_query_key(key), 'first_seen', time.time())
+    pipeline.hset(_query_key(key), 'last_seen', time.time())
+    pipeline.hincrby(_query_key(key), 'count', 1)
+    pipeline.hincrbyfloat(_query_key(key), 'total_ms', milliseconds)
+    pipeline.hincrby(_sites_key(key), site, 1)
+    explain = not many and normalized.upper().startswith('SELECT')
+    if explain:
+        pipeline.set(_explain_lock_key(key), 1, nx=True, ex=settings.SLOW_QUERY_EXPLAIN_INTERVAL)
+    results = pipeline.execute()
+    if float(redis.hget(_query_key(key), 'max_ms') or 0) < milliseconds:
+        redis.hset(_query_key(key), 'max_ms', milliseconds)
+    if explain and results[-1]:
+        from api.tasks import explain_slow_query
+        explain_slow_query.delay(key, sql, jsonable_params(params), milliseconds)
+
+
+def jsonable_params(params):
+    """Query parameters as a Celery task argument"""
+    # Celery's JSON serializer handles the rest (dates, Decimal, UUID)
+    return [None if isinstance(param, (bytes, memoryview)) else param for param in params or ()]
+
+
+def explain_analyze(sql, params, analyze=True):
+    """
+        EXPLAIN (ANALYZE, BUFFERS) of sql, or with analyze=False a plain
+        EXPLAIN that doesn't run it, in a transaction that is rolled back
+    """
+    connection = connections[settings.SLOW_QUERY_EXPLAIN_DATABASE]
+    try:
+        prefix = connection.ops.explain_query_prefix(**({'analyze': True, 'buffers': True} if analyze else {}))
+    except ValueError:
+        # Backends without ANALYZE (SQLite) still have a plan to show
+        prefix = connection.ops.explain_query_prefix()
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL statement_timeout = %s', [int(settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS)])
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+        transaction.set_rollback(True, using=connection.alias)
+    # PostgreSQL returns one line per row, SQLite (id, parent, notused, detail)
+    return '\n'.join(str(row[-1]) for row in rows)
+
+
+def store_plan(key, plan, milliseconds):
+    get_redis_connection('default').hset(_query_key(key), mapping={
+        'plan': plan, 'plan_query_ms': milliseconds, 'plan_at': time.time(),
+    })
+
+
+def _decode(mapping):
+    return {field.decode(): value.decode() for field, value in mapping.items()}
+
+
+def _optional_float(mapping, field):
+    return float(mapping[field]) if field in mapping else None
+
+
+def _entry(key, query, sites):
+    query = _decode(query)
+    count, total = int(query.get('count', 0)), float(query.get('total_ms', 0))
+    call_sites = [
+        dict(zip(('view', 'serializer_field', 'code'), orjson.loads(site)), count=int(times))
+        for site, times in sites.items()
+    ]
+    return {
+        'fingerprint': key,
+        'sql': query.get('sql'),
+        'count': count,
+        'total_ms': round(total, 3),
+        'mean_ms': round(total / count, 3) if count else None,
+        'max_ms': round(float(query.get('max_ms', 0)), 3),
+        'first_seen': _optional_float(query, 'first_seen'),
+        'last_seen': _optional_float(query, 'last_seen'),
+        'call_sites': sorted(call_sites, key=lambda site: -site['count']),
+        'plan': query.get('plan'),
+        'plan_query_ms': _optional_float(query, 'plan_query_ms'),
+        'plan_at': _optional_float(query, 'plan_at'),
+    }
+
+
+def ranked(limit=None):
+    """Fingerprints by total time, slowest first"""
+    redis = get_redis_connection('default')
+    keys = [key.decode() for key in redis.zrevrange(RANKING_KEY, 0, -1 if limit is None else limit - 1)]
+    pipeline = redis.pipeline(transaction=False)
+    for key in keys:
+        pipeline.hgetall(_query_key(key))
+        pipeline.hgetall(_sites_key(key))
+    results = pipeline.execute()
+    return [_entry(key, query, sites) for key, query, sites in zip(keys, results[::2], results[1::2])]
+
+
+def get(key):
+    redis = get_redis_connection('default')
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.hgetall(_query_key(key))
+    pipeline.hgetall(_sites_key(key))
+    query, sites = pipeline.execute()
+    return _entry(key, query, sites) if query else None
+
+
+def reset():
+    redis = get_redis_connection('default')
+    keys = [key.decode() for key in redis.zrange(RANKING_KEY, 0, -1)]
+    redis.delete(RANKING_KEY, *(
+        name for key in keys for name in (_query_key(key), _sites_key(key), _explain_lock_key(key))
+    ))
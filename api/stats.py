@@ -0,0 +1,333 @@
+# api/stats.py
+"""
+Maintenance of the denormalized RacehorseStats/JockeyStats tables and of the
+RacehorseLeaderboard/JockeyLeaderboard tables.
+
+Writes go through apply_results(), which turns added/removed race results into
+per-horse and per-jockey deltas and applies them with F() updates. Leaderboard
+deltas go to the scope rows of each result (Leaderboard.SCOPES), new rows being
+upserted in one INSERT ... ON CONFLICT DO UPDATE. The rebuild/verify helpers
+recompute everything from Participation in bulk.
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+from django.db.models.lookups import GreaterThan
+
+from api.models import (
+    Race, Participation, RacehorseStats, JockeyStats, Leaderboard, RacehorseLeaderboard, JockeyLeaderboard,
+)
+
+# The fields of a participation (and its race) that feed the career numbers and leaderboards
+Result = namedtuple('Result', 'racehorse_id jockey_id position classification prize_money year season surface')
+
+RESULT_FIELDS = (
+    'racehorse_id', 'jockey_id', 'position', 'race__classification', 'race__prize_money',
+    'race__date__year', 'race__season', 'race__track_surface',
+)
+
+# Participation lookup behind each leaderboard scope field
+LEADERBOARD_LOOKUPS = {
+    'year': 'race__date__year',
+    'season': 'race__season',
+    'surface': 'race__track_surface',
+    'classification': 'race__classification',
+}
+ANY_SCOPE = (Leaderboard.ANY_YEAR, Leaderboard.ANY, Leaderboard.ANY, Leaderboard.ANY)
+
+# Rows per INSERT ... ON CONFLICT statement
+UPSERT_BATCH_SIZE = 500
+
+CENT = Decimal('0.01')
+
+
+def result_of(participation, race=None):
+    race = race or participation.race
+    return Result(
+        participation.racehorse_id,
+        participation.jockey_id,
+        participation.position,
+        race.classification,
+        race.prize_money,
+        race.date.year,
+        race.season,
+        race.track_surface,
+    )
+
+
+def contribution(result):
+    """Return the stats a single result adds to its horse and jockey."""
+    share = Race.PRIZE_SHARES.get(result.position)
+    earnings = Decimal('0')
+    if share and result.prize_money:
+        earnings = (Decimal(result.prize_money) * share).quantize(CENT, rounding=ROUND_HALF_UP)
+    return {
+        'starts': 1,
+        'wins': int(result.position == 1),
+        'places': int(result.position <= 3),
+        'g1_wins': int(result.position == 1 and result.classification == Race.Classification.GRADE_1),
+        'earnings': earnings,
+    }
+
+
+def scopes_of(result):
+    """The (year, season, surface, classification) leaderboard scopes a result counts in"""
+    own = (result.year, result.season, result.surface, result.classification)
+    return [
+        tuple(
+            value if field in scope else any_value
+            for field, value, any_value in zip(Leaderboard.SCOPE_FIELDS, own, ANY_SCOPE)
+        )
+        for scope in Leaderboard.SCOPES
+    ]
+
+
+def win_rate(wins, starts):
+    # Same arithmetic as the SQL in _upsert_leaderboard, so stored and rebuilt values agree
+    return wins * 100 / starts if starts else 0.0
+
+
+def _empty_delta():
+    return {field: 0 for field in RacehorseStats.STAT_FIELDS}
+
+
+def _apply(model, key, deltas, created):
+    deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and any(delta.values())}
+    if not deltas:
+        return
+    # Only results being added may need a fresh row; never recreate rows on
+    # removal (the owning horse/jockey may be in the middle of a cascade delete)
+    missing = [pk for pk in deltas if pk in created]
+    if missing:
+        model.objects.bulk_create([model(**{key: pk}) for pk in missing], ignore_conflicts=True)
+    for pk, delta in deltas.items():
+        model.objects.filter(pk=pk).update(
+            **{field: F(field) + value for field, value in delta.items() if value}
+        )
+
+
+def _win_rate_after(delta):
+    """win_rate of a row once delta is added, for the same UPDATE that adds it"""
+    starts, wins = F('starts') + delta['starts'], F('wins') + delta['wins']
+    return Case(
+        When(GreaterThan(starts, 0), then=Cast(wins, FloatField()) * 100 / starts),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def _upsert_leaderboard(model, key, rows):
+    """
+        Add each (subject, scope) delta to its row, inserting the rows that
+        don't exist yet, with INSERT ... ON CONFLICT DO UPDATE (PostgreSQL and
+        SQLite). The ORM's update_conflicts can only overwrite, not add.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    conflict = [key, *Leaderboard.SCOPE_FIELDS]
+    columns = [*conflict, *Leaderboard.STAT_FIELDS, 'win_rate']
+    added = {field: f'{table}.{quote(field)} + EXCLUDED.{quote(field)}' for field in Leaderboard.STAT_FIELDS}
+    assignments = [f'{quote(field)} = {value}' for field, value in added.items()]
+    assignments.append(
+        f"{quote('win_rate')} = CASE WHEN {added['starts']} > 0 "
+        f"THEN ({added['wins']}) * 100.0 / ({added['starts']}) ELSE 0 END"
+    )
+    row_placeholder = f"({', '.join(['%s'] * len(columns))})"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            params = []
+            for scope_key, delta in batch:
+                params.extend(scope_key)
+                params.extend(delta[field] for field in Leaderboard.STAT_FIELDS)
+                params.append(win_rate(delta['wins'], delta['starts']))
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(map(quote, columns))}) "
+                f"VALUES {', '.join([row_placeholder] * len(batch))} "
+                f"ON CONFLICT ({', '.join(map(quote, conflict))}) DO UPDATE SET {', '.join(assignments)}",
+                params,
+            )
+
+
+def _apply_leaderboard(model, key, deltas, created):
+    deltas = {scope_key: delta for scope_key, delta in deltas.items() if scope_key[0] is not None and any(delta.values())}
+    # As in _apply, only rows of results being added may be created. A row
+    # that also loses a result exists already, and its negative delta would
+    # fail the CHECK constraints as the VALUES of an INSERT.
+    upserts, updates = [], []
+    for scope_key, delta in deltas.items():
+        insertable = scope_key in created and all(value >= 0 for value in delta.values())
+        (upserts if insertable else updates).append((scope_key, delta))
+    if upserts:
+        _upsert_leaderboard(model, key, upserts)
+    # A removed result changes each of its scope rows by the same delta: one UPDATE per subject and delta
+    scopes_by_delta = defaultdict(list)
+    for scope_key, delta in updates:
+        scopes_by_delta[scope_key[0], tuple(delta.items())].append(scope_key[1:])
+    for (pk, delta), scopes in scopes_by_delta.items():
+        delta = dict(delta)
+        in_scopes = reduce(or_, (Q(**dict(zip(Leaderboard.SCOPE_FIELDS, scope))) for scope in scopes))
+        model.objects.filter(in_scopes, **{key: pk}).update(
+            **{field: F(field) + value for field, value in delta.items() if value},
+            win_rate=_win_rate_after(delta),
+        )
+
+
+def apply_results(added=(), removed=()):
+    """
+        Apply the net effect of adding and removing results to both stats tables
+        and both leaderboards. Must be called inside the transaction that writes
+        the participations.
+    """
+    horse_deltas = defaultdict(_empty_delta)
+    jockey_deltas = defaultdict(_empty_delta)
+    horse_board = defaultdict(_empty_delta)
+    jockey_board = defaultdict(_empty_delta)
+    created_horses, created_jockeys = set(), set()
+    created_horse_rows, created_jockey_rows = set(), set()
+    for sign, results in ((1, added), (-1, removed)):
+        for result in results:
+            stats = contribution(result)
+            horse_rows = [(result.racehorse_id, *scope) for scope in scopes_of(result)]
+            jockey_rows = [(result.jockey_id, *scope) for scope in scopes_of(result)]
+            for field, value in stats.items():
+                horse_deltas[result.racehorse_id][field] += sign * value
+                jockey_deltas[result.jockey_id][field] += sign * value
+                for row in horse_rows:
+                    horse_board[row][field] += sign * value
+                for row in jockey_rows:
+                    jockey_board[row][field] += sign * value
+            if sign > 0:
+                created_horses.add(result.racehorse_id)
+                created_jockeys.add(result.jockey_id)
+                created_horse_rows.update(horse_rows)
+                created_jockey_rows.update(jockey_rows)
+    _apply(RacehorseStats, 'racehorse_id', horse_deltas, created_horses)
+    _apply(JockeyStats, 'jockey_id', jockey_deltas, created_jockeys)
+    _apply_leaderboard(RacehorseLeaderboard, 'racehorse_id', horse_board, created_horse_rows)
+    _apply_leaderboard(JockeyLeaderboard, 'jockey_id', jockey_board, created_jockey_rows)
+
+
+def aggregate_stats(group_field, queryset=None, scope=()):
+    """
+        Compute the career numbers from scratch, grouped by racehorse or jockey
+        and by the scope lookups given. Yields dicts keyed by group_field, the
+        scope lookups and the CareerStats fields.
+    """
+    queryset = Participation.objects.all() if queryset is None else queryset
+    money = DecimalField(max_digits=14, decimal_places=2)
+    earnings = Sum(
+        Case(
+            *[
+                When(position=position, then=Round(F('race__prize_money') * Value(share), 2))
+                for position, share in Race.PRIZE_SHARES.items()
+            ],
+            default=Value(Decimal('0')),
+            output_field=money,
+        ),
+        output_field=money,
+    )
+    return (
+        queryset.filter(**{f'{group_field}__isnull': False})
+        .values(group_field, *scope)
+        .annotate(
+            starts=Count('id'),
+            wins=Count('id', filter=Q(position=1)),
+            places=Count('id', filter=Q(position__lte=3)),
+            g1_wins=Count('id', filter=Q(position=1, race__classification=Race.Classification.GRADE_1)),
+            earnings=Coalesce(earnings, Value(Decimal('0')), output_field=money),
+        )
+        .order_by(group_field)
+    )
+
+
+def aggregate_leaderboard(group_field, queryset=None, chunk_size=2000):
+    """
+        Compute every leaderboard row from scratch, one aggregation per entry
+        of Leaderboard.SCOPES (the fields it leaves out are ANY). Yields dicts
+        keyed by group_field, the scope fields, the CareerStats fields and
+        win_rate.
+    """
+    for scope in Leaderboard.SCOPES:
+        lookups = {field: LEADERBOARD_LOOKUPS[field] for field in scope}
+        for row in aggregate_stats(group_field, queryset, scope=lookups.values()).iterator(chunk_size=chunk_size):
+            yield {
+                group_field: row[group_field],
+                **{
+                    field: row[lookups[field]] if field in lookups else any_value
+                    for field, any_value in zip(Leaderboard.SCOPE_FIELDS, ANY_SCOPE)
+                },
+                **{field: row[field] for field in Leaderboard.STAT_FIELDS},
+                'win_rate': win_rate(row['wins'], row['starts']),
+            }
+
+
+# (model, subject key, Participation group field, scope fields, value fields);
+# tables with scope fields are leaderboards
+STATS_TABLES = (
+    (RacehorseStats, 'racehorse_id', 'racehorse', (), RacehorseStats.STAT_FIELDS),
+    (JockeyStats, 'jockey_id', 'jockey', (), JockeyStats.STAT_FIELDS),
+    (RacehorseLeaderboard, 'racehorse_id', 'racehorse', Leaderboard.SCOPE_FIELDS, (*Leaderboard.STAT_FIELDS, 'win_rate')),
+    (JockeyLeaderboard, 'jockey_id', 'jockey', Leaderboard.SCOPE_FIELDS, (*Leaderboard.STAT_FIELDS, 'win_rate')),
+)
+
+
+def _aggregate(group_field, scope_fields, chunk_size=2000):
+    if scope_fields:
+        return aggregate_leaderboard(group_field, chunk_size=chunk_size)
+    return aggregate_stats(group_field).iterator(chunk_size=chunk_size)
+
+
+def rebuild_stats(chunk_size=5000):
+    """Replace both stats tables and both leaderboards with a from-scratch aggregation."""
+    counts = {}
+    with transaction.atomic():
+        for model, key, group_field, scope_fields, value_fields in STATS_TABLES:
+            model.objects.all().delete()
+            batch = []
+            total = 0
+            for row in _aggregate(group_field, scope_fields, chunk_size):
+                batch.append(model(**{key: row[group_field]}, **{f: row[f] for f in (*scope_fields, *value_fields)}))
+                if len(batch) >= chunk_size:
+                    model.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_create(batch)
+                total += len(batch)
+            counts[model._meta.label] = total
+    return counts
+
+
+def verify_stats():
+    """
+        Compare both stats tables and both leaderboards against a from-scratch
+        aggregation and return a list of (model label, pk, field, stored,
+        expected) mismatches; a leaderboard pk is (subject, *scope).
+    """
+    mismatches = []
+    for model, key, group_field, scope_fields, value_fields in STATS_TABLES:
+        def pk_of(row, subject):
+            return (row[subject], *(row[f] for f in scope_fields)) if scope_fields else row[subject]
+        expected = {
+            pk_of(row, group_field): {f: row[f] for f in value_fields}
+            for row in _aggregate(group_field, scope_fields)
+        }
+        stored = {
+            pk_of(row, key): {f: row[f] for f in value_fields}
+            for row in model.objects.values(key, *scope_fields, *value_fields)
+        }
+        empty = {field: 0 for field in value_fields}
+        for pk in sorted(expected.keys() | stored.keys()):
+            want = expected.get(pk, empty)
+            have = stored.get(pk, empty)
+            for field in value_fields:
+                # Floats (win_rate) too: stored and rebuilt ones may differ in the last bits
+                if Decimal(have[field]).quantize(CENT) != Decimal(want[field]).quantize(CENT):
+                    mismatches.append((model._meta.label, pk, field, have[field], want[field]))
+    return mismatches
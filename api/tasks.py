@@ -1,6 +1,9 @@
 from celery import shared_task
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import DatabaseError
+
+from api import profiling, slow_queries
 
 @shared_task
 def send_thank_you_email(participation_id, user_email):
@@ -16,4 +19,26 @@ def send_invite_to_new_user(user_email, password):
     message = f"We look forward to your contributions. Your password is {password}."
     from_email = settings.DEFAULT_FROM_EMAIL
     recipient_list = [user_email]
-    return send_mail(subject, message, from_email, recipient_list)
\ No newline at end of file
+    return send_mail(subject, message, from_email, recipient_list)
+
+
+@shared_task
+def explain_slow_query(fingerprint, sql, params, query_ms):
+    try:
+        plan = slow_queries.explain_analyze(sql, params)
+    except DatabaseError as exc:
+        plan = f'EXPLAIN failed: {exc}'
+    slow_queries.store_plan(fingerprint, plan, query_ms)
+
+
+@shared_task
+def explain_profile(profile_id, queries):
+    """Add the plans of a kept profile's slowest SELECTs to its record"""
+    plans = []
+    for index, sql, params in queries:
+        try:
+            plan = slow_queries.explain_analyze(sql, params, analyze=False)
+        except DatabaseError as exc:
+            plan = f'EXPLAIN failed: {exc}'
+        plans.append([index, plan])
+    profiling.store_plans(profile_id, plans)
@@ -0,0 +1,91 @@
+# test_async_views.py
+from datetime import date, timedelta
+from decimal import Decimal
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+
+from .models import Racehorse, Jockey, Race, Participation
+from .views import RaceViewSet
+
+
+class AsyncReadViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        races = [
+            Race.objects.create(
+                name=f"Race {i}", date=date(2024, 1, 10 - i), location="Track A",
+                track_configuration="left_handed", track_condition="fast",
+                classification="G1" if i % 2 == 0 else "G2", season="SU", track_length=1200 + i,
+                prize_money=Decimal('50000.50'), currency="USD", track_surface="D",
+            )
+            for i in range(3)
+        ]
+        for i in range(12):
+            horse = Racehorse.objects.create(
+                name=f"Horse {i}", breed="Thoroughbred", birth_date=date(2018, 3, i + 1),
+                image=f"racehorses/horse{i}.jpg" if i % 2 else None,
+            )
+            jockey = Jockey.objects.create(name=f"Jockey {i}")
+            for race in races:
+                Participation.objects.create(
+                    racehorse=horse, jockey=jockey, race=race, position=(i + race.pk) % 12 + 1,
+                    finish_time=timedelta(minutes=1, seconds=10 + i), margin=Decimal('0.25') * i,
+                )
+
+    def assertSameAsSync(self, url_name, params=None, **kwargs):
+        sync = self.client.get(reverse(url_name, kwargs=kwargs), params)
+        cache.clear()
+        response = self.client.get(reverse(f'async-{url_name}', kwargs=kwargs), params)
+        self.assertEqual(response.status_code, sync.status_code)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        # Pagination links point at the async URLs
+        self.assertEqual(response.content.replace(b'/api/async/', b'/api/'), sync.content)
+        return response
+
+    def test_lists_match_sync_endpoints(self):
+        cases = [
+            ('racehorse-list', {}),
+            ('racehorse-list', {'page': 2, 'ordering': '-name'}),
+            ('racehorse-list', {'fields': 'name,image', 'name__icontains': 'horse 1'}),
+            ('race-list', {}),
+            ('race-list', {'pagination': 'cursor', 'page_size': 2}),
+            ('participation-list', {'position__lte': 3, 'fields': 'racehorse_name,finish_time,margin'}),
+            ('participation-list', {'pagination': 'cursor', 'ordering': '-race__date'}),
+        ]
+        for url_name, params in cases:
+            with self.subTest(url_name, **params):
+                cache.clear()
+                self.assertSameAsSync(url_name, params)
+
+    def test_unpaginated_list_matches_sync_endpoint(self):
+        with mock.patch.object(RaceViewSet, 'pagination_class', None):
+            response = self.assertSameAsSync('race-list', {'ordering': '-date'})
+        self.assertEqual(len(response.json()), 3)
+
+    def test_details_match_sync_endpoints(self):
+        for url_name, model in (
+            ('racehorse-detail', Racehorse), ('race-detail', Race), ('participation-detail', Participation),
+        ):
+            with self.subTest(url_name):
+                cache.clear()
+                self.assertSameAsSync(url_name, pk=model.objects.first().pk)
+
+    def test_errors_match_sync_endpoints(self):
+        self.assertEqual(self.assertSameAsSync('race-detail', pk=999999).status_code, 404)
+        self.assertEqual(self.assertSameAsSync('racehorse-list', {'page': 99}).status_code, 404)
+        self.assertEqual(self.assertSameAsSync('race-list', {'date': 'not-a-date'}).status_code, 400)
+
+    def test_cached_until_namespace_is_bumped(self):
+        url = reverse('async-racehorse-list')
+        self.assertEqual(self.client.get(url)['X-Cache-Status'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache-Status'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            Racehorse.objects.filter(name="Horse 0").first().save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache-Status'], 'MISS')
+        self.assertEqual(response.json()['count'], 12)
@@ -0,0 +1,78 @@
+# test_autocomplete.py
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .autocomplete import AUTOCOMPLETE_SOURCES, PrefixIndex, normalize
+from .models import Racehorse, Jockey, Race
+
+
+class PrefixIndexTests(APITestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize("  Élan   Vitàl "), "elan vital")
+
+    def test_matches_any_word_start(self):
+        index = PrefixIndex([(1, "Special Week"), (2, "Silence Suzuka"), (3, "Weekend Warrior")])
+        self.assertEqual(index.search("wee", 10), ["Special Week", "Weekend Warrior"])
+        self.assertEqual(index.search("special w", 10), ["Special Week"])
+        self.assertEqual(index.search("", 10), [])
+
+    def test_repeated_names_are_counted(self):
+        index = PrefixIndex([(None, "Japan Cup"), (None, "Japan Cup")])
+        index.remove(None, "Japan Cup")
+        self.assertEqual(index.search("japan", 10), ["Japan Cup"])
+        index.remove(None, "Japan Cup")
+        self.assertEqual(index.search("japan", 10), [])
+
+
+class AutocompleteViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for source in AUTOCOMPLETE_SOURCES.values():
+            source.reset()
+        self.url = reverse('autocomplete')
+        self.horse = Racehorse.objects.create(name="Special Week", breed="Thoroughbred")
+        Racehorse.objects.create(name="Silence Suzuka", breed="Thoroughbred")
+        Jockey.objects.create(name="Yutaka Take")
+        for year in (2022, 2023):
+            Race.objects.create(
+                name="Japan Cup", date=date(year, 11, 27), location="Tokyo", track_configuration="left_handed",
+                track_condition="firm", classification="G1", season="FA", track_length=2400, track_surface="T",
+            )
+
+    @override_settings(MIDDLEWARE=[m for m in settings.MIDDLEWARE if not m.startswith('silk.')])
+    def test_suggestions_without_queries(self):
+        self.client.get(self.url, {'q': 's'})  # builds the index
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'q': 'SPÉ'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{'id': self.horse.id, 'name': "Special Week"}])
+
+    def test_types(self):
+        response = self.client.get(self.url, {'q': 'take', 'type': 'jockey'})
+        self.assertEqual([r['name'] for r in response.data['results']], ["Yutaka Take"])
+        response = self.client.get(self.url, {'q': 'cup', 'type': 'race'})
+        self.assertEqual(response.data['results'], [{'name': "Japan Cup"}])
+        response = self.client.get(self.url, {'q': 'x', 'type': 'owner'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_signals_keep_index_current(self):
+        self.client.get(self.url, {'q': 's'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.horse.name = "Kitasan Black"
+            self.horse.save()
+            Racehorse.objects.create(name="Satono Diamond", breed="Thoroughbred")
+        response = self.client.get(self.url, {'q': 's'})
+        self.assertEqual([r['name'] for r in response.data['results']], ["Satono Diamond", "Silence Suzuka"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Race.objects.filter(date__year=2022).get().delete()
+        response = self.client.get(self.url, {'q': 'japan', 'type': 'race'})
+        self.assertEqual(response.data['results'], [{'name': "Japan Cup"}])
+        with self.captureOnCommitCallbacks(execute=True):
+            Race.objects.get().delete()
+        response = self.client.get(self.url, {'q': 'japan', 'type': 'race'})
+        self.assertEqual(response.data['results'], [])
@@ -0,0 +1,55 @@
+# test_benchmark.py
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+from .models import User
+
+
+class BenchmarkCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command('populate_db', '--horses', '20', '--jockeys', '10', '--races', '10', '--runners-per-race', '6',
+                     stdout=StringIO())
+        User.objects.create_user(username='benchmark')
+
+    def benchmark(self, *options):
+        f = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        f.close()
+        self.addCleanup(os.remove, f.name)
+        call_command(
+            'benchmark', '--use-current-db', '--repeat', '2', '--warmup', '1', '--output', f.name, *options,
+            stdout=StringIO(),
+        )
+        with open(f.name) as results:
+            return f.name, json.load(results)
+
+    def test_every_route_is_measured(self):
+        _, report = self.benchmark()
+        urls = {result['url'] for result in report['results'].values()}
+        self.assertIn('/api/autocomplete/', urls)
+        self.assertIn('/api/races/export/', urls)
+        for result in report['results'].values():
+            self.assertGreater(result['bytes'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertGreater(report['results']['races']['queries'], 0)
+        self.assertEqual(report['results']['autocomplete']['queries'], 0)
+
+    def test_regressions_against_baseline_fail(self):
+        path, report = self.benchmark('--only', 'races')
+        call_command(
+            'benchmark', '--use-current-db', '--repeat', '2', '--warmup', '1', '--only', 'races',
+            '--output', os.devnull, '--baseline', path, '--threshold', '100', stdout=StringIO(),
+        )
+        for result in report['results'].values():
+            result['queries'] -= 1
+        with open(path, 'w') as f:
+            json.dump(report, f)
+        with self.assertRaisesMessage(CommandError, 'regression'):
+            call_command(
+                'benchmark', '--use-current-db', '--repeat', '2', '--warmup', '1', '--only', 'races',
+                '--output', os.devnull, '--baseline', path, stdout=StringIO(),
+            )
@@ -1,10 +1,13 @@
 # tests_cache_throttle.py
+from django.conf import settings
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.core.cache import cache
 from datetime import date
-from .models import Racehorse
+from .models import Racehorse, User
+from .cache import namespace_version, invalidate
 
 class CacheAndThrottleTests(APITestCase):
     def setUp(self):
@@ -34,6 +37,57 @@ class CacheAndThrottleTests(APITestCase):
 
         self.assertEqual(content_first, content_second)
 
+    def test_cache_status_header(self):
+        url = reverse('racehorse-list')
+        self.assertEqual(self.client.get(url)['X-Cache-Status'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache-Status'], 'HIT')
+
+    def test_cache_shared_across_users_and_equivalent_queries(self):
+        url = reverse('racehorse-list')
+        self.assertEqual(self.client.get(url + '?ordering=name&is_active=true')['X-Cache-Status'], 'MISS')
+
+        user = User.objects.create_user(username="cacheuser", password="pass")
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.get(url + '?is_active=true&page=1&ordering=name&search=')
+        self.assertEqual(response['X-Cache-Status'], 'HIT')
+
+    def test_stale_copy_served_while_another_worker_recomputes(self):
+        url = reverse('racehorse-list')
+        self.client.get(url)
+        key = next(k for k in cache.keys('*racehorse_list_v*') if not k.endswith(':lock'))
+        entry = cache.get(key)
+        entry['fresh_until'] = 0
+        cache.set(key, entry)
+        cache.add(f'{key}:lock', 'other-worker')
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache-Status'], 'STALE')
+        self.assertEqual(response.data, entry['data'])
+
+        cache.delete(f'{key}:lock')
+        self.assertEqual(self.client.get(url)['X-Cache-Status'], 'MISS')
+
+    def test_racehorse_write_invalidates_list_cache(self):
+        url = reverse('racehorse-list')
+        self.client.get(url)
+        version = namespace_version('racehorse')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Racehorse.objects.create(name="Fresh Horse", breed="Arabian", gender="Male")
+
+        self.assertGreater(namespace_version('racehorse'), version)
+        response = self.client.get(url)
+        names = [r['name'] for r in response.data['results']]
+        self.assertIn("Fresh Horse", names)
+
+    def test_participation_write_bumps_dependent_namespaces(self):
+        before = {ns: namespace_version(ns) for ns in ('racehorse', 'jockey', 'race', 'participation')}
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate('participation')
+        for ns, version in before.items():
+            self.assertGreater(namespace_version(ns), version)
+
     def test_racehorse_throttle(self):
         url = reverse('racehorse-list')
         # Assuming default rate is 5 per minute for test
@@ -56,3 +110,55 @@ class CacheAndThrottleTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 # Note: For full throttle test you may want to adjust REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] in settings
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.racehorse = Racehorse.objects.create(
+            name="Conditional Horse", birth_date=date(2018, 1, 1), breed="Arabian", gender="Male"
+        )
+        self.client = APIClient()
+        cache.clear()
+
+    def test_list_returns_304_for_matching_etag(self):
+        url = reverse('racehorse-list')
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_detail_returns_304_for_if_modified_since(self):
+        url = reverse('racehorse-detail', args=[self.racehorse.id])
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_after_write(self):
+        url = reverse('participation-list')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate('participation')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_filters(self):
+        url = reverse('race-list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url + '?classification=G1', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    # Silk records every request into its own tables
+    @override_settings(MIDDLEWARE=[m for m in settings.MIDDLEWARE if not m.startswith('silk.')])
+    def test_validators_never_query_the_database(self):
+        url = reverse('racehorse-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache-Status'], 'HIT')
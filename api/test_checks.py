@@ -0,0 +1,27 @@
+# test_checks.py
+from unittest import mock
+from django.test import SimpleTestCase
+from .checks import check_filter_indexes
+from .views import RaceViewSet, ParticipationViewSet
+
+
+class FilterIndexCheckTests(SimpleTestCase):
+    def test_exposed_fields_are_indexed(self):
+        self.assertEqual(check_filter_indexes(), [])
+
+    def test_unindexed_ordering_field(self):
+        with mock.patch.object(RaceViewSet, 'ordering_fields', ['name', 'currency']):
+            errors = check_filter_indexes()
+        self.assertEqual([error.id for error in errors], ['api.E001'])
+        self.assertIn("Race.currency", errors[0].msg)
+
+    def test_substring_lookup_needs_trigram_index(self):
+        with mock.patch.object(ParticipationViewSet, 'search_fields', ['race__currency'], create=True):
+            errors = check_filter_indexes()
+        self.assertIn("trigram", errors[0].msg)
+
+    def test_missing_ordering_fields_expose_every_serializer_field(self):
+        with mock.patch.object(ParticipationViewSet, 'ordering_fields', None):
+            errors = check_filter_indexes()
+        unindexed = {error.msg.split(' exposes ')[1].split(' ')[0] for error in errors}
+        self.assertTrue({"Participation.odds", "Participation.margin", "Participation.finish_time"} <= unindexed)
@@ -0,0 +1,64 @@
+# test_exports.py
+import csv
+import io
+import json
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from .models import Racehorse, Jockey, Race, Participation
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.race = Race.objects.create(
+            name="Japan Cup", date=date(2023, 11, 26), location="Tokyo", track_configuration="left_handed",
+            track_condition="firm", classification="G1", season="FA", track_length=2400, track_surface="T",
+            prize_money=5000000,
+        )
+        self.other_race = Race.objects.create(
+            name="February Stakes", date=date(2024, 2, 18), location="Tokyo", track_configuration="left_handed",
+            track_condition="fast", classification="G1", season="WI", track_length=1600, track_surface="D",
+        )
+        horses = [Racehorse.objects.create(name=f"Horse {i}", breed="Thoroughbred") for i in range(3)]
+        jockeys = [Jockey.objects.create(name=f"Jockey {i}") for i in range(3)]
+        for i, (horse, jockey) in enumerate(zip(horses, jockeys), start=1):
+            Participation.objects.create(
+                race=self.race, racehorse=horse, jockey=jockey, position=i,
+                finish_time=timedelta(minutes=2, seconds=22 + i), odds="3.50",
+            )
+        Participation.objects.create(race=self.other_race, racehorse=horses[0], jockey=jockeys[0], position=1)
+
+    def get_body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_participations_csv_honours_filters(self):
+        url = reverse('participation-export')
+        response = self.client.get(url, {'format': 'csv', 'race__name__iexact': 'Japan Cup', 'position__lte': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(self.get_body(response))))
+        self.assertEqual([row['racehorse'] for row in rows], ["Horse 0", "Horse 1"])
+        self.assertEqual(rows[0]['finish_time'], "00:02:23")
+        self.assertEqual(rows[0]['odds'], "3.50")
+        self.assertEqual(rows[0]['margin'], "")
+
+    def test_races_ndjson(self):
+        response = self.client.get(reverse('race-export'), {'format': 'ndjson', 'track_surface': 'T'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = [json.loads(line) for line in self.get_body(response).splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['name'], "Japan Cup")
+        self.assertEqual(lines[0]['date'], "2023-11-26")
+        self.assertEqual(lines[0]['prize_money'], "5000000.00")
+
+    def test_racehorses_export_includes_career_stats(self):
+        response = self.client.get(reverse('racehorse-export'), {'format': 'ndjson', 'name__iexact': 'Horse 0'})
+        line = json.loads(self.get_body(response))
+        self.assertEqual((line['total_races'], line['total_wins']), (2, 2))
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('participation-export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
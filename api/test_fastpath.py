@@ -0,0 +1,126 @@
+# test_fastpath.py
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from .models import Racehorse, Jockey, Race, Participation
+from .views import RaceViewSet
+
+
+# Silk records every request into its own tables, which would pollute the counts
+@override_settings(MIDDLEWARE=[m for m in settings.MIDDLEWARE if not m.startswith('silk.')])
+class FastListSerializationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        races = [
+            Race.objects.create(
+                name=f"Race {i}",
+                date=date(2024, 1, 10 - i),
+                location="Track A",
+                track_configuration="left_handed",
+                track_condition="fast",
+                classification="G1" if i % 2 == 0 else "G2",
+                season="SU",
+                track_length=1200 + i,
+                prize_money=Decimal('50000.50'),
+                currency="USD",
+                track_surface="D"
+            )
+            for i in range(4)
+        ]
+        # One race without runners: no winner, zero participants
+        Race.objects.create(
+            name="Empty Race", date=date(2024, 2, 1), location="Track B",
+            track_configuration="right_handed", track_condition="fast", classification="G3",
+            season="WI", track_length=1000, prize_money=1000, currency="USD", track_surface="D",
+        )
+        for i in range(6):
+            horse = Racehorse.objects.create(
+                name=f"Horse {i}", breed="Thoroughbred", birth_date=date(2018, 3, i + 1),
+                image=f"racehorses/horse{i}.jpg" if i % 2 else None,
+            )
+            jockey = Jockey.objects.create(name=f"Jockey {i}", birth_date=date(1990, 1, 1), height_cm=160)
+            for race in races:
+                Participation.objects.create(
+                    racehorse=horse, jockey=jockey, race=race, position=(i + race.pk) % 6 + 1,
+                    finish_time=timedelta(minutes=1, seconds=10 + i, microseconds=500),
+                    margin=Decimal('1.25') * i, odds=Decimal('3.50') if i % 3 else None,
+                )
+
+    def get_both(self, url_name, params=None):
+        responses = []
+        for enabled in (False, True):
+            cache.clear()
+            with override_settings(FAST_LIST_SERIALIZATION=enabled):
+                response = self.client.get(reverse(url_name), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            responses.append(response.content)
+        return responses
+
+    def assertSameBytes(self, url_name, params=None):
+        slow, fast = self.get_both(url_name, params)
+        self.assertEqual(fast, slow)
+        return fast
+
+    def test_lists_are_byte_identical(self):
+        expandable = {
+            'racehorse-list': 'participations',
+            'jockey-list': 'participations,racehorses',
+            'race-list': 'participations',
+            'participation-list': '',
+        }
+        for url_name, expand in expandable.items():
+            with self.subTest(url_name):
+                self.assertSameBytes(url_name, {'page_size': 50})
+                self.assertSameBytes(url_name, {'page_size': 50, 'expand': expand})
+                with override_settings(EXPAND_NESTED_BY_DEFAULT=True):
+                    self.assertSameBytes(url_name, {'page_size': 50})
+
+    def test_sparse_fields_and_ordering_are_byte_identical(self):
+        cases = [
+            ('racehorse-list', {'fields': 'id,name,image,win_rate'}),
+            ('racehorse-list', {'fields': 'name', 'expand': 'participations', 'ordering': '-name'}),
+            ('jockey-list', {'fields': 'name,racehorses'}),
+            ('race-list', {'fields': 'name,winner', 'ordering': 'track_length'}),
+            ('race-list', {'pagination': 'cursor', 'page_size': 2}),
+            ('participation-list', {'fields': 'racehorse_image,finish_time,odds,is_winner'}),
+            ('participation-list', {'pagination': 'cursor', 'ordering': 'race__date', 'page_size': 3}),
+            ('participation-list', {'racehorse': Racehorse.objects.first().pk}),
+        ]
+        for url_name, params in cases:
+            with self.subTest(url_name, **params):
+                self.assertSameBytes(url_name, params)
+
+    def test_unpaginated_list_is_byte_identical(self):
+        with mock.patch.object(RaceViewSet, 'pagination_class', None):
+            content = self.assertSameBytes('race-list', {'ordering': 'track_length'})
+        self.assertTrue(content.startswith(b'[{'))
+
+    def test_keyset_cursor_from_fast_rows(self):
+        cache.clear()
+        response = self.client.get(reverse('participation-list'), {'pagination': 'cursor', 'page_size': 5})
+        seen = [row['id'] for row in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [row['id'] for row in response.data['results']]
+        self.assertEqual(seen, list(Participation.objects.order_by('race__date', 'id').values_list('id', flat=True)))
+
+    def test_race_list_query_count_is_constant(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('race-list'), {'page_size': 2})
+        small = len(ctx.captured_queries)
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('race-list'), {'page_size': 5})
+        self.assertEqual(len(ctx.captured_queries), small)
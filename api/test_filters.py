@@ -2,6 +2,7 @@
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
+from django.core.cache import cache
 from datetime import date
 from .models import Racehorse, Jockey, Race
 
@@ -46,6 +47,7 @@ class FilterTests(APITestCase):
             currency="USD",
             track_surface="D"
         )
+        cache.clear()  # Cached responses are shared across users and tests
         self.client = APIClient()
 
     # Racehorse filters
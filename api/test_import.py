@@ -0,0 +1,138 @@
+# test_import.py
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+from .autocomplete import AUTOCOMPLETE_SOURCES
+from .cache import namespace_version
+from .models import Racehorse, Jockey, Race, Participation
+from .stats import verify_stats
+
+CSV_HEADER = (
+    "race_name,race_date,location,track_configuration,track_condition,classification,season,"
+    "track_length,track_surface,prize_money,currency,racehorse,breed,gender,birth_date,country,"
+    "jockey,position,finish_time,margin,odds\n"
+)
+
+
+class ImportResultsTests(TestCase):
+    def write(self, suffix, content):
+        f = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False)
+        f.write(content)
+        f.close()
+        self.addCleanup(lambda: os.path.exists(f.name) and os.remove(f.name))
+        return f.name
+
+    def test_import_csv(self):
+        path = self.write('.csv', CSV_HEADER + "".join(
+            f"Arima Kinen,2023-12-24,Nakayama,right_handed,firm,G1,WI,2500,T,500000,JPY,"
+            f"Horse {i},Thoroughbred,Male,2019-04-01,Japan,Jockey {i},{i},0:02:31.{i},{i - 1},{i}.5\n"
+            for i in range(1, 6)
+        ) + "Bad Race,not-a-date,X,left_handed,firm,G1,WI,1,T,1,JPY,Horse 1,Arabian,Male,,,Jockey 1,1,,,\n")
+        out = StringIO()
+        call_command('import_results', path, '--chunk-size', '2', stdout=out, stderr=StringIO())
+        self.assertIn("Import complete: 5 results inserted", out.getvalue())
+        self.assertEqual(Race.objects.count(), 1)
+        self.assertEqual(Racehorse.objects.count(), 5)
+        self.assertEqual(Participation.objects.count(), 5)
+        self.assertEqual(verify_stats(), [])
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+        # Re-importing the same archive doesn't duplicate anything
+        call_command('import_results', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Participation.objects.count(), 5)
+
+    def test_import_ndjson_resumes_from_checkpoint(self):
+        lines = [
+            json.dumps({
+                "race_name": "Derby", "race_date": "2024-06-01", "location": "Tokyo",
+                "track_configuration": "left_handed", "track_condition": "good", "classification": "G1",
+                "season": "SP", "track_length": 2400, "track_surface": "T", "prize_money": 1000,
+                "racehorse": f"Colt {i}", "jockey": f"Rider {i}", "position": i,
+            })
+            for i in range(1, 5)
+        ]
+        content = "\n".join(lines) + "\n"
+        path = self.write('.ndjson', content)
+        # Pretend the first two lines were loaded by an interrupted run
+        offset = len("\n".join(lines[:2]) + "\n")
+        with open(f'{path}.checkpoint', 'w') as f:
+            json.dump({'offset': offset, 'rows': 2, 'inserted': 2, 'skipped': 0}, f)
+
+        call_command('import_results', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(
+            sorted(Participation.objects.values_list('racehorse__name', flat=True)), ["Colt 3", "Colt 4"]
+        )
+        self.assertEqual(Jockey.objects.count(), 2)
+
+
+    def test_import_invalidates_autocomplete(self):
+        source = AUTOCOMPLETE_SOURCES['racehorse']
+        source.reset()
+        self.assertEqual(source.search("arima", 10), [])
+        version = namespace_version(source.namespace)
+        path = self.write('.csv', CSV_HEADER + (
+            "Arima Kinen,2023-12-24,Nakayama,right_handed,firm,G1,WI,2500,T,500000,JPY,"
+            "Arima Star,Thoroughbred,Male,,,Rider,1,,,\n"
+        ))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_results', path, stdout=StringIO(), stderr=StringIO())
+        # Other processes see the new version; this one rebuilds straight away
+        self.assertNotEqual(namespace_version(source.namespace), version)
+        self.assertEqual([r['name'] for r in source.search("arima", 10)], ["Arima Star"])
+        self.assertEqual(AUTOCOMPLETE_SOURCES['race'].search("arima", 10), [{'name': "Arima Kinen"}])
+
+    def test_bad_lines_are_skipped_alone(self):
+        good = {
+            "race_name": "Oaks", "race_date": "2024-05-19", "location": "Tokyo",
+            "track_configuration": "left_handed", "track_condition": "good", "classification": "G1",
+            "season": "SP", "track_length": 2400, "track_surface": "T", "prize_money": 1000,
+            "racehorse": "Filly 1", "jockey": "Rider 1", "position": 1,
+        }
+        lines = [
+            dict(good, racehorse="", jockey="Rider 2", position=2),
+            dict(good, racehorse="Filly 3", jockey="Rider 3", position=0),
+            dict(good, racehorse="Filly 4", jockey="Rider 4", position=-1),
+            ["not", "an", "object"],
+            "Oaks",
+            good,
+        ]
+        path = self.write('.ndjson', "".join(json.dumps(line) + "\n" for line in lines))
+        out, err = StringIO(), StringIO()
+        call_command('import_results', path, stdout=out, stderr=err)
+        self.assertIn("Import complete: 1 results inserted", out.getvalue())
+        self.assertEqual(list(Racehorse.objects.values_list('name', flat=True)), ["Filly 1"])
+        for line_number, reason in (
+            (1, "missing racehorse"), (2, "invalid position 0"), (3, "invalid position -1"),
+            (4, "expected a JSON object, got list"), (5, "expected a JSON object, got str"),
+        ):
+            self.assertIn(f"Line {line_number}: skipped ({reason})", err.getvalue())
+
+
+class PopulateDbTests(TestCase):
+    def test_synthetic_dataset(self):
+        options = ['--horses', '40', '--jockeys', '15', '--races', '30', '--runners-per-race', '8', '--seed', '7']
+        call_command('populate_db', *options, stdout=StringIO())
+        generated = Participation.objects.count() - 6  # the curated sample has 2 races x 3 runners
+        self.assertEqual(generated, 8 * (Race.objects.count() - 2))
+        for race in Race.objects.all():
+            race.full_clean()
+        self.assertEqual(verify_stats(), [])
+
+        self.assertEqual(Race.objects.count(), 30 + 2)
+
+        # The same seed regenerates the same rows, which already exist
+        snapshot = list(Participation.objects.order_by('id').values_list('race__name', 'racehorse__name', 'position'))
+        out = StringIO()
+        call_command('populate_db', *options, stdout=out)
+        self.assertIn("Skipped 30 races whose name and date already existed.", out.getvalue())
+        self.assertEqual(
+            list(Participation.objects.order_by('id').values_list('race__name', 'racehorse__name', 'position')),
+            snapshot,
+        )
+
+    def test_field_size_is_bounded_by_jockeys(self):
+        with self.assertRaises(CommandError):
+            call_command('populate_db', '--horses', '10', '--jockeys', '3', '--races', '1', stdout=StringIO())
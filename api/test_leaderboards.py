@@ -0,0 +1,115 @@
+# test_leaderboards.py
+from datetime import date
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from .models import Racehorse, Jockey, Race, Participation, RacehorseLeaderboard
+from .stats import result_of, scopes_of, verify_stats
+
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.horses = [Racehorse.objects.create(name=f"Horse {i}", breed="Thoroughbred") for i in range(3)]
+        self.jockeys = [Jockey.objects.create(name=f"Jockey {i}") for i in range(3)]
+        # (date, season, surface, classification, finishing order of horse indexes)
+        races = [
+            (date(2024, 4, 1), 'SP', 'D', 'G1', (0, 1, 2)),
+            (date(2024, 7, 1), 'SU', 'T', 'G2', (1, 0, 2)),
+            (date(2023, 4, 1), 'SP', 'D', 'G1', (0, 2, 1)),
+            (date(2023, 8, 1), 'SU', 'D', 'G3', (2, 0)),
+        ]
+        self.races = []
+        for day, season, surface, classification, order in races:
+            race = Race.objects.create(
+                name=f"Race {day}", date=day, location="Track A", track_configuration="left_handed",
+                track_condition="fast", classification=classification, season=season, track_length=1600,
+                prize_money=10000, currency="USD", track_surface=surface,
+            )
+            self.races.append(race)
+            for position, i in enumerate(order, start=1):
+                Participation.objects.create(
+                    race=race, racehorse=self.horses[i], jockey=self.jockeys[i], position=position,
+                )
+
+    def ranking(self, url_name='horse-leaderboard-list', **params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['name'], row['starts'], row['wins']) for row in response.data['results']]
+
+    def test_default_ranking_is_most_wins_over_all_races(self):
+        self.assertEqual(self.ranking(), [("Horse 0", 4, 2), ("Horse 2", 4, 1), ("Horse 1", 3, 1)])
+        row = self.client.get(reverse('horse-leaderboard-list')).data['results'][0]
+        self.assertEqual(row['racehorse'], self.horses[0].pk)
+        self.assertEqual((row['g1_wins'], row['places'], row['earnings']), (2, 4, '16000.00'))
+        self.assertEqual(row['win_rate'], 50.0)
+        jockeys = self.client.get(reverse('jockey-leaderboard-list')).data['results']
+        self.assertEqual([row['jockey'] for row in jockeys], [self.jockeys[0].pk, self.jockeys[2].pk, self.jockeys[1].pk])
+
+    def test_scope_filters_and_min_starts(self):
+        self.assertEqual(self.ranking(year=2024, surface='T'), [("Horse 1", 1, 1), ("Horse 2", 1, 0), ("Horse 0", 1, 0)])
+        self.assertEqual(self.ranking(year=2023, classification='G3'), [("Horse 2", 1, 1), ("Horse 0", 1, 0)])
+        self.assertEqual(self.ranking(classification='G1', min_starts=2)[0], ("Horse 0", 2, 2))
+        self.assertEqual(self.ranking(surface='D', min_starts=4), [])
+        response = self.client.get(reverse('horse-leaderboard-list'), {'season': 'XX', 'min_starts': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'season', 'min_starts'})
+        # Only the scopes in Leaderboard.SCOPES are precomputed
+        response = self.client.get(reverse('horse-leaderboard-list'), {'season': 'SU', 'classification': 'G3'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rankings_page_by_cursor(self):
+        expected = sorted(self.horses, key=lambda horse: (-horse.win_rate, -horse.pk))
+        url, seen = reverse('horse-leaderboard-list') + '?ordering=-win_rate&page_size=1', []
+        while url:
+            response = self.client.get(url)
+            seen.extend(row['racehorse'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [horse.pk for horse in expected])
+        by_earnings = self.client.get(reverse('horse-leaderboard-list'), {'ordering': '-earnings', 'page_size': 2})
+        self.assertEqual(by_earnings.data['results'][0]['name'], "Horse 0")
+        self.assertIsNotNone(by_earnings.data['next'])
+
+    def test_deep_pages_seek_from_the_boundary(self):
+        for i in range(3, 40):
+            horse = Racehorse.objects.create(name=f"Horse {i}", breed="Thoroughbred")
+            jockey = Jockey.objects.create(name=f"Jockey {i}")
+            Participation.objects.create(race=self.races[3], racehorse=horse, jockey=jockey, position=i % 12 + 3)
+        scope = {'year': 2023, 'classification': 'G3'}
+        expected = list(
+            RacehorseLeaderboard.objects.filter(year=2023, classification='G3', season='', surface='')
+            .order_by('-places', '-racehorse_id').values_list('racehorse_id', flat=True)
+        )
+        self.assertEqual(len(expected), 39)
+        url, seen = reverse('horse-leaderboard-list') + '?year=2023&classification=G3&ordering=-places&page_size=4', []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(len(queries), 1)
+            seen.extend(row['racehorse'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+        # The seek is bounded on the ranking, so the index range starts at the cursor
+        self.assertIn('"places" <=', queries[0]['sql'])
+        self.assertEqual(self.client.get(reverse('horse-leaderboard-list'), scope).data['results'][0]['name'], "Horse 2")
+
+    def test_rows_follow_result_and_race_changes(self):
+        # One row per scope the horse's four races fall in, shared scopes once
+        scopes = {scope for race in self.races for scope in scopes_of(result_of(Participation(), race))}
+        self.assertEqual(RacehorseLeaderboard.objects.filter(racehorse=self.horses[0]).count(), len(scopes))
+        participation = Participation.objects.get(race=self.races[1], racehorse=self.horses[1])
+        participation.position = 4
+        participation.save()
+        self.races[0].season = 'FA'
+        self.races[0].date = date(2022, 10, 1)
+        self.races[0].save()
+        self.races[3].delete()
+        self.assertEqual(self.ranking(year=2022, season='FA'), [("Horse 0", 1, 1), ("Horse 2", 1, 0), ("Horse 1", 1, 0)])
+        self.assertEqual(self.ranking(year=2024), [("Horse 2", 1, 0), ("Horse 1", 1, 0), ("Horse 0", 1, 0)])
+        self.assertEqual(verify_stats(), [])
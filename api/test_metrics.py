@@ -0,0 +1,109 @@
+# test_metrics.py
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+
+from .metrics import Registry, RequestMetrics, registry
+from .models import Racehorse, Race
+from .query_budget import QueryBudget
+
+LABELS = 'view="RacehorseViewSet",action="list"'
+
+
+@override_settings(METRICS_FLUSH_INTERVAL=3600)
+class MetricsTests(APITestCase):
+    def setUp(self):
+        # Drain what earlier tests recorded before clearing Redis
+        registry.flush()
+        cache.clear()
+        self.client = APIClient()
+        Racehorse.objects.create(name="Metric Horse", breed="Thoroughbred")
+        Race.objects.create(
+            name="Metric Race", date=date(2024, 1, 1), location="Track A", track_configuration="left_handed",
+            track_condition="fast", classification="G1", season="SU", track_length=1200,
+            prize_money=50000, currency="USD", track_surface="D",
+        )
+
+    def scrape(self, **headers):
+        response = self.client.get('/metrics', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                field, value = line.rsplit(' ', 1)
+                samples[field] = float(value)
+        return samples
+
+    def test_requests_are_attributed_to_view_and_action(self):
+        url = reverse('racehorse-list')
+        with QueryBudget() as queries:
+            miss = self.client.get(url)
+            hit = self.client.get(url)
+        self.assertEqual((miss['X-Cache-Status'], hit['X-Cache-Status']), ('MISS', 'HIT'))
+        samples = self.scrape()
+
+        self.assertEqual(samples[f'api_requests_total{{{LABELS},status="200"}}'], 2)
+        self.assertEqual(samples[f'api_response_cache_total{{{LABELS},status="MISS"}}'], 1)
+        self.assertEqual(samples[f'api_response_cache_total{{{LABELS},status="HIT"}}'], 1)
+        self.assertEqual(samples[f'api_db_queries_total{{{LABELS}}}'], len(queries))
+        self.assertGreater(samples[f'api_db_query_duration_seconds_total{{{LABELS}}}'], 0)
+        self.assertGreaterEqual(samples[f'api_cache_hits_total{{{LABELS}}}'], 1)
+        self.assertGreaterEqual(samples[f'api_cache_misses_total{{{LABELS}}}'], 1)
+        self.assertEqual(samples[f'api_request_duration_seconds_count{{{LABELS}}}'], 2)
+        self.assertEqual(samples[f'api_request_duration_seconds_bucket{{{LABELS},le="+Inf"}}'], 2)
+        self.assertEqual(samples[f'api_response_size_bytes_sum{{{LABELS}}}'], len(miss.content) + len(hit.content))
+
+        detail = 'view="RaceViewSet",action="retrieve"'
+        self.client.get(reverse('race-detail', args=[Race.objects.get().pk]))
+        self.client.get('/api/no-such-endpoint/')
+        samples = self.scrape()
+        self.assertEqual(samples[f'api_requests_total{{{detail},status="200"}}'], 1)
+        self.assertEqual(samples['api_requests_total{view="<unresolved>",action="get",status="404"}'], 1)
+        # Queries outside a request are not counted
+        list(Racehorse.objects.all())
+        self.assertEqual(self.scrape()[f'api_db_queries_total{{{LABELS}}}'], len(queries))
+
+    async def test_async_endpoints_are_recorded(self):
+        client = AsyncClient()
+        url = reverse('async-racehorse-list')
+        statuses = [(await client.get(url))['X-Cache-Status'] for _ in range(2)]
+        self.assertEqual(statuses, ['MISS', 'HIT'])
+        await sync_to_async(registry.flush)()
+        samples = await sync_to_async(self.scrape)()
+        labels = 'view="AsyncRacehorseView",action="get"'
+        self.assertEqual(samples[f'api_requests_total{{{labels},status="200"}}'], 2)
+        self.assertEqual(samples[f'api_response_cache_total{{{labels},status="HIT"}}'], 1)
+        self.assertGreaterEqual(samples[f'api_cache_hits_total{{{labels}}}'], 1)
+        self.assertGreater(samples[f'api_db_queries_total{{{labels}}}'], 0)
+
+    def test_histogram_buckets_are_cumulative(self):
+        worker = Registry()
+        for seconds in (0.003, 0.2, 20):
+            worker.observe('View', 'list', 200, seconds, 100, RequestMetrics())
+        worker.flush()
+        samples = self.scrape()
+        bucket = 'api_request_duration_seconds_bucket{{view="View",action="list",le="{}"}}'
+        self.assertEqual(samples[bucket.format(0.005)], 1)
+        self.assertEqual(samples[bucket.format(0.25)], 2)
+        self.assertEqual(samples[bucket.format(10)], 2)
+        self.assertEqual(samples[bucket.format('+Inf')], 3)
+        self.assertAlmostEqual(samples['api_request_duration_seconds_sum{view="View",action="list"}'], 20.203)
+
+    def test_worker_processes_add_up_in_redis(self):
+        workers = [Registry(), Registry()]
+        for worker in workers:
+            worker.observe('View', 'list', 200, 0.01, 100, RequestMetrics())
+        for worker in workers:
+            worker.flush()
+        self.assertEqual(self.scrape()['api_requests_total{view="View",action="list",status="200"}'], 2)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.scrape(HTTP_AUTHORIZATION='Bearer scrape-secret')
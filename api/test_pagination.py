@@ -0,0 +1,105 @@
+# test_pagination.py
+import base64
+import json
+
+from django.urls import reverse
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from datetime import date
+from .models import Racehorse, Jockey, Race, Participation
+from .pagination import KeysetPagination
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        horses = [Racehorse.objects.create(name=f"Horse {i}", breed="Arabian") for i in range(5)]
+        jockeys = [Jockey.objects.create(name=f"Jockey {i}") for i in range(5)]
+        for day in (3, 1, 2, 5):
+            race = Race.objects.create(
+                name=f"Race {day}",
+                date=date(2024, 6, day),
+                location="Track A",
+                track_configuration="left_handed",
+                track_condition="fast",
+                classification="G3",
+                season="SU",
+                track_length=1600,
+                prize_money=10000,
+                currency="USD",
+                track_surface="D"
+            )
+            for position, (horse, jockey) in enumerate(zip(horses, jockeys), start=1):
+                Participation.objects.create(racehorse=horse, jockey=jockey, race=race, position=position)
+
+    def walk(self, url):
+        seen, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return seen, pages
+
+    def test_participations_walk_by_race_date(self):
+        url = reverse('participation-list') + '?pagination=cursor&page_size=3'
+        rows, pages = self.walk(url)
+        expected = list(
+            Participation.objects.order_by('race__date', 'id').values_list('id', flat=True)
+        )
+        self.assertEqual([row['id'] for row in rows], expected)
+        self.assertEqual(pages, 7)
+
+    def test_descending_ordering_and_previous_link(self):
+        url = reverse('race-list') + '?pagination=cursor&page_size=2&ordering=-date'
+        first = self.client.get(url).data
+        self.assertEqual([r['name'] for r in first['results']], ['Race 5', 'Race 3'])
+        self.assertIsNone(first['previous'])
+
+        second = self.client.get(first['next']).data
+        self.assertEqual([r['name'] for r in second['results']], ['Race 2', 'Race 1'])
+        self.assertIsNone(second['next'])
+
+        back = self.client.get(second['previous']).data
+        self.assertEqual([r['name'] for r in back['results']], ['Race 5', 'Race 3'])
+
+    def test_cursor_pages_run_no_count(self):
+        for name in ('race', 'participation'):
+            for fast in (False, True):
+                with self.subTest(name, fast=fast), override_settings(FAST_LIST_SERIALIZATION=fast):
+                    cache.clear()
+                    url = reverse(f'{name}-list') + '?pagination=cursor&page_size=2'
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    counts = [q['sql'] for q in queries if q['sql'].startswith('SELECT COUNT(')]
+                    self.assertEqual(counts, [])
+
+    def test_page_number_clients_unchanged(self):
+        response = self.client.get(reverse('participation-list') + '?page=2')
+        self.assertEqual(response.data['count'], 20)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('race-list') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_values(self):
+        url = reverse('participation-list') + '?pagination=cursor&ordering=race__date'
+        for values in (['not-a-date', 1], ['2024-06-01', 'x'], [None, 1], [[], 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'direction': 'next', 'values': values}).encode()).decode()
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+
+    def test_seek_bounds_the_leading_field(self):
+        condition = KeysetPagination.seek(['-race__date', '-id'], [date(2024, 6, 1), 7])
+        expected = (Q(race__date__lt=date(2024, 6, 1)) | Q(race__date=date(2024, 6, 1), id__lt=7)) & Q(race__date__lte=date(2024, 6, 1))
+        self.assertEqual(condition, expected)
@@ -0,0 +1,128 @@
+# test_profiling.py
+import asyncio
+import marshal
+import time
+from datetime import date
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APITestCase, APIClient
+
+from .models import Racehorse, Race, User
+from .profiling import ProfilingMiddleware, list_summaries, get_record, get_blob, sampler
+from .tasks import explain_profile
+from .views import AutocompleteView
+
+
+def slow_autocomplete(self, request):
+    time.sleep(0.05)
+    return Response({'results': []})
+
+
+@override_settings(PROFILING_SAMPLE_RATE=0, PROFILING_SLOW_MS=10_000, PROFILING_STACK_INTERVAL=0.005)
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='staff', is_staff=True)
+        Racehorse.objects.create(name="Profiled Horse", breed="Thoroughbred")
+        Race.objects.create(
+            name="Profiled Race", date=date(2024, 1, 1), location="Track A", track_configuration="left_handed",
+            track_condition="fast", classification="G1", season="SU", track_length=1200,
+            prize_money=50000, currency="USD", track_surface="D",
+        )
+
+    def admin_get(self, url_name, profile_id):
+        self.client.force_authenticate(self.admin)
+        try:
+            return self.client.get(reverse(url_name, args=[profile_id]))
+        finally:
+            self.client.force_authenticate(None)
+
+    def test_fast_unsampled_requests_are_not_kept(self):
+        self.client.get(reverse('racehorse-list'))
+        self.assertEqual(list_summaries(), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_request_has_profile_sql_and_explain(self):
+        with mock.patch.object(explain_profile, 'delay') as delay:
+            self.client.get(reverse('racehorse-list'))
+        summary, = list_summaries()
+        # Plans are taken by the Celery task, after the response
+        self.assertFalse(any('explain' in query for query in get_record(summary['id'])['queries']))
+        explain_profile(*delay.call_args.args)
+        self.assertEqual(
+            (summary['reason'], summary['view'], summary['action'], summary['download']),
+            ('sampled', 'RacehorseViewSet', 'list', 'prof'),
+        )
+        self.assertGreater(summary['query_count'], 0)
+
+        record = self.admin_get('profile-detail', summary['id']).json()
+        self.assertIn('cumulative', record['profile'])
+        self.assertEqual(len(record['queries']), summary['query_count'])
+        explained = [query for query in record['queries'] if 'explain' in query]
+        self.assertTrue(explained)
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in explained))
+        self.assertFalse([query['explain'] for query in explained if query['explain'].startswith('EXPLAIN failed')])
+
+        download = self.admin_get('profile-download', summary['id'])
+        self.assertEqual(download['Content-Disposition'], f'attachment; filename="{summary["id"]}.prof"')
+        stats = marshal.loads(download.content)
+        self.assertTrue(any(name == 'list' for _, _, name in stats))
+
+    @override_settings(PROFILING_SLOW_MS=20)
+    def test_slow_request_keeps_stack_samples(self):
+        with mock.patch.object(AutocompleteView, 'get', slow_autocomplete):
+            self.client.get(reverse('autocomplete'))
+        summary, = list_summaries()
+        self.assertEqual((summary['reason'], summary['view'], summary['download']), ('slow', 'AutocompleteView', 'folded'))
+        self.assertGreaterEqual(summary['duration_ms'], 50)
+        record = self.admin_get('profile-detail', summary['id']).json()
+        self.assertIsNone(record['profile'])
+        self.assertTrue(any('slow_autocomplete' in sample['stack'] for sample in record['stacks']))
+        folded = self.admin_get('profile-download', summary['id']).content.decode()
+        self.assertIn('slow_autocomplete (test_profiling.py', folded)
+
+    def test_requests_short_of_the_threshold_are_never_stack_sampled(self):
+        watched = sampler.watch()
+        time.sleep(0.05)
+        sampler.unwatch()
+        self.assertIsNone(watched.stacks)
+
+    @override_settings(PROFILING_SLOW_MS=20)
+    def test_async_requests_stay_async(self):
+        async def get_response(request):
+            await asyncio.sleep(0.05)
+            return HttpResponse()
+
+        middleware = ProfilingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(RequestFactory().get('/api/async/races/'))
+        summary, = list_summaries()
+        self.assertEqual((summary['reason'], summary['download']), ('slow', None))
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_BUFFER_SIZE=2)
+    def test_buffer_keeps_the_latest_profiles(self):
+        self.client.get(reverse('racehorse-list'))
+        oldest = list_summaries()[0]['id']
+        self.client.get(reverse('race-list'))
+        self.client.get(reverse('autocomplete'))
+        self.assertEqual([s['view'] for s in list_summaries()], ['AutocompleteView', 'RaceViewSet'])
+        self.assertIsNone(get_record(oldest))
+        self.assertIsNone(get_blob(oldest))
+
+    def test_endpoints_are_staff_only(self):
+        url = reverse('profile-list')
+        self.assertIn(self.client.get(url).status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.client.force_authenticate(User.objects.create_user(username='member'))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.admin_get('profile-detail', '0' * 32).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,100 @@
+# test_query_budgets.py
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from silk.collector import DataCollector
+
+from .models import Racehorse, Jockey, Race, Participation, User
+from .query_budget import QueryBudget
+from .urls import router
+
+
+# Silk records every request into its own tables, which would pollute the counts
+@override_settings(MIDDLEWARE=[m for m in settings.MIDDLEWARE if not m.startswith('silk.')])
+class QueryBudgetTests(APITestCase):
+    """
+        Every viewset action with a query_budgets entry runs at two data sizes
+        (more rows per page, more nested rows per object) and must stay
+        within its budget without growing. List actions are checked on both
+        the serializer and the fast values() path.
+    """
+    def setUp(self):
+        cache.clear()
+        # Silk keeps the last request on its thread-local collector and goes on
+        # recording (and EXPLAINing) every query after an earlier test's request
+        DataCollector().clear()
+        self.client = APIClient()
+        User.objects.create_user(username='budget')
+        self.grow(2)
+
+    def grow(self, count):
+        """Add count races, horses and jockeys; every horse runs in every race"""
+        start = Race.objects.count()
+        for i in range(start, start + count):
+            Race.objects.create(
+                name=f"Race {i}", date=date(2024, 1, 1) + timedelta(days=i), location="Track A",
+                track_configuration="left_handed", track_condition="fast", classification="G1",
+                season="SU", track_length=1200, prize_money=50000, currency="USD", track_surface="D",
+            )
+            Racehorse.objects.create(name=f"Horse {i}", breed="Thoroughbred")
+            Jockey.objects.create(name=f"Jockey {i}")
+        runners = list(zip(Racehorse.objects.order_by('pk'), Jockey.objects.order_by('pk')))
+        entered = set(Participation.objects.values_list('race_id', 'racehorse_id'))
+        for race in Race.objects.all():
+            for position, (horse, jockey) in enumerate(runners, start=1):
+                if (race.pk, horse.pk) not in entered:
+                    Participation.objects.create(race=race, racehorse=horse, jockey=jockey, position=position)
+
+    def endpoints(self):
+        """(label, url, budget, settings) for every budgeted action, with every nested list expanded"""
+        for _, viewset, basename in router.registry:
+            budgets = getattr(viewset, 'query_budgets', {})
+            if not budgets:
+                continue
+            expandable = getattr(viewset(action='list').get_serializer_class(), 'expandable_fields', ())
+            query = f"?expand={','.join(expandable)}" if expandable else ''
+            for action, budget in budgets.items():
+                if action == 'list':
+                    url = reverse(f'{basename}-list') + query
+                    for fast in (False, True) if getattr(viewset, 'fast_serializer_class', None) else (False,):
+                        yield f'{basename}-list fast={fast}', url, budget, {'FAST_LIST_SERIALIZATION': fast}
+                else:
+                    pk = viewset.queryset.model._default_manager.order_by('pk').values_list('pk', flat=True).first()
+                    yield f'{basename}-{action}', reverse(f'{basename}-detail', args=[pk]) + query, budget, {}
+
+    def measure(self, label, url, budget, overrides):
+        cache.clear()
+        with override_settings(**overrides), QueryBudget(budget, label=label) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return queries
+
+    def test_endpoints_stay_within_budget(self):
+        endpoints = list(self.endpoints())
+        self.assertTrue(endpoints)
+        small = {}
+        for label, url, budget, overrides in endpoints:
+            with self.subTest(label, size='small'):
+                small[label] = len(self.measure(label, url, budget, overrides))
+
+        self.grow(10)
+        for label, url, budget, overrides in endpoints:
+            with self.subTest(label, size='large'):
+                queries = self.measure(label, url, budget, overrides)
+                if label in small and len(queries) > small[label]:
+                    self.fail(queries.report(f"{len(queries)} queries with more data, {small[label]} with less"))
+
+    def test_report_groups_queries_by_call_site(self):
+        race = Race.objects.first()
+        with self.assertRaises(AssertionError) as raised, QueryBudget(1, label='winner N+1'):
+            for _ in range(3):
+                race.winner
+        report = str(raised.exception)
+        self.assertIn('winner N+1: 3 queries, budget is 1', report)
+        self.assertIn('3x api/models.py', report)
+        self.assertIn('(winner)', report)
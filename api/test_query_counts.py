@@ -0,0 +1,129 @@
+# test_query_counts.py
+from django.conf import settings
+from django.urls import reverse
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from datetime import date
+from .models import Racehorse, Jockey, Race, Participation
+
+
+# Silk records every request into its own tables, which would pollute the counts
+@override_settings(MIDDLEWARE=[m for m in settings.MIDDLEWARE if not m.startswith('silk.')])
+class ListQueryCountTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.races = [
+            Race.objects.create(
+                name=f"Race {i}",
+                date=date(2024, 1, i + 1),
+                location="Track A",
+                track_configuration="left_handed",
+                track_condition="fast",
+                classification="G1" if i % 2 == 0 else "G2",
+                season="SU",
+                track_length=1200,
+                prize_money=50000,
+                currency="USD",
+                track_surface="D"
+            )
+            for i in range(3)
+        ]
+
+    def add_runners(self, count):
+        start = Racehorse.objects.count()
+        for i in range(start, start + count):
+            horse = Racehorse.objects.create(name=f"Horse {i}", breed="Thoroughbred")
+            jockey = Jockey.objects.create(name=f"Jockey {i}")
+            for position, race in enumerate(self.races, start=1):
+                Participation.objects.create(
+                    racehorse=horse, jockey=jockey, race=race, position=position
+                )
+
+    def count_list_queries(self, url_name, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response
+
+    def test_racehorse_list_query_count_is_constant(self):
+        self.add_runners(2)
+        small, _ = self.count_list_queries('racehorse-list', {'expand': 'participations'})
+        self.add_runners(6)
+        large, _ = self.count_list_queries('racehorse-list', {'expand': 'participations'})
+        self.assertEqual(small, large)
+
+    def test_jockey_list_query_count_is_constant(self):
+        self.add_runners(2)
+        small, _ = self.count_list_queries('jockey-list', {'expand': 'participations,racehorses'})
+        self.add_runners(6)
+        large, _ = self.count_list_queries('jockey-list', {'expand': 'participations,racehorses'})
+        self.assertEqual(small, large)
+
+    def test_annotated_stats_match_properties(self):
+        self.add_runners(2)
+        _, response = self.count_list_queries('racehorse-list')
+        for row in response.data['results']:
+            horse = Racehorse.objects.get(pk=row['id'])
+            self.assertEqual(row['total_races'], horse.total_races)
+            self.assertEqual(row['total_wins'], horse.total_wins)
+            self.assertEqual(row['win_rate'], horse.win_rate)
+            self.assertEqual(row['g1_wins'], horse.g1_wins)
+
+    def test_jockey_racehorses_breakdown(self):
+        self.add_runners(1)
+        jockey = Jockey.objects.get()
+        _, response = self.count_list_queries('jockey-list', {'expand': 'racehorses'})
+        racehorses = response.data['results'][0]['racehorses']
+        self.assertEqual(racehorses, [{
+            'name': 'Horse 0',
+            'jockey_total_races': 3,
+            'jockey_total_wins': 1,
+            'jockey_win_rate': 33.33,
+        }])
+        detail = self.client.get(reverse('jockey-detail', args=[jockey.pk]), {'expand': 'racehorses'})
+        self.assertEqual(detail.data['racehorses'], racehorses)
+
+    def test_sparse_fieldsets_skip_nested_work(self):
+        self.add_runners(2)
+        full, _ = self.count_list_queries('jockey-list', {'expand': 'participations,racehorses'})
+        sparse, response = self.count_list_queries('jockey-list', {'fields': 'id,name'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+        self.assertLess(sparse, full)
+        with CaptureQueriesContext(connection) as ctx:
+            cache.clear()
+            self.client.get(reverse('jockey-list'), {'fields': 'id,name'})
+        self.assertNotIn('api_jockeystats', ' '.join(query['sql'] for query in ctx.captured_queries))
+
+        expanded, response = self.count_list_queries('jockey-list', {'fields': 'id', 'expand': 'racehorses'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'racehorses'})
+        self.assertLess(sparse, expanded)
+        self.assertLess(expanded, full)
+
+    def test_nested_lists_are_opt_in(self):
+        self.add_runners(2)
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('racehorse-list'))
+        self.assertNotIn('participations', response.data['results'][0])
+        self.assertNotIn('api_participation', ' '.join(query['sql'] for query in ctx.captured_queries))
+        default = len(ctx.captured_queries)
+        expanded, response = self.count_list_queries('racehorse-list', {'expand': 'participations'})
+        self.assertEqual(len(response.data['results'][0]['participations']), 3)
+        self.assertLess(default, expanded)
+        with override_settings(EXPAND_NESTED_BY_DEFAULT=True):
+            _, response = self.count_list_queries('racehorse-list')
+        self.assertEqual(len(response.data['results'][0]['participations']), 3)
+
+    def test_sparse_participation_fields_join_only_needed_relations(self):
+        self.add_runners(2)
+        small, response = self.count_list_queries('participation-list', {'fields': 'id,race_name'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'race_name'})
+        self.add_runners(3)
+        large, _ = self.count_list_queries('participation-list', {'fields': 'id,race_name'})
+        self.assertEqual(small, large)
@@ -0,0 +1,100 @@
+# test_renderers.py
+import io
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APIClient
+
+from .models import Racehorse, Jockey, Race, Participation
+from .parsers import ORJSONParser
+from .renderers import ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    payload = {
+        'prize_money': Decimal('50000.50'),
+        'finish_time': timedelta(minutes=1, seconds=12, microseconds=340000),
+        'created_at': datetime(2024, 5, 1, 12, 30, 5, 123456, tzinfo=timezone.utc),
+        'local': datetime(2024, 5, 1, 12, 30, tzinfo=timezone(timedelta(hours=9))),
+        'naive': datetime(2024, 5, 1, 12, 30),
+        'date': date(2024, 5, 1),
+        'post_time': time(15, 40),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'label': gettext_lazy('Winner'),
+        'name': 'Ōkami\u2028Dancer\u2029',
+        1: [None, True, 1.5, -3, {'nested': ('a', 'b')}],
+    }
+
+    def test_matches_json_renderer(self):
+        for data in (self.payload, [self.payload] * 3, {'big': 2 ** 70}, [], None):
+            with self.subTest(data=data):
+                self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_floats_match_json_renderer(self):
+        floats = [
+            0.0, -0.0, 1.5, 0.1, 0.0001, 1e-05, 1.5e-07, -2e-300, 5e-324,
+            1e15, 1e16, 1.5e+16, -1e+300, 1.7976931348623157e+308, 123456789.125,
+        ]
+        for data in (floats, {'win_rate': 1e16}, {'odds': 1.5e-07}, {'name': '1e5', 'label': 'x,1e5'}):
+            with self.subTest(data=data):
+                self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_non_finite_floats_render_as_null(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render([value])
+                self.assertEqual(ORJSONRenderer().render([value]), b'[null]')
+
+    def test_indented_output_falls_back(self):
+        context = {'indent': 4}
+        self.assertEqual(
+            ORJSONRenderer().render(self.payload, 'application/json', context),
+            JSONRenderer().render(self.payload, 'application/json', context),
+        )
+
+
+class ORJSONParserTests(SimpleTestCase):
+    def parse(self, body, parser_class=ORJSONParser):
+        return parser_class().parse(io.BytesIO(body), 'application/json', {})
+
+    def test_matches_json_parser(self):
+        body = '{"name": "Ōkami", "odds": 3.5, "position": 1, "runners": [null, true]}'.encode()
+        self.assertEqual(self.parse(body), self.parse(body, JSONParser))
+
+    def test_rejects_invalid_json(self):
+        for body in (b'{"name": ', b'{"odds": NaN}', b'\xff'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                self.parse(body)
+
+
+class ORJSONApiTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        race = Race.objects.create(
+            name="Race", date=date(2024, 1, 1), location="Track A", track_configuration="left_handed",
+            track_condition="fast", classification="G1", season="SU", track_length=1200,
+            prize_money=Decimal('50000.50'), currency="USD", track_surface="D",
+        )
+        horse = Racehorse.objects.create(name="Horse", breed="Thoroughbred")
+        jockey = Jockey.objects.create(name="Jockey")
+        Participation.objects.create(
+            racehorse=horse, jockey=jockey, race=race, position=1,
+            finish_time=timedelta(minutes=1, seconds=10), margin=Decimal('0.50'), odds=Decimal('2.25'),
+        )
+
+    def test_list_responses_match_json_renderer(self):
+        for url_name in ('race-list', 'participation-list'):
+            with self.subTest(url_name):
+                response = self.client.get(reverse(url_name))
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertEqual(response.content, JSONRenderer().render(response.data))
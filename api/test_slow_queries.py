@@ -0,0 +1,105 @@
+# test_slow_queries.py
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import serializers, status
+from rest_framework.test import APITestCase, APIClient
+
+from .models import Race, User
+from .slow_queries import fingerprint, get, normalize, ranked, reset, serializer_field
+from .tasks import explain_slow_query
+
+
+class SiteSerializer(serializers.Serializer):
+    site = serializers.SerializerMethodField()
+
+    def get_site(self, obj):
+        return (lambda: serializer_field())()
+
+
+@override_settings(SLOW_QUERY_MS=0)
+class SlowQueryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reset()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='staff', is_staff=True)
+        self.race = Race.objects.create(
+            name="Slow Race", date=date(2024, 1, 1), location="Track A", track_configuration="left_handed",
+            track_condition="fast", classification="G1", season="SU", track_length=1200,
+            prize_money=50000, currency="USD", track_surface="D",
+        )
+
+    def get_without_explaining(self, url):
+        with mock.patch.object(explain_slow_query, 'delay') as delay:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return delay
+
+    def test_fingerprint_ignores_literals_and_in_list_length(self):
+        first = normalize('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s) AND "a"."name" = \'x\' LIMIT 21')
+        second = normalize('SELECT "a"."id"  FROM "a"\nWHERE "a"."id" IN (%s) AND "a"."name" = \'it\'\'s\' LIMIT 5')
+        self.assertEqual(first, 'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) AND "a"."name" = ? LIMIT ?')
+        self.assertEqual(fingerprint(first), fingerprint(second))
+        self.assertEqual(SiteSerializer(object()).data['site'], 'SiteSerializer.site')
+
+    @override_settings(SLOW_QUERY_MS=10_000)
+    def test_fast_queries_are_not_captured(self):
+        self.get_without_explaining(reverse('race-detail', args=[self.race.pk]))
+        self.assertEqual(ranked(), [])
+
+    def test_slow_queries_are_ranked_with_their_call_sites(self):
+        url = reverse('race-detail', args=[self.race.pk])
+        # A new query string each time misses the response cache
+        for i in range(2):
+            self.get_without_explaining(f'{url}?nocache={i}')
+        entries = ranked()
+        self.assertTrue(entries)
+        self.assertEqual([entry['total_ms'] for entry in entries], sorted((e['total_ms'] for e in entries), reverse=True))
+        race = next(entry for entry in entries if entry['sql'].startswith('SELECT') and '"api_race"' in entry['sql'])
+        self.assertEqual(race['count'], 2)
+        self.assertEqual(race['call_sites'][0]['view'], 'RaceViewSet.retrieve')
+        self.assertEqual(race['call_sites'][0]['count'], 2)
+        self.assertNotIn('%s', race['sql'])
+
+    def test_each_select_fingerprint_is_explained_once(self):
+        url = reverse('race-detail', args=[self.race.pk])
+        delay = self.get_without_explaining(url)
+        self.assertTrue(delay.call_args_list)
+        explained = [call.args[0] for call in delay.call_args_list]
+        self.assertEqual(len(explained), len(set(explained)))
+        self.assertTrue(all(get(key)['sql'].startswith('SELECT') for key in explained))
+        self.assertFalse(self.get_without_explaining(f'{url}?nocache=1').called)
+
+        for call in delay.call_args_list:
+            explain_slow_query(*call.args)
+        entry = get(explained[0])
+        self.assertTrue(entry['plan'])
+        self.assertFalse(entry['plan'].startswith('EXPLAIN failed'))
+        self.assertEqual(entry['plan_query_ms'], delay.call_args_list[0].args[3])
+
+    def test_endpoint_is_staff_only_and_command_lists_fingerprints(self):
+        self.get_without_explaining(reverse('race-detail', args=[self.race.pk]))
+        url = reverse('slow-query-list')
+        self.client.force_authenticate(User.objects.create_user(username='member'))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(self.admin)
+        with mock.patch.object(explain_slow_query, 'delay'):
+            listed = self.client.get(url, {'limit': 1}).json()
+            self.assertEqual(len(listed), 1)
+            detail = self.client.get(reverse('slow-query-detail', args=[listed[0]['fingerprint']]))
+            self.assertEqual(detail.json()['sql'], listed[0]['sql'])
+            self.assertEqual(self.client.get(reverse('slow-query-detail', args=['0' * 16])).status_code, 404)
+        self.client.force_authenticate(None)
+
+        out = StringIO()
+        call_command('slow_queries', '--plans', stdout=out)
+        self.assertIn(listed[0]['fingerprint'], out.getvalue())
+        self.assertIn('RaceViewSet.retrieve', out.getvalue())
+        call_command('slow_queries', '--reset', stdout=StringIO())
+        self.assertEqual(ranked(), [])
@@ -0,0 +1,77 @@
+# test_stats.py
+from decimal import Decimal
+from io import StringIO
+from datetime import date
+from django.core.management import call_command
+from django.test import TestCase
+from .models import Racehorse, Jockey, Race, Participation, RacehorseStats, JockeyStats
+from .stats import verify_stats
+
+
+class CareerStatsTests(TestCase):
+    def setUp(self):
+        self.horse = Racehorse.objects.create(name="Stat Horse", breed="Thoroughbred")
+        self.other_horse = Racehorse.objects.create(name="Other Horse", breed="Thoroughbred")
+        self.jockey = Jockey.objects.create(name="Stat Jockey")
+        self.race = Race.objects.create(
+            name="Stats Cup",
+            date=date(2024, 5, 1),
+            location="Track A",
+            track_configuration="left_handed",
+            track_condition="fast",
+            classification="G1",
+            season="SP",
+            track_length=2000,
+            prize_money=100000,
+            currency="USD",
+            track_surface="D"
+        )
+
+    def test_create_updates_stats(self):
+        Participation.objects.create(racehorse=self.horse, jockey=self.jockey, race=self.race, position=1)
+        stats = RacehorseStats.objects.get(racehorse=self.horse)
+        self.assertEqual((stats.starts, stats.wins, stats.places, stats.g1_wins), (1, 1, 1, 1))
+        self.assertEqual(stats.earnings, Decimal('60000.00'))
+        self.assertEqual(JockeyStats.objects.get(jockey=self.jockey).wins, 1)
+        self.assertEqual(verify_stats(), [])
+
+    def test_edit_applies_delta(self):
+        participation = Participation.objects.create(
+            racehorse=self.horse, jockey=self.jockey, race=self.race, position=1
+        )
+        participation.position = 4
+        participation.racehorse = self.other_horse
+        participation.save()
+        self.assertEqual(RacehorseStats.objects.get(racehorse=self.horse).starts, 0)
+        other = RacehorseStats.objects.get(racehorse=self.other_horse)
+        self.assertEqual((other.starts, other.wins, other.earnings), (1, 0, Decimal('5000.00')))
+        self.assertEqual(verify_stats(), [])
+
+    def test_delete_and_race_edit(self):
+        participation = Participation.objects.create(
+            racehorse=self.horse, jockey=self.jockey, race=self.race, position=1
+        )
+        self.race.classification = Race.Classification.GRADE_2
+        self.race.prize_money = 50000
+        self.race.save()
+        stats = RacehorseStats.objects.get(racehorse=self.horse)
+        self.assertEqual((stats.g1_wins, stats.earnings), (0, Decimal('30000.00')))
+        participation.delete()
+        self.assertEqual(RacehorseStats.objects.get(racehorse=self.horse).starts, 0)
+        self.assertEqual(verify_stats(), [])
+
+    def test_cascade_delete(self):
+        Participation.objects.create(racehorse=self.horse, jockey=self.jockey, race=self.race, position=2)
+        self.horse.delete()
+        self.assertFalse(RacehorseStats.objects.filter(racehorse_id=self.horse.pk).exists())
+        self.assertEqual(JockeyStats.objects.get(jockey=self.jockey).starts, 0)
+        self.assertEqual(verify_stats(), [])
+
+    def test_rebuild_command(self):
+        Participation.objects.create(racehorse=self.horse, jockey=self.jockey, race=self.race, position=1)
+        RacehorseStats.objects.update(wins=7)
+        self.assertNotEqual(verify_stats(), [])
+        out = StringIO()
+        call_command('rebuild_stats', stdout=out)
+        self.assertIn("Career stats verified!", out.getvalue())
+        self.assertEqual(RacehorseStats.objects.get(racehorse=self.horse).wins, 1)
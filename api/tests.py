@@ -1,10 +1,14 @@
 # tests.py
+from unittest import mock
+
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from datetime import date, timedelta, datetime
 from .models import Racehorse, Jockey, Race, Participation
+from .serializers import RaceResultsSerializer
 
 User = get_user_model()
 
@@ -18,6 +22,7 @@ class BaseTestCase(APITestCase):
         self.admin_user = User.objects.create_superuser(
             username="admin", email="admin@example.com", password="adminpass"
         )
+        cache.clear()  # Cached responses are shared across users and tests
         self.client = APIClient()
 
         # Authenticate client for protected actions
@@ -276,6 +281,58 @@ class ParticipationTests(BaseTestCase):
         )
 
 
+class RaceResultsTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.horses = [
+            Racehorse.objects.create(name=f"Runner {i}", breed="Thoroughbred") for i in range(3)
+        ]
+        self.jockeys = [Jockey.objects.create(name=f"Rider {i}") for i in range(3)]
+        self.url = reverse('race-results', args=[self.race.id])
+
+    def test_bulk_results(self):
+        data = {"results": [
+            {"racehorse": horse.id, "jockey": jockey.id, "position": i + 2, "finish_time": "0:01:12"}
+            for i, (horse, jockey) in enumerate(zip(self.horses, self.jockeys))
+        ]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['participations']), 3)
+        self.assertEqual(self.race.participations.count(), 4)
+        self.assertEqual(self.horses[0].stats.starts, 1)
+
+    def test_bulk_results_rejects_duplicates_and_unknown_ids(self):
+        data = {"results": [
+            {"racehorse": self.racehorse.id, "jockey": self.jockeys[0].id, "position": 2},
+            {"racehorse": self.horses[1].id, "jockey": self.jockeys[1].id, "position": 3},
+            {"racehorse": self.horses[1].id, "jockey": 999999, "position": 4},
+        ]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data['results']
+        self.assertIn('racehorse', errors[0])
+        self.assertIn('racehorse', errors[1])
+        self.assertIn('jockey', errors[2])
+        self.assertEqual(self.race.participations.count(), 1)
+
+    def test_bulk_results_conflicting_with_a_concurrent_entry(self):
+        data = {"results": [
+            {"racehorse": self.horses[0].id, "jockey": self.jockeys[0].id, "position": 2},
+            {"racehorse": self.racehorse.id, "jockey": self.jockeys[1].id, "position": 3},
+        ]}
+        # As if the conflicting runner had been committed between validation and insert
+        with mock.patch.object(RaceResultsSerializer, 'validate_results', side_effect=lambda results: results):
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('results', response.data)
+        self.assertEqual(self.race.participations.count(), 1)
+        self.assertFalse(Participation.objects.filter(racehorse=self.horses[0]).exists())
+
+    def test_bulk_results_requires_authentication(self):
+        response = APIClient().post(self.url, {"results": []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
 
 class UserTests(BaseTestCase):
     def test_list_users(self):
@@ -1,6 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RacehorseViewSet, JockeyViewSet, RaceViewSet, ParticipationViewSet, UserViewSet
+from .views import (
+    RacehorseViewSet, JockeyViewSet, RaceViewSet, ParticipationViewSet, UserViewSet, AutocompleteView, ProfileViewSet,
+    SlowQueryViewSet, RacehorseLeaderboardViewSet, JockeyLeaderboardViewSet,
+)
+from .async_views import AsyncRacehorseView, AsyncRaceView, AsyncParticipationView
 
 router = DefaultRouter()
 router.register(r'racehorses', RacehorseViewSet, basename='racehorse')
@@ -8,7 +12,18 @@ router.register(r'jockeys', JockeyViewSet, basename='jockey')
 router.register(r'races', RaceViewSet, basename='race')
 router.register(r'participations', ParticipationViewSet, basename='participation')
 router.register(r'users', UserViewSet, basename='user')
+router.register(r'leaderboards/horses', RacehorseLeaderboardViewSet, basename='horse-leaderboard')
+router.register(r'leaderboards/jockeys', JockeyLeaderboardViewSet, basename='jockey-leaderboard')
+router.register(r'admin/profiles', ProfileViewSet, basename='profile')
+router.register(r'admin/slow-queries', SlowQueryViewSet, basename='slow-query')
 
 urlpatterns = [
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
+    path('async/racehorses/', AsyncRacehorseView.as_view(), name='async-racehorse-list'),
+    path('async/racehorses/<int:pk>/', AsyncRacehorseView.as_view(), name='async-racehorse-detail'),
+    path('async/races/', AsyncRaceView.as_view(), name='async-race-list'),
+    path('async/races/<int:pk>/', AsyncRaceView.as_view(), name='async-race-detail'),
+    path('async/participations/', AsyncParticipationView.as_view(), name='async-participation-list'),
+    path('async/participations/<int:pk>/', AsyncParticipationView.as_view(), name='async-participation-detail'),
     path('', include(router.urls)),
 ]
@@ -1,34 +1,66 @@
 import logging
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_headers
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.throttling import ScopedRateThrottle
 
-from .models import Racehorse, Jockey, Race, Participation, User
+from .models import Racehorse, Jockey, Race, Participation, User, Leaderboard, RacehorseLeaderboard, JockeyLeaderboard
 from .serializers import (
     RacehorseSerializer, RacehorseWriteSerializer,
     JockeySerializer, JockeyWriteSerializer,
-    RaceSerializer, RaceWriteSerializer,
+    RaceSerializer, RaceWriteSerializer, RaceResultsSerializer,
     ParticipationSerializer, ParticipationWriteSerializer,
-    UserSerializer, UserWriteSerializer
+    UserSerializer, UserWriteSerializer,
+    LeaderboardParamsSerializer, RacehorseLeaderboardSerializer, JockeyLeaderboardSerializer,
 )
-from api.filters import RacehorseFilter, JockeyFilter, RaceFilter, ParticipationFilter
+from api.filters import RacehorseFilter, JockeyFilter, RaceFilter, ParticipationFilter, RankedSearchFilter
 from api.tasks import send_thank_you_email, send_invite_to_new_user
+from api.autocomplete import AUTOCOMPLETE_SOURCES
+from api.mixins import CachedResponseMixin, ConditionalGetMixin, ExportMixin, FastListMixin, SparseFieldsetViewMixin
+from api.fastpath import RacehorseFast, JockeyFast, RaceFast, ParticipationFast
+from api import profiling, slow_queries
 from .permissions import IsAdminOrSelf
+from .pagination import LeaderboardPagination, SelectablePagination
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-class RacehorseViewSet(viewsets.ModelViewSet):
+# Serializer fields read from the with_stats() annotations
+STATS_FIELDS = ('total_races', 'total_wins', 'win_rate', 'g1_wins')
+
+class RacehorseViewSet(SparseFieldsetViewMixin, ExportMixin, ConditionalGetMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet):
+    cache_namespace = 'racehorse'
+    # Enforced by api/test_query_budgets.py at two data sizes; see api/query_budget.py
+    query_budgets = {'list': 3, 'retrieve': 2}
+    fast_serializer_class = RacehorseFast
+    export_fields = {
+        'id': 'id',
+        'name': 'name',
+        'birth_date': 'birth_date',
+        'breed': 'breed',
+        'gender': 'gender',
+        'country': 'country',
+        'is_active': 'is_active',
+        'total_races': 'stats__starts',
+        'total_wins': 'stats__wins',
+        'g1_wins': 'stats__g1_wins',
+        'earnings': 'stats__earnings',
+    }
     throttle_scope = 'racehorses'
     throttle_classes = [ScopedRateThrottle]
     queryset = Racehorse.objects.order_by('pk')
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        RankedSearchFilter,
         filters.OrderingFilter,
     ]
     filterset_class = RacehorseFilter
@@ -37,16 +69,17 @@ class RacehorseViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         logger.info(f"Racehorse list requested by user: {request.user}")
-        # Generate a cache key per user (or 'anon' if not logged in)
-        user_key = f'racehorse_list_user_{request.user.id if request.user.is_authenticated else "anon"}'
-        decorated = cache_page(60*15, key_prefix=user_key)(super().list)
-        return decorated(request, *args, **kwargs)
-        # return super().list(request, *args, **kwargs)   
+        return super().list(request, *args, **kwargs)
 
     def get_queryset(self):
-        import time
-        time.sleep(2)
-        return super().get_queryset()
+        queryset = super().get_queryset()
+        if self.field_requested(*STATS_FIELDS):
+            queryset = queryset.with_stats()
+        if self.field_requested('participations'):
+            queryset = queryset.prefetch_related(
+                Prefetch('participations', queryset=Participation.objects.select_related('jockey').order_by('position', 'pk'))
+            )
+        return queryset
     
     def get_permissions(self):
         self.permission_classes = [AllowAny]
@@ -65,13 +98,16 @@ class RacehorseViewSet(viewsets.ModelViewSet):
         racehorse = serializer.save()
         logger.info(f"Racehorse created: {racehorse.name} (ID: {racehorse.id}) - {racehorse.breed}")
 
-class JockeyViewSet(viewsets.ModelViewSet):
+class JockeyViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet):
+    cache_namespace = 'jockey'
+    query_budgets = {'list': 4, 'retrieve': 3}
+    fast_serializer_class = JockeyFast
     throttle_scope = 'jockeys'
     throttle_classes = [ScopedRateThrottle]
-    queryset = Jockey.objects.prefetch_related('participations').order_by('pk')
+    queryset = Jockey.objects.order_by('pk')
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        RankedSearchFilter,
         filters.OrderingFilter,
     ]
     filterset_class = JockeyFilter
@@ -80,16 +116,17 @@ class JockeyViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         logger.info(f"Jockey list requested by user: {request.user}")
-        # Generate a cache key per user (or 'anon' if not logged in)
-        user_key = f'jockey_list_user_{request.user.id if request.user.is_authenticated else "anon"}'
-        decorated = cache_page(60*15, key_prefix=user_key)(super().list)
-        return decorated(request, *args, **kwargs)
-        # return super().list(request, *args, **kwargs)   
+        return super().list(request, *args, **kwargs)
     
     def get_queryset(self):
-        import time
-        time.sleep(2)  # simulate delay
-        return super().get_queryset()
+        queryset = super().get_queryset()
+        if self.field_requested(*STATS_FIELDS):
+            queryset = queryset.with_stats()
+        if self.field_requested('participations'):
+            queryset = queryset.prefetch_related(
+                Prefetch('participations', queryset=Participation.objects.select_related('racehorse').order_by('position', 'pk'))
+            )
+        return queryset
 
     def get_permissions(self):
         self.permission_classes = [AllowAny]
@@ -102,6 +139,14 @@ class JockeyViewSet(viewsets.ModelViewSet):
             return JockeyWriteSerializer
         return JockeySerializer
 
+    def get_serializer(self, *args, **kwargs):
+        # Fetch the horse/jockey breakdown for every jockey on the page at once
+        if kwargs.get('many') and args and self.field_requested('racehorses'):
+            context = self.get_serializer_context()
+            context['partnerships'] = Participation.objects.partnerships(args[0])
+            kwargs['context'] = context
+        return super().get_serializer(*args, **kwargs)
+
     def perform_create(self, serializer):
         user_info = f"{self.request.user} (authenticated: {self.request.user.is_authenticated})"
         logger.info(f"Creating jockey for user: {user_info}")
@@ -109,29 +154,50 @@ class JockeyViewSet(viewsets.ModelViewSet):
         logger.info(f"Jockey created: {jockey.name} (ID: {jockey.id})")
 
 
-class RaceViewSet(viewsets.ModelViewSet):
-    queryset = Race.objects.prefetch_related('participations').order_by('pk')
+class RaceViewSet(SparseFieldsetViewMixin, ExportMixin, ConditionalGetMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet):
+    cache_namespace = 'race'
+    query_budgets = {'list': 3, 'retrieve': 2}
+    fast_serializer_class = RaceFast
+    export_fields = {
+        'id': 'id',
+        'name': 'name',
+        'date': 'date',
+        'location': 'location',
+        'track_configuration': 'track_configuration',
+        'track_condition': 'track_condition',
+        'classification': 'classification',
+        'season': 'season',
+        'track_length': 'track_length',
+        'track_surface': 'track_surface',
+        'prize_money': 'prize_money',
+        'currency': 'currency',
+    }
+    queryset = Race.objects.order_by('pk')
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        RankedSearchFilter,
         filters.OrderingFilter,
     ]
     filterset_class = RaceFilter
+    pagination_class = SelectablePagination
+    keyset_orderings = (('date', 'id'), ('id',))
     search_fields = ['name', 'location']
     ordering_fields = ['name', 'date', 'track_length', 'prize_money']
 
     def list(self, request, *args, **kwargs):
         logger.info(f"Race list requested by user: {request.user}")
-        # Generate a cache key per user (or 'anon' if not logged in)
-        user_key = f'race_list_user_{request.user.id if request.user.is_authenticated else "anon"}'
-        decorated = cache_page(60*15, key_prefix=user_key)(super().list)
-        return decorated(request, *args, **kwargs)
-        # return super().list(request, *args, **kwargs)   
+        return super().list(request, *args, **kwargs)
     
     def get_queryset(self):
-        import time
-        time.sleep(2)  # simulate delay
-        return super().get_queryset()
+        queryset = super().get_queryset()
+        if self.field_requested('winner', 'total_participants'):
+            queryset = queryset.with_summary()
+        if self.field_requested('participations'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'participations',
+                queryset=Participation.objects.select_related('racehorse', 'jockey').order_by('position', 'pk'),
+            ))
+        return queryset
     
     def get_permissions(self):
         self.permission_classes = [AllowAny]
@@ -142,6 +208,8 @@ class RaceViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RaceWriteSerializer
+        if self.action == 'results':
+            return RaceResultsSerializer
         return RaceSerializer
 
     def perform_create(self, serializer):
@@ -150,23 +218,56 @@ class RaceViewSet(viewsets.ModelViewSet):
         race = serializer.save()
         logger.info(f"Race created: {race.name} (ID: {race.id}) at {race.location}")
 
-class ParticipationViewSet(viewsets.ModelViewSet):
-    queryset = Participation.objects.select_related('racehorse', 'race', 'jockey').order_by('pk')
+    @action(detail=True, methods=['post'])
+    def results(self, request, pk=None):
+        """Record a race's whole finishing order in one request"""
+        race = get_object_or_404(Race, pk=pk)
+        serializer = self.get_serializer(data=request.data, context={**self.get_serializer_context(), 'race': race})
+        serializer.is_valid(raise_exception=True)
+        participations = serializer.save()
+        logger.info(f"Recorded {len(participations)} results for race {race.name} (ID: {race.id}) - Sending thank you email to {request.user.email}")
+        send_thank_you_email.delay(participations[0].id, request.user.email)  # once per batch
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+class ParticipationViewSet(SparseFieldsetViewMixin, ExportMixin, ConditionalGetMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet):
+    cache_namespace = 'participation'
+    query_budgets = {'list': 2, 'retrieve': 1}
+    fast_serializer_class = ParticipationFast
+    export_fields = {
+        'id': 'id',
+        'race_id': 'race_id',
+        'race': 'race__name',
+        'race_date': 'race__date',
+        'racehorse_id': 'racehorse_id',
+        'racehorse': 'racehorse__name',
+        'jockey_id': 'jockey_id',
+        'jockey': 'jockey__name',
+        'position': 'position',
+        'finish_time': 'finish_time',
+        'margin': 'margin',
+        'odds': 'odds',
+    }
+    queryset = Participation.objects.order_by('pk')
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        RankedSearchFilter,
         filters.OrderingFilter,
     ]
     filterset_class = ParticipationFilter
+    pagination_class = SelectablePagination
+    keyset_orderings = (('race__date', 'id'), ('id',))
+    ordering_fields = ['race__date', 'position', 'pk']
     serializer_class = ParticipationSerializer
+    # Relations joined only when one of the serializer fields reading them is requested
+    related_fields = {
+        'racehorse': ('racehorse_name', 'racehorse_image'),
+        'race': ('race_name', 'race_date', 'race_season'),
+        'jockey': ('jockey_name',),
+    }
     
     def list(self, request, *args, **kwargs):
         logger.info(f"Participation list requested by user: {request.user}")
-        # Generate a cache key per user (or 'anon' if not logged in)
-        user_key = f'participation_list_user_{request.user.id if request.user.is_authenticated else "anon"}'
-        decorated = cache_page(60*15, key_prefix=user_key)(super().list)
-        return decorated(request, *args, **kwargs)
-        # return super().list(request, *args, **kwargs)   
+        return super().list(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         user_info = f"{self.request.user} (authenticated: {self.request.user.is_authenticated})"
@@ -176,9 +277,11 @@ class ParticipationViewSet(viewsets.ModelViewSet):
         send_thank_you_email.delay(participation.id, self.request.user.email)  # send email asynchronously
     
     def get_queryset(self):
-        import time
-        time.sleep(2)  # simulate delay
-        return super().get_queryset()
+        queryset = super().get_queryset()
+        related = [
+            relation for relation, fields in self.related_fields.items() if self.field_requested(*fields)
+        ]
+        return queryset.select_related(*related) if related else queryset
     
     def get_permissions(self):
         self.permission_classes = [AllowAny]
@@ -191,8 +294,36 @@ class ParticipationViewSet(viewsets.ModelViewSet):
             return ParticipationWriteSerializer
         return ParticipationSerializer
 
+class AutocompleteView(APIView):
+    """
+        Name suggestions for ?q= from the in-memory prefix index of ?type=
+        (racehorse, jockey or race). Public and cookie-less, so no
+        authentication runs and a lookup never touches the database.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_scope = 'autocomplete'
+    throttle_classes = [ScopedRateThrottle]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        source_type = request.query_params.get('type', 'racehorse')
+        source = AUTOCOMPLETE_SOURCES.get(source_type)
+        if source is None:
+            return Response(
+                {'type': [f"Must be one of: {', '.join(AUTOCOMPLETE_SOURCES)}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        return Response({'results': source.search(request.query_params.get('q', ''), limit)})
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.order_by('pk')
+    query_budgets = {'list': 2, 'retrieve': 1}
 
     def get_permissions(self):
         self.permission_classes = [AllowAny]
@@ -218,4 +349,96 @@ class UserViewSet(viewsets.ModelViewSet):
         user = serializer.save()
         logger.info(f"User created: {user.username} (ID: {user.id}) - {user.email}")
         if raw_password:
-            send_invite_to_new_user.delay(user.email, raw_password)
\ No newline at end of file
+            send_invite_to_new_user.delay(user.email, raw_password)
+
+
+class LeaderboardViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+        Horses or jockeys ranked from the precomputed leaderboard tables that
+        api.stats keeps up to date. ?year=, ?season=, ?surface= and
+        ?classification= narrow the races counted (all of them when left
+        out; see Leaderboard.SCOPES for the combinations served),
+        ?min_starts= drops those with fewer starts and ?ordering= is
+        one of Leaderboard.RANKINGS, best first by default. Every page is one
+        keyset query on a leaderboard index and no page count, so responses
+        are not cached.
+    """
+    query_budgets = {'list': 1}
+    permission_classes = [AllowAny]
+    pagination_class = LeaderboardPagination
+    # Filtered on by every query, so the indexes lead with them (see api.checks)
+    pinned_fields = Leaderboard.SCOPE_FIELDS
+    subject = None
+
+    def get_queryset(self):
+        params = LeaderboardParamsSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return super().get_queryset().filter(
+            **params.scope(), starts__gte=params.validated_data['min_starts'],
+        ).select_related(self.subject)
+
+class RacehorseLeaderboardViewSet(LeaderboardViewSet):
+    subject = 'racehorse'
+    keyset_orderings = tuple((ranking, 'racehorse_id') for ranking in Leaderboard.RANKINGS)
+    queryset = RacehorseLeaderboard.objects.all()
+    serializer_class = RacehorseLeaderboardSerializer
+
+class JockeyLeaderboardViewSet(LeaderboardViewSet):
+    subject = 'jockey'
+    keyset_orderings = tuple((ranking, 'jockey_id') for ranking in Leaderboard.RANKINGS)
+    queryset = JockeyLeaderboard.objects.all()
+    serializer_class = JockeyLeaderboardSerializer
+
+
+class ProfileViewSet(viewsets.ViewSet):
+    """
+        Staff-only view of the request profiles kept by api.profiling: the
+        list shows summaries, newest first; a profile adds its SQL with
+        EXPLAIN plans and its cProfile report or stack samples; download
+        returns the .prof file or the collapsed stacks.
+    """
+    permission_classes = [IsAdminUser]
+    lookup_value_regex = '[0-9a-f]{32}'
+
+    def list(self, request):
+        return Response(profiling.list_summaries())
+
+    def retrieve(self, request, pk=None):
+        record = profiling.get_record(pk)
+        if record is None:
+            raise Http404("No profile with this id; it may have left the buffer.")
+        return Response(record)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        record = profiling.get_record(pk)
+        blob = profiling.get_blob(pk) if record is not None else None
+        if blob is None:
+            raise Http404("Nothing to download for this profile.")
+        content_type = 'application/octet-stream' if record['download'] == 'prof' else 'text/plain; charset=utf-8'
+        response = HttpResponse(blob, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{pk}.{record["download"]}"'
+        return response
+
+
+class SlowQueryViewSet(viewsets.ViewSet):
+    """
+        Staff-only view of the slow query fingerprints kept by
+        api.slow_queries, by total time (?limit= for the top n); a
+        fingerprint adds nothing the list lacks but can be linked to.
+    """
+    permission_classes = [IsAdminUser]
+    lookup_value_regex = '[0-9a-f]{16}'
+
+    def list(self, request):
+        try:
+            limit = int(request.query_params['limit']) if 'limit' in request.query_params else None
+        except ValueError:
+            raise ValidationError({'limit': "Must be an integer."})
+        return Response(slow_queries.ranked(limit))
+
+    def retrieve(self, request, pk=None):
+        entry = slow_queries.get(pk)
+        if entry is None:
+            raise Http404("No slow query with this fingerprint.")
+        return Response(entry)
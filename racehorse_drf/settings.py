@@ -41,7 +41,13 @@ INSTALLED_APPS = [
     'corsheaders',
 ]
 
+# Silk records every request and query into the database: development only.
+# In production, api.profiling keeps sampled and slow requests instead.
+SILK_ENABLED = os.getenv('SILK_ENABLED', 'false').lower() == 'true'
+
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,7 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'silk.middleware.SilkyMiddleware',
+    *(['silk.middleware.SilkyMiddleware'] if SILK_ENABLED else []),
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
 ]
@@ -87,6 +93,11 @@ DATABASES = {
         conn_max_age=600
     )
 }
+# Optional read replica; nothing routes queries to it, but slow query plans
+# are taken there (SLOW_QUERY_EXPLAIN_DATABASE) when it is set
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dj_database_url.parse(os.getenv('DATABASE_REPLICA_URL'), conn_max_age=600)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
 
 
 
@@ -143,6 +154,17 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # orjson-backed drop-ins for JSONRenderer/JSONParser (same output); list
+    # the rest_framework classes here to go back to the stdlib encoder
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
@@ -153,9 +175,49 @@ REST_FRAMEWORK = {
         'anon': '100/minute',
         'racehorses': '100/minute',
         'jockeys': '100/minute',
+        # One request per keystroke
+        'autocomplete': '600/minute',
     }
 }
 
+# List actions render from values() rows instead of the serializers (api.fastpath)
+FAST_LIST_SERIALIZATION = os.getenv('FAST_LIST_SERIALIZATION', 'true').lower() == 'true'
+
+# Render nested lists (a horse's participations, ...) without ?expand=, as
+# the API did before they became opt-in
+EXPAND_NESTED_BY_DEFAULT = os.getenv('EXPAND_NESTED_BY_DEFAULT', 'false').lower() == 'true'
+
+# Request metrics served at /metrics (api.metrics). Each worker adds its
+# counts to Redis every METRICS_FLUSH_INTERVAL seconds; when METRICS_TOKEN is
+# set, scrapers must send "Authorization: Bearer <token>".
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '10'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Request profiles (api.profiling), browsed by staff at /api/admin/profiles/:
+# PROFILING_SAMPLE_RATE of requests run under cProfile, and requests slower
+# than PROFILING_SLOW_MS are always kept with their SQL and the stacks
+# sampled every PROFILING_STACK_INTERVAL seconds from halfway to that
+# threshold. A Celery task adds the EXPLAIN of their slowest
+# PROFILING_EXPLAIN_LIMIT SELECTs. Redis keeps the last PROFILING_BUFFER_SIZE.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'true').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.01'))
+PROFILING_SLOW_MS = float(os.getenv('PROFILING_SLOW_MS', '1000'))
+PROFILING_STACK_INTERVAL = float(os.getenv('PROFILING_STACK_INTERVAL', '0.005'))
+PROFILING_EXPLAIN_LIMIT = int(os.getenv('PROFILING_EXPLAIN_LIMIT', '5'))
+PROFILING_BUFFER_SIZE = int(os.getenv('PROFILING_BUFFER_SIZE', '100'))
+
+# Slow queries (api.slow_queries), listed by `manage.py slow_queries` and at
+# /api/admin/slow-queries/: statements of a request taking SLOW_QUERY_MS or
+# more ('inf' turns capture off) are grouped by fingerprint. A SELECT's plan
+# is taken with EXPLAIN ANALYZE by a Celery task on
+# SLOW_QUERY_EXPLAIN_DATABASE, at most every SLOW_QUERY_EXPLAIN_INTERVAL
+# seconds per fingerprint and cancelled after SLOW_QUERY_EXPLAIN_TIMEOUT_MS.
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_EXPLAIN_DATABASE = os.getenv('SLOW_QUERY_EXPLAIN_DATABASE', 'replica' if 'replica' in DATABASES else 'default')
+SLOW_QUERY_EXPLAIN_INTERVAL = int(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', '3600'))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', '30000'))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Racehorse Record System',
     'DESCRIPTION': 'A simple Product & Order API that helps us store information on horse racing results.',
@@ -176,7 +238,8 @@ CACHES = {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": REDIS_URL,
         "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # django_redis.client.DefaultClient plus hit/miss counts for /metrics
+            "CLIENT_CLASS": "api.metrics.MetricsCacheClient",
         }
     }
 }
@@ -224,4 +287,9 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_HEADERS = list(default_headers) + [
     "cache-control",  # <-- allow Cache-Control header
+]
+
+# Let the dashboards read the response cache status
+CORS_EXPOSE_HEADERS = [
+    "x-cache-status",
 ]
\ No newline at end of file
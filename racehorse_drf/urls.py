@@ -22,6 +22,7 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
+from api.metrics import metrics_view
 from racehorse_drf.serializers import CustomTokenObtainPairSerializer
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -32,6 +33,7 @@ urlpatterns = [
     path('api/', include('api.urls')),
     path("api/token/", CustomTokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Serve media files in development